@@ -1,7 +1,8 @@
 """auth router"""
 
+import time
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from loguru import logger
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -11,9 +12,10 @@ from app.schemas.user_schemas import (
     UserLogin,
     EmailModel,
     UserInfo,
+    CurrentUser,
 )
 from app.schemas.payment_schemas import CreateWallet
-from app.models.user import UserDAO, User
+from app.models.user import UserDAO
 from app.models.payments import WalletDAO
 from app.core.auth import (
     authentificate_user,
@@ -21,26 +23,40 @@ from app.core.auth import (
     get_access_token,
     create_access_token,
     create_refresh_token,
+    password_hasher,
+    user_claims,
+    rotate_refresh_token,
+    decode_refresh_token,
+    revoke_refresh_family,
 )
+from app.core.admission import admission
+from app.core.cache import identity_cache
+from app.core.idempotency import idempotent_write
+from app.core.shared_cache import shared_cache
 from app.base.session_maker import TransactionDep
 
 auth_router = APIRouter(prefix="/api/v1/auth", tags=["authentication"])
 
 
-@auth_router.post("/register")
+@auth_router.post("/register", dependencies=[Depends(admission)])
 async def register(
-    request_data: UserRegister, session: AsyncSession = Depends(TransactionDep)
+    request_data: UserRegister,
+    request: Request,
+    session: AsyncSession = Depends(TransactionDep),
 ):
     """register router"""
-    logger.info(f"Recived data: {request_data}")
     data_to_db = UserBase(
-        **request_data.model_dump(exclude={"confirm_password"}).copy()
+        **request_data.model_dump(exclude={"confirm_password", "password"}),
+        password=await password_hasher.hash(request_data.password),
     )
+    write = idempotent_write(request)
+    if write is not None:
+        await write.claim(session)
     try:
         user = await UserDAO.add(data_to_db, session)
     except IntegrityError as e:
         await session.rollback()
-        logger.error(e)
+        logger.warning(f"Register failed: {e.orig.__class__.__name__}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
         )
@@ -48,25 +64,43 @@ async def register(
     wallet_add = CreateWallet(id=wallet_uuid, user_id=user.id)
     await WalletDAO.add(data=wallet_add, session=session)
 
-    return {"register_data": request_data}
+    result = {
+        "register_data": request_data.model_dump(
+            exclude={"password", "confirm_password"}
+        )
+    }
+    if write is not None:
+        await write.store(result, session)
+    return result
 
 
-@auth_router.post("/login")
+@auth_router.post("/login", dependencies=[Depends(admission)])
 async def login(
     response: Response,
     user_data: UserLogin,
     session: AsyncSession = Depends(TransactionDep),
 ):
     """login endpoint"""
-    logger.info(f"Recived data for login: {user_data}")
     check = await authentificate_user(
         email=EmailModel(email=user_data.email),
         plain_password=user_data.password,
         session=session,
     )
 
-    access_token = create_access_token(data={"sub": str(check.id)})
+    access_token = create_access_token(data=user_claims(check))
     refresh_token = create_refresh_token(data={"sub": str(check.id)})
+    set_auth_cookies(response, access_token, refresh_token)
+
+    return {
+        "ok": True,
+        "message": "nice login!",
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+    }
+
+
+def set_auth_cookies(response: Response, access_token: str, refresh_token: str):
+    """put tokens to httponly cookies"""
     response.set_cookie(
         key="access_token",
         value=access_token,
@@ -84,23 +118,62 @@ async def login(
         max_age=30 * 60 * 24 * 60,
     )
 
+
+@auth_router.post("/refresh")
+async def refresh(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(TransactionDep),
+):
+    """rotate refresh token and issue new access token"""
+    token = request.cookies.get("refresh_token")
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="token not found"
+        )
+    user, payload = await rotate_refresh_token(token, session)
+    access_token = create_access_token(data=user_claims(user))
+    refresh_token = create_refresh_token(
+        data={"sub": str(user.id)}, family=payload["fam"]
+    )
+    set_auth_cookies(response, access_token, refresh_token)
+
     return {
         "ok": True,
-        "message": "nice login!",
         "access_token": access_token,
         "refresh_token": refresh_token,
     }
 
 
 @auth_router.post("/logout")
-async def logout(response: Response):
+async def logout(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(TransactionDep),
+):
     """logout endpoint"""
+    refresh_token = request.cookies.get("refresh_token")
+    if refresh_token:
+        try:
+            await revoke_refresh_family(decode_refresh_token(refresh_token), session)
+        except HTTPException:
+            pass
+    token = request.cookies.get("access_token")
+    if token:
+        cached = identity_cache.get(token)
+        identity_cache.pop(token)
+        if cached is not None:
+            expires_in = cached[0].get("exp", 0) - time.time()
+        else:
+            expires_in = 30 * 60
+        await shared_cache.revoke_token(token, expires_in)
     response.delete_cookie("access_token")
     response.delete_cookie("refresh_token")
 
 
 @auth_router.post("/me")
-async def get_me(user_data: User = Depends(get_current_user)) -> UserInfo:
+async def get_me(
+    user_data: CurrentUser = Depends(get_current_user),
+) -> UserInfo:
     """get user data endpoint"""
-    logger.info(user_data)
     return UserInfo.model_validate(user_data)
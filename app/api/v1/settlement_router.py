@@ -0,0 +1,127 @@
+"""settlement router"""
+
+from typing import AsyncIterator
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from pydantic import ValidationError
+from app.base.session_maker import database_manager
+from app.core.auth import get_current_user
+from app.core.config import settlement_settings
+from app.core.idempotency import idempotent_write
+from app.core.settlement import settle
+from app.schemas.payment_schemas import SettlementResult, TransferBatch, TransferItem
+from app.schemas.user_schemas import CurrentUser
+
+settlement_router = APIRouter(prefix="/api/v1/settlements", tags=["settlements"])
+
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl")
+# body is parsed by hand to allow streaming, so schema goes to openapi here
+ITEM_SCHEMA = TransferItem.model_json_schema()
+
+
+def too_many_items():
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"batch is limited to {settlement_settings.SETTLEMENT_MAX_ITEMS} items",
+    )
+
+
+def too_large():
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"batch is limited to {settlement_settings.SETTLEMENT_MAX_BYTES} bytes",
+    )
+
+
+async def read_body(request: Request) -> AsyncIterator[bytes]:
+    """body chunks, cut off at SETTLEMENT_MAX_BYTES before anything is parsed"""
+    limit = settlement_settings.SETTLEMENT_MAX_BYTES
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > limit:
+        raise too_large()
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise too_large()
+        yield chunk
+
+
+async def read_ndjson(request: Request) -> list[TransferItem]:
+    """parse transfer per line while upload streams in"""
+    items: list[TransferItem] = []
+    buffer = b""
+    line_number = 0
+
+    def parse(line: bytes):
+        nonlocal line_number
+        line_number += 1
+        if not line.strip():
+            return
+        try:
+            items.append(TransferItem.model_validate_json(line))
+        except ValidationError as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={"line": line_number, "errors": e.errors(include_url=False)},
+            )
+        if len(items) > settlement_settings.SETTLEMENT_MAX_ITEMS:
+            raise too_many_items()
+
+    async for chunk in read_body(request):
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            parse(line)
+    parse(buffer)
+    return items
+
+
+async def read_batch(request: Request) -> list[TransferItem]:
+    if request.headers.get("content-type", "").split(";")[0] in NDJSON_TYPES:
+        return await read_ndjson(request)
+    try:
+        body = b"".join([chunk async for chunk in read_body(request)])
+        items = TransferBatch.model_validate_json(body).items
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False),
+        )
+    if len(items) > settlement_settings.SETTLEMENT_MAX_ITEMS:
+        raise too_many_items()
+    return items
+
+
+@settlement_router.post(
+    "",
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "items": {"type": "array", "items": ITEM_SCHEMA}
+                        },
+                        "required": ["items"],
+                    }
+                },
+                "application/x-ndjson": {"schema": ITEM_SCHEMA},
+            },
+            "required": True,
+        }
+    },
+)
+async def create_settlement(
+    request: Request,
+    response: Response,
+    user: CurrentUser = Depends(get_current_user),
+) -> SettlementResult:
+    """net and apply batch of transfers from own wallets, json or ndjson body"""
+    items = await read_batch(request)
+    if not items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="empty batch"
+        )
+    database_manager.stick_to_primary(request, response)
+    return await settle(items, user.id, idempotent_write(request))
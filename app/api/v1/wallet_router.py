@@ -0,0 +1,241 @@
+"""wallet router"""
+
+import base64
+import json
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.payment_schemas import (
+    WalletOperation,
+    TransactionInfo,
+    TransactionHistoryItem,
+    TransactionPage,
+    DailyBalance,
+    WalletStatement,
+)
+from app.schemas.user_schemas import CurrentUser
+from app.models.payments import (
+    WalletDAO,
+    TransactionDAO,
+    Wallet,
+    WalletNotFound,
+    InsufficientFunds,
+    BalanceLimitExceeded,
+)
+from app.core.auth import get_current_user
+from app.core.group_commit import ledger_writer
+from app.core.idempotency import idempotent_write
+from app.models.rollups import WalletDailyBalanceDAO
+from app.base.session_maker import ReadSessionDep, TransactionDep, database_manager
+from app.core.export import csv_chunks, ledger_partitions, period_bounds
+
+wallet_router = APIRouter(prefix="/api/v1/wallets", tags=["wallets"])
+
+
+async def apply_operation(
+    wallet_id: uuid.UUID,
+    operation_type: str,
+    operation: WalletOperation,
+    user: CurrentUser,
+    request: Request,
+    session: AsyncSession,
+) -> TransactionInfo:
+    write = idempotent_write(request, TransactionInfo)
+    try:
+        if ledger_writer.running:
+            row = await ledger_writer.submit(
+                wallet_id,
+                operation_type,
+                operation.amount,
+                user_id=user.id,
+                idempotency=write,
+            )
+        else:
+            if write is not None:
+                await write.claim(session)
+            row = await WalletDAO.apply_operation(
+                wallet_id, operation_type, operation.amount, session, user_id=user.id
+            )
+            if write is not None:
+                await write.store(row, session)
+    except WalletNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="wallet not found"
+        )
+    except InsufficientFunds:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="insufficient funds"
+        )
+    except BalanceLimitExceeded:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="balance limit exceeded"
+        )
+    return TransactionInfo.model_validate(row)
+
+
+@wallet_router.post("/{wallet_id}/deposit")
+async def deposit(
+    wallet_id: uuid.UUID,
+    operation: WalletOperation,
+    request: Request,
+    user: CurrentUser = Depends(get_current_user),
+    session: AsyncSession = Depends(TransactionDep),
+) -> TransactionInfo:
+    """deposit endpoint"""
+    return await apply_operation(
+        wallet_id, "deposit", operation, user, request, session
+    )
+
+
+@wallet_router.post("/{wallet_id}/withdraw")
+async def withdraw(
+    wallet_id: uuid.UUID,
+    operation: WalletOperation,
+    request: Request,
+    user: CurrentUser = Depends(get_current_user),
+    session: AsyncSession = Depends(TransactionDep),
+) -> TransactionInfo:
+    """withdraw endpoint"""
+    return await apply_operation(
+        wallet_id, "withdraw", operation, user, request, session
+    )
+
+
+async def get_own_wallet(
+    wallet_id: uuid.UUID, user: CurrentUser, session: AsyncSession
+) -> Wallet:
+    wallet = await WalletDAO.find_one_or_none_by_id(id=wallet_id, session=session)
+    if wallet is None or wallet.user_id != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="wallet not found"
+        )
+    return wallet
+
+
+def encode_cursor(seq: int) -> str:
+    """opaque cursor from ledger seq of last row"""
+    raw = json.dumps([seq]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        (seq,) = json.loads(raw)
+        if type(seq) is not int:
+            raise TypeError(seq)
+        return seq
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="bad cursor"
+        )
+
+
+def naive_utc(value: datetime | None) -> datetime | None:
+    """ledger timestamps are naive UTC, aware query values are converted"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@wallet_router.get("/{wallet_id}/transactions")
+async def get_transactions(
+    wallet_id: uuid.UUID,
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    operation_type: (
+        Literal["deposit", "withdraw", "transfer_in", "transfer_out"] | None
+    ) = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    user: CurrentUser = Depends(get_current_user),
+    session: AsyncSession = Depends(ReadSessionDep),
+) -> TransactionPage:
+    """wallet history, newest first"""
+    await get_own_wallet(wallet_id, user, session)
+    rows = await TransactionDAO.find_wallet_history(
+        wallet_id,
+        session,
+        limit=limit + 1,
+        before=decode_cursor(cursor) if cursor else None,
+        operation_type=operation_type,
+        date_from=naive_utc(date_from),
+        date_to=naive_utc(date_to),
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].seq)
+    return TransactionPage(
+        items=[TransactionHistoryItem.model_validate(row) for row in rows],
+        next_cursor=next_cursor,
+    )
+
+
+@wallet_router.get("/{wallet_id}/statement")
+async def get_statement(
+    wallet_id: uuid.UUID,
+    date_from: date,
+    date_to: date,
+    user: CurrentUser = Depends(get_current_user),
+    session: AsyncSession = Depends(ReadSessionDep),
+) -> WalletStatement:
+    """daily statement and totals for period, read from rollups"""
+    if date_to < date_from:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="bad date range"
+        )
+    await get_own_wallet(wallet_id, user, session)
+    days = [
+        DailyBalance.model_validate(day)
+        for day in await WalletDailyBalanceDAO.statement(
+            wallet_id, date_from, date_to, session
+        )
+    ]
+    return WalletStatement(
+        wallet_id=wallet_id,
+        date_from=date_from,
+        date_to=date_to,
+        opening_balance=days[0].opening_balance if days else None,
+        closing_balance=days[-1].closing_balance if days else None,
+        credits=sum((day.credits for day in days), Decimal(0)),
+        debits=sum((day.debits for day in days), Decimal(0)),
+        operations=sum(day.operations for day in days),
+        days=days,
+    )
+
+
+@wallet_router.get("/{wallet_id}/export")
+async def export_transactions(
+    wallet_id: uuid.UUID,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    gzip: bool = False,
+    user: CurrentUser = Depends(get_current_user),
+    session: AsyncSession = Depends(ReadSessionDep),
+) -> StreamingResponse:
+    """full ledger of period as csv, streamed from a server-side cursor"""
+    if date_from and date_to and date_to < date_from:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="bad date range"
+        )
+    await get_own_wallet(wallet_id, user, session)
+    # the stream opens its own session, don't hold this connection meanwhile
+    await database_manager.release(session)
+    filename = f"wallet-{wallet_id}-{date_from or 'start'}-{date_to or 'now'}.csv"
+    if gzip:
+        filename += ".gz"
+    return StreamingResponse(
+        csv_chunks(
+            ledger_partitions(
+                wallet_id, *period_bounds(date_from, date_to), as_text=True
+            ),
+            gzip,
+        ),
+        media_type="application/gzip" if gzip else "text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
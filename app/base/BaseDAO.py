@@ -1,70 +1,365 @@
-from typing import Generic, TypeVar
-from sqlalchemy import select, update, insert
+from typing import (
+    Any,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Generic,
+    Iterable,
+    Sequence,
+    TypeVar,
+)
+from sqlalchemy import bindparam, event, select, update, insert, text, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
 from app.base.database import Base
+from app.core.shared_cache import shared_cache
 from pydantic import BaseModel
 from loguru import logger
 
 T = TypeVar("T", bound=Base)
 
+# asyncpg accepts at most 32767 bind parameters per statement
+MAX_PARAMS = 32_000
+
+# select constructs by (model, filter keys, null keys, limit), values are bound
+# at execute time so lookups of one shape share one construct and cache key
+_statements: dict[tuple, Any] = {}
+
+AFTER_COMMIT = "after_commit"
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], Awaitable]):
+    """await callback once the transaction of session commits, drop it on rollback
+
+    Cache invalidation runs here, so readers can't refill a cache with rows
+    of an uncommitted transaction and rolled back writes publish nothing.
+    """
+    session.sync_session.info.setdefault(AFTER_COMMIT, []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session):
+    # commit of an AsyncSession runs in a greenlet, so awaiting is allowed
+    for callback in session.info.pop(AFTER_COMMIT, ()):
+        await_only(callback())
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit(session: Session):
+    session.info.pop(AFTER_COMMIT, None)
+
+
+async def _chunks(
+    data: Iterable[BaseModel | dict] | AsyncIterable[BaseModel | dict], size: int
+):
+    """yield lists of row dicts from sync or async iterable"""
+    chunk: list[dict[str, Any]] = []
+    if hasattr(data, "__aiter__"):
+        async for item in data:
+            chunk.append(item.model_dump() if isinstance(item, BaseModel) else item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    else:
+        for item in data:
+            chunk.append(item.model_dump() if isinstance(item, BaseModel) else item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
 
 class BaseDAO(Generic[T]):
     """Base class for DAO classes"""
 
     model: type[T]
+    # read-through redis cache for lookups by id, records come back detached
+    # and without the model's secret_columns
+    cached: bool = False
 
     def __init__(self, session: AsyncSession):
         self.session = session
         if self.model is None:
             raise ValueError("в дочернем классе должна быть указанна модель")
 
+    @classmethod
+    def _filter_statement(cls, filter_dict: dict, limit: int | None = None):
+        """cached select by equality on filter keys, None values mean IS NULL"""
+        keys = tuple(sorted(k for k, v in filter_dict.items() if v is not None))
+        nulls = tuple(sorted(k for k, v in filter_dict.items() if v is None))
+        cache_key = (cls.model, keys, nulls, limit)
+        query = _statements.get(cache_key)
+        if query is None:
+            model = cls.model
+            query = select(model).where(
+                *(getattr(model, k) == bindparam(f"f_{k}") for k in keys),
+                *(getattr(model, k).is_(None) for k in nulls),
+            )
+            if limit is not None:
+                query = query.limit(limit)
+            _statements[cache_key] = query
+        return query, {f"f_{k}": filter_dict[k] for k in keys}
+
     @classmethod
     async def find_one_or_none_by_id(cls, id, session: AsyncSession):
         """find by id"""
-        logger.info(f"Find {cls.model.__name__} with id {id}")
+        logger.debug("Find {} with id {}", cls.model.__name__, id)
         try:
-            query = select(cls.model).filter_by(id=id)
-            result = await session.execute(query)
-            record = result.scalar_one_or_none()
+            if cls.cached:
+                record = await shared_cache.get_or_load(
+                    cls.model, id, lambda: cls._load_by_id(id, session)
+                )
+            else:
+                record = await cls._load_by_id(id, session)
             if record:
-                logger.info(f"Find record with ID {id}")
+                logger.debug("Find record with ID {}", id)
             else:
-                logger.info(f"Record with ID {id} not found.")
+                logger.debug("Record with ID {} not found.", id)
             return record
         except Exception as e:
             logger.error(f"Error in find_one_or_none_by_id: {e}")
             raise
 
+    @classmethod
+    async def _load_by_id(cls, id, session: AsyncSession):
+        query, params = cls._filter_statement({"id": id})
+        result = await session.execute(query, params)
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def find_many_by_ids(cls, ids: list, session: AsyncSession) -> dict:
+        """find records by ids, cached ones are taken from redis in one round trip"""
+        logger.debug("Find {} {} by ids", len(ids), cls.model.__name__)
+        found = await shared_cache.get_many(cls.model, ids) if cls.cached else {}
+        missing = [id for id in ids if id not in found]
+        if missing:
+            try:
+                query = _statements.get((cls.model, "ids"))
+                if query is None:
+                    query = _statements[(cls.model, "ids")] = select(cls.model).where(
+                        cls.model.id.in_(bindparam("ids", expanding=True))
+                    )
+                result = await session.execute(query, {"ids": missing})
+            except SQLAlchemyError as e:
+                logger.error(f"Error in find_many_by_ids: {e}")
+                raise
+            records = result.scalars().all()
+            if cls.cached:
+                await shared_cache.set_many(records)
+            found.update({record.id: record for record in records})
+        return found
+
     @classmethod
     async def find_all_by_filter(cls, filter: BaseModel, session: AsyncSession):
         """find by filter"""
-        logger.info(f"Find {cls.model.__name__} by {filter.__class__.__name__}")
+        logger.debug("Find {} by {}", cls.model.__name__, filter.__class__.__name__)
         filter_dict = filter.model_dump(exclude_unset=True)
-        print(filter_dict)
         try:
-            query = select(cls.model).filter_by(**filter_dict)
-            result = await session.execute(query)
+            query, params = cls._filter_statement(filter_dict)
+            result = await session.execute(query, params)
             record = result.scalars().all()
             if record:
-                logger.info(f"Find record {cls.model.__name__}")
+                logger.debug("Find record {}", cls.model.__name__)
             else:
-                logger.info(f"Record not found by filter {filter}")
+                logger.debug("Record not found by filter {}", filter.__class__.__name__)
             return record
         except SQLAlchemyError as e:
             logger.error(f"Error in find_all_by_filter: {e}")
             raise
 
+    @classmethod
+    async def find_first_by_filter(cls, filter: BaseModel, session: AsyncSession):
+        """find first record by filter with LIMIT 1"""
+        logger.debug(
+            "Find first {} by {}", cls.model.__name__, filter.__class__.__name__
+        )
+        filter_dict = filter.model_dump(exclude_unset=True)
+        try:
+            query, params = cls._filter_statement(filter_dict, limit=1)
+            result = await session.execute(query, params)
+            return result.scalars().first()
+        except SQLAlchemyError as e:
+            logger.error(f"Error in find_first_by_filter: {e}")
+            raise
+
+    @classmethod
+    async def update(cls, filter: BaseModel, data: BaseModel, session: AsyncSession):
+        """update records by filter, returns updated records"""
+        logger.debug("Update {} by {}", cls.model.__name__, filter.__class__.__name__)
+        filter_dict = filter.model_dump(exclude_unset=True)
+        values = data.model_dump(exclude_unset=True)
+        values.update(cls._extra_update_values())
+        try:
+            query = (
+                update(cls.model)
+                .filter_by(**filter_dict)
+                .values(**values)
+                .returning(cls.model)
+                .execution_options(synchronize_session="fetch")
+            )
+            result = await session.execute(query)
+            records = result.scalars().all()
+            await session.flush()
+            logger.info(f"Updated {len(records)} records of {cls.model.__name__}")
+            cls._after_write(records, session)
+            return records
+        except SQLAlchemyError as e:
+            logger.error(f"Error in update: {e}")
+            raise
+
+    @classmethod
+    def _extra_update_values(cls) -> dict:
+        """values added to every update, e.g. version counters"""
+        return {}
+
+    @classmethod
+    def _written_columns(cls) -> tuple:
+        """columns bulk writes return for _after_write"""
+        return (cls.model.id,)
+
+    @classmethod
+    def _after_write(cls, rows: Sequence, session: AsyncSession):
+        """drop cached snapshots of updated or inserted rows after commit"""
+        if cls.cached and rows:
+            ids = [row.id for row in rows]
+            after_commit(session, lambda: shared_cache.invalidate(cls.model, ids))
+
     @classmethod
     async def add(cls, data: BaseModel, session: AsyncSession):
-        logger.info(f"Recived Data: {data}")
+        logger.debug("Add {} to {}", data.__class__.__name__, cls.model.__name__)
         instance = data.model_dump()
         new_instance = cls.model(**instance)
         session.add(new_instance)
         try:
             await session.flush()
-            logger.info(f"data add to {cls.model.__name__}")
+            logger.debug("data add to {}", cls.model.__name__)
             return new_instance
         except SQLAlchemyError as e:
             logger.error(f"Can't add data to {cls.model.__name__} error:{e}")
             raise
+
+    @classmethod
+    async def add_many(
+        cls,
+        data: Iterable[BaseModel] | AsyncIterable[BaseModel],
+        session: AsyncSession,
+        chunk_size: int = 1000,
+    ) -> list:
+        """insert many rows with executemany batches, returns ids in input order"""
+        rows = []
+        query = insert(cls.model).returning(
+            *cls._written_columns(), sort_by_parameter_order=True
+        )
+        try:
+            async for chunk in _chunks(data, chunk_size):
+                result = await session.execute(query, chunk)
+                rows.extend(result.all())
+                logger.debug(f"Inserted {len(chunk)} rows to {cls.model.__name__}")
+        except SQLAlchemyError as e:
+            logger.error(f"Can't add data to {cls.model.__name__} error:{e}")
+            raise
+        logger.info(f"Inserted {len(rows)} rows to {cls.model.__name__}")
+        cls._after_write(rows, session)
+        return [row.id for row in rows]
+
+    @classmethod
+    async def upsert_many(
+        cls,
+        data: Iterable[BaseModel] | AsyncIterable[BaseModel],
+        session: AsyncSession,
+        conflict_columns: Sequence[str] | None = None,
+        update_columns: Sequence[str] | None = None,
+        chunk_size: int = 1000,
+    ) -> list:
+        """INSERT ... ON CONFLICT DO UPDATE ... RETURNING id
+
+        conflict_columns defaults to the primary key, update_columns to every
+        given column except conflict ones, updated_at is always refreshed and
+        updates get _extra_update_values like update() does.
+        """
+        if conflict_columns is None:
+            conflict_columns = [c.name for c in cls.model.__table__.primary_key]
+        rows = []
+        try:
+            async for chunk in _chunks(data, chunk_size):
+                columns = list(chunk[0])
+                # big chunks of wide rows would hit the bind parameter limit
+                step = max(1, MAX_PARAMS // len(columns))
+                for start in range(0, len(chunk), step):
+                    query = pg_insert(cls.model).values(chunk[start : start + step])
+                    to_update = update_columns or [
+                        c for c in columns if c not in conflict_columns
+                    ]
+                    set_ = {c: query.excluded[c] for c in to_update}
+                    set_["updated_at"] = func.now()  # pylint: disable=E1102
+                    set_.update(cls._extra_update_values())
+                    query = query.on_conflict_do_update(
+                        index_elements=list(conflict_columns), set_=set_
+                    ).returning(*cls._written_columns())
+                    result = await session.execute(query)
+                    rows.extend(result.all())
+        except SQLAlchemyError as e:
+            logger.error(f"Can't upsert data to {cls.model.__name__} error:{e}")
+            raise
+        logger.info(f"Upserted {len(rows)} rows to {cls.model.__name__}")
+        cls._after_write(rows, session)
+        return [row.id for row in rows]
+
+    @classmethod
+    async def bulk_load(
+        cls,
+        data: Iterable[BaseModel] | AsyncIterable[BaseModel],
+        session: AsyncSession,
+        chunk_size: int = 10_000,
+    ) -> list:
+        """COPY rows to temp table, then move them with one INSERT ... SELECT
+
+        The fastest path for big imports; ids (in no particular order) are
+        returned even for serial primary keys because the final insert
+        uses RETURNING.
+        """
+        table = cls.model.__table__.name
+        staging = f"_bulk_{table}"
+        connection = await session.connection()
+        raw = (await connection.get_raw_connection()).driver_connection
+        columns: list[str] | None = None
+        loaded = 0
+        try:
+            await session.execute(
+                text(
+                    f"CREATE TEMP TABLE IF NOT EXISTS {staging} "
+                    f"(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+            )
+            await session.execute(text(f"TRUNCATE {staging}"))
+            async for chunk in _chunks(data, chunk_size):
+                columns = columns or list(chunk[0])
+                await raw.copy_records_to_table(
+                    staging,
+                    records=[tuple(row[c] for c in columns) for row in chunk],
+                    columns=columns,
+                )
+                loaded += len(chunk)
+                logger.debug(f"Copied {loaded} rows for {cls.model.__name__}")
+            if not columns:
+                return []
+            column_list = ", ".join(columns)
+            returning = ", ".join(column.name for column in cls._written_columns())
+            result = await session.execute(
+                text(
+                    f"INSERT INTO {table} ({column_list}) "
+                    f"SELECT {column_list} FROM {staging} RETURNING {returning}"
+                )
+            )
+            rows = result.all()
+            await session.execute(text(f"TRUNCATE {staging}"))
+        except Exception as e:
+            logger.error(f"Can't bulk load data to {cls.model.__name__} error:{e}")
+            raise
+        logger.info(f"Bulk loaded {len(rows)} rows to {cls.model.__name__}")
+        cls._after_write(rows, session)
+        return [row.id for row in rows]
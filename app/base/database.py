@@ -11,20 +11,54 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, declared_attr
 from app.core.config import db_settings
+from app.core.log import install_slow_query_log
+from app.core.metrics import TimedQueuePool, instrument_engine
 
-engine = create_async_engine(
-    url=db_settings.DB_URL,
-    echo=True,
-    pool_size=5,
-    max_overflow=10,
-    pool_timeout=60,
-    pool_pre_ping=True,
-)
+
+def make_engine(url: str):
+    """engine with pool, statement caches and instrumentation hooks"""
+    connect_args = {}
+    if url.startswith("postgresql+asyncpg"):
+        # asyncpg keeps prepared statements per connection, repeated
+        # shapes skip parse and planning on the server
+        connect_args["prepared_statement_cache_size"] = (
+            db_settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+        )
+    return create_async_engine(
+        url=url,
+        echo=False,
+        # DAO error logs print str(exc), keep password hashes and emails out
+        hide_parameters=True,
+        pool_size=5,
+        max_overflow=10,
+        pool_timeout=60,
+        pool_pre_ping=True,
+        poolclass=TimedQueuePool,
+        query_cache_size=db_settings.DB_QUERY_CACHE_SIZE,
+        connect_args=connect_args,
+    )
+
+
+engine = make_engine(db_settings.DB_URL)
+
+install_slow_query_log(engine.sync_engine)
+instrument_engine(engine.sync_engine)
 
 async_session = async_sessionmaker(
     bind=engine, class_=AsyncSession, expire_on_commit=False
 )
 
+replica_engines = [make_engine(url) for url in db_settings.DB_REPLICA_URLS]
+
+for number, replica_engine in enumerate(replica_engines):
+    install_slow_query_log(replica_engine.sync_engine)
+    instrument_engine(replica_engine.sync_engine, name=f"replica{number}")
+
+replica_sessions = [
+    async_sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False)
+    for replica_engine in replica_engines
+]
+
 str_uniq = Annotated[str, mapped_column(unique=True, nullable=False)]
 
 
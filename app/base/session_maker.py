@@ -1,22 +1,113 @@
+import asyncio
+import itertools
+import time
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator, Callable
-from fastapi import Depends
+from typing import AsyncGenerator, Callable, Sequence
+from starlette.requests import Request
+from starlette.responses import Response
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+from sqlalchemy.orm import Session
 from loguru import logger
-from app.base.database import async_session
+from app.base.database import async_session, replica_sessions
+from app.core.config import db_settings
+from app.core.metrics import db_commit_duration, db_transaction_duration
+
+STICKY_COOKIE = "db_primary"
+
+
+class Replica:
+    """read replica with load counter, ejected ones wait for a probe"""
+
+    def __init__(self, name: str, session_maker: async_sessionmaker[AsyncSession]):
+        self.name = name
+        self.session_maker = session_maker
+        self.engine = session_maker.kw["bind"]
+        self.in_use = 0
+        self.ejected = False
+        self.probe_at = 0.0
+        self.probing = False
+        self.failures = 0
+
+    @property
+    def healthy(self) -> bool:
+        return not self.ejected
+
+    def eject(self, seconds: float):
+        self.failures += 1
+        self.ejected = True
+        self.probe_at = time.monotonic() + seconds
+
+    @property
+    def due_for_probe(self) -> bool:
+        return self.ejected and not self.probing and self.probe_at <= time.monotonic()
+
+
+CONNECT = "connect"
+BIND = "bind"
+
+
+class ReplicaSession(Session):
+    """picks its bind on first statement through info[CONNECT]
+
+    The callback returns a checked out replica Connection, or the primary
+    Engine when the replica can't be reached. The connection is owned here
+    and returned to the pool on close.
+    """
+
+    def get_bind(self, mapper=None, **kw):
+        bind = self.info.get(BIND)
+        if bind is None or isinstance(bind, Connection) and bind.closed:
+            bind = self.info[BIND] = self.info[CONNECT]()
+        return bind
+
+    def close(self):
+        super().close()
+        bind = self.info.pop(BIND, None)
+        if isinstance(bind, Connection):
+            bind.close()
+
+
+def is_connection_error(error: Exception) -> bool:
+    """errors that mean server is gone, not a bad query"""
+    if isinstance(error, DBAPIError):
+        return error.connection_invalidated or isinstance(
+            error.orig, (OSError, ConnectionError)
+        )
+    return isinstance(error, (OSError, ConnectionError))
 
 
 class DBSessionManager:
 
-    def __init__(self, session_maker: async_sessionmaker[AsyncSession]):
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        replica_makers: Sequence[async_sessionmaker[AsyncSession]] = (),
+        policy: str = "round_robin",
+        sticky_seconds: int = 5,
+        eject_seconds: int = 30,
+    ):
         self.session_maker = session_maker
+        self.replicas = [
+            Replica(f"replica{number}", maker)
+            for number, maker in enumerate(replica_makers)
+        ]
+        self.policy = policy
+        self.sticky_seconds = sticky_seconds
+        self.eject_seconds = eject_seconds
+        self._round_robin = itertools.count()
+        self._probes: set[asyncio.Task] = set()
+        self.primary_reads = 0
 
     @asynccontextmanager
     async def create_session(self) -> AsyncGenerator[AsyncSession, None]:
         """context manager for sessions"""
         async with self.session_maker() as session:
             try:
-                yield session
+                with db_transaction_duration.time(scope="session"):
+                    yield session
             except Exception as e:
                 logger.error(f"Error with create session:{e}")
                 await session.rollback()
@@ -31,29 +122,190 @@ class DBSessionManager:
         """Context manager for use transactions"""
         async with session.begin():
             try:
+                with db_transaction_duration.time(scope="transaction"):
+                    yield
+                with db_commit_duration.time():
+                    await session.commit()
+            except Exception as e:
+                logger.error(f"Error with transaction {e}")
+                await session.rollback()
+                raise
+
+    @asynccontextmanager
+    async def create_lazy_transaction(
+        self, session: AsyncSession
+    ) -> AsyncGenerator[None, None]:
+        """transaction that checks out a connection on first statement,
+        handler may hand it back early with release()"""
+        try:
+            with db_transaction_duration.time(scope="transaction"):
                 yield
+            if session.in_transaction():
+                with db_commit_duration.time():
+                    await session.commit()
+        except Exception as e:
+            logger.error(f"Error with transaction {e}")
+            await session.rollback()
+            raise
+
+    @staticmethod
+    async def release(session: AsyncSession):
+        """commit now and return connection to pool before cpu bound work,
+        next statement autobegins a new transaction"""
+        if session.in_transaction():
+            with db_commit_duration.time():
                 await session.commit()
+
+    def pick_replica(self) -> Replica | None:
+        """healthy replica by policy, None when all are ejected"""
+        for replica in self.replicas:
+            if replica.due_for_probe:
+                replica.probing = True
+                probe = asyncio.create_task(self._probe(replica))
+                self._probes.add(probe)
+                probe.add_done_callback(self._probes.discard)
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self.policy == "least_loaded":
+            return min(healthy, key=lambda replica: replica.in_use)
+        return healthy[next(self._round_robin) % len(healthy)]
+
+    def _eject(self, replica: Replica, error: Exception):
+        logger.warning(
+            "Ejecting {} for {}s: {}", replica.name, self.eject_seconds, error
+        )
+        replica.eject(self.eject_seconds)
+
+    async def _probe(self, replica: Replica):
+        """readmit ejected replica only once it answers again"""
+        try:
+            async with replica.engine.connect() as connection:
+                await connection.execute(text("select 1"))
+        except Exception as e:  # pylint: disable=broad-except
+            self._eject(replica, e)
+        else:
+            logger.info("Readmitting {}", replica.name)
+            replica.ejected = False
+        finally:
+            replica.probing = False
+
+    def _connect(self, replica: Replica) -> Callable[[], Connection | Engine]:
+        """replica connection, primary engine if replica refuses to connect"""
+
+        def connect():
+            try:
+                return replica.engine.sync_engine.connect()
             except Exception as e:
-                logger.error(f"Error with transaction {e}")
+                if not is_connection_error(e):
+                    raise
+                self._eject(replica, e)
+                self.primary_reads += 1
+                return self.session_maker.kw["bind"].sync_engine
+
+        return connect
+
+    @asynccontextmanager
+    async def create_read_session(
+        self, primary: bool = False
+    ) -> AsyncGenerator[AsyncSession, None]:
+        """session on a replica, primary when none is healthy
+
+        Nothing is checked out until the first statement, so handlers that
+        answer from caches never touch the pool. A replica failing on
+        connect is ejected and the read goes to the primary instead; one
+        failing later fails that request. Ejected replicas are probed
+        before they get reads again.
+        """
+        replica = None if primary else self.pick_replica()
+        if replica is None:
+            self.primary_reads += 1
+            async with self.create_session() as session:
+                yield session
+            return
+
+        replica.in_use += 1
+        async with replica.session_maker(sync_session_class=ReplicaSession) as session:
+            session.sync_session.info[CONNECT] = self._connect(replica)
+            try:
+                yield session
+            except Exception as e:
+                if is_connection_error(e):
+                    self._eject(replica, e)
                 await session.rollback()
                 raise
+            finally:
+                replica.in_use -= 1
 
     async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
         async with self.create_session() as session:
             yield session
 
-    async def get_transaction(self) -> AsyncGenerator[AsyncSession, None]:
+    def stick_to_primary(self, request: Request, response: Response):
+        """the client reads from primary for a while so it sees its own writes"""
+        request.state.db_wrote = True
+        if self.replicas:
+            response.set_cookie(
+                STICKY_COOKIE,
+                "1",
+                max_age=self.sticky_seconds,
+                httponly=True,
+                samesite="lax",
+            )
+
+    async def get_transaction(
+        self, request: Request, response: Response
+    ) -> AsyncGenerator[AsyncSession, None]:
+        self.stick_to_primary(request, response)
         async with self.create_session() as session:
-            async with self.create_transaction(session):
+            async with self.create_lazy_transaction(session):
                 yield session
 
+    async def get_read_session(
+        self, request: Request
+    ) -> AsyncGenerator[AsyncSession, None]:
+        primary = getattr(request.state, "db_wrote", False) or bool(
+            request.cookies.get(STICKY_COOKIE)
+        )
+        async with self.create_read_session(primary=primary) as session:
+            yield session
+
     @property
     def session_dependency(self) -> Callable:
         """get session dependency for fastapi"""
+        from fastapi import Depends
+
         return Depends(self.get_session)
 
+    def stats(self) -> dict:
+        return {
+            "primary_reads": self.primary_reads,
+            "replicas": {
+                replica.name: {
+                    "in_use": replica.in_use,
+                    "healthy": int(replica.healthy),
+                    "probing": int(replica.probing),
+                    "failures": replica.failures,
+                }
+                for replica in self.replicas
+            },
+        }
 
-database_manager = DBSessionManager(async_session)
 
-SessionDep = database_manager.session_dependency
+database_manager = DBSessionManager(
+    async_session,
+    replica_sessions,
+    policy=db_settings.DB_REPLICA_POLICY,
+    sticky_seconds=db_settings.DB_STICKY_SECONDS,
+    eject_seconds=db_settings.DB_REPLICA_EJECT_SECONDS,
+)
+
 TransactionDep = database_manager.get_transaction
+ReadSessionDep = database_manager.get_read_session
+
+
+def __getattr__(name: str):
+    # fastapi is imported on first use, cli entry points never need it
+    if name == "SessionDep":
+        return database_manager.session_dependency
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
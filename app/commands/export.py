@@ -0,0 +1,67 @@
+"""export the ledger of one wallet to a local csv or parquet file
+
+usage:
+    python -m app.commands.export WALLET_ID --from 2024-01-01 --to 2024-12-31
+    python -m app.commands.export WALLET_ID --format csv --gzip -o ledger.csv.gz
+    python -m app.commands.export WALLET_ID --format parquet -o ledger.parquet
+Rows are streamed from a server-side cursor (a replica when DB_REPLICA_URLS
+is set) in EXPORT_BATCH_SIZE partitions. Parquet needs pyarrow
+(pip install -r requirements-export.txt) and gets one row group per
+partition.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import date
+from loguru import logger
+from app.core.export import csv_chunks, ledger_partitions, period_bounds, write_parquet
+from app.models.user import User  # noqa: F401, mappers need User
+
+
+async def export(args):
+    started = time.perf_counter()
+    partitions = ledger_partitions(
+        args.wallet_id,
+        *period_bounds(args.date_from, args.date_to),
+        args.batch,
+        as_text=args.format == "csv",
+    )
+    output = args.output or f"wallet-{args.wallet_id}.{args.format}"
+    if args.format == "parquet":
+        rows = await write_parquet(partitions, output, args.compression)
+    else:
+        if args.gzip and not args.output:
+            output += ".gz"
+        rows = 0
+
+        async def counted():
+            nonlocal rows
+            async for partition in partitions:
+                rows += len(partition)
+                yield partition
+
+        with open(output, "wb") as file:
+            async for chunk in csv_chunks(counted(), args.gzip):
+                file.write(chunk)
+    logger.info(
+        "Exported {} rows to {} in {:.1f}s", rows, output, time.perf_counter() - started
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("wallet_id", type=uuid.UUID)
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--gzip", action="store_true", help="gzip csv output")
+    parser.add_argument(
+        "--compression", default="zstd", help="parquet codec, none to disable"
+    )
+    parser.add_argument("--batch", type=int, help="rows per partition")
+    parser.add_argument("-o", "--output")
+    asyncio.run(export(parser.parse_args()))
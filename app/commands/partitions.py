@@ -0,0 +1,42 @@
+"""maintenance of monthly transactions partitions
+
+usage: python -m app.commands.partitions --ahead 3 --retain 24 [--drop]
+Creates partitions for the current and next months and detaches partitions
+older than the retention window; with --drop they are dropped as well.
+"""
+
+import argparse
+import asyncio
+from datetime import date
+from app.base.session_maker import database_manager
+from app.models.payments import TransactionDAO
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+async def maintain(ahead: int, retain: int | None, drop: bool):
+    this_month = date.today().replace(day=1)
+    async with database_manager.create_session() as session:
+        async with session.begin():
+            for offset in range(ahead + 1):
+                await TransactionDAO.create_partition(
+                    add_months(this_month, offset), session
+                )
+            if retain is not None:
+                await TransactionDAO.retire_partitions(
+                    add_months(this_month, -retain), session, drop=drop
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ahead", type=int, default=3, help="months to pre-create")
+    parser.add_argument(
+        "--retain", type=int, default=None, help="months of history to keep"
+    )
+    parser.add_argument("--drop", action="store_true", help="drop retired partitions")
+    args = parser.parse_args()
+    asyncio.run(maintain(args.ahead, args.retain, args.drop))
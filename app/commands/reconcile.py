@@ -0,0 +1,252 @@
+"""check that wallet balances match their ledger chain
+
+usage:
+    python -m app.commands.reconcile --shards 16 --workers 4 --rate 2000
+    python -m app.commands.reconcile --resume        # continue last run
+Wallet uuid space is split into shards worked by async workers. Every batch
+of wallets is read in one REPEATABLE READ snapshot (from a replica when
+DB_REPLICA_URLS is set) and its ledger is streamed in seq order. Wallets
+older than the oldest partition may have lost history to retirement, their
+chain starts at the first retained row. Issues and the shard checkpoint are written together, so a killed
+run continues with --resume without duplicate issues. --rate caps checked
+wallets per second across workers and --pause sleeps after every batch.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from loguru import logger
+from sqlalchemy import text
+from app.base.session_maker import database_manager
+from app.models.user import User  # noqa: F401, mappers need User
+from app.models.payments import TransactionDAO, WalletDAO
+from app.models.reconciliation import ReconciliationCheckpoint, ReconciliationDAO
+
+CREDIT_TYPES = {"deposit", "transfer_in"}
+
+
+def shard_bounds(shard: int, shards: int) -> tuple[uuid.UUID | None, uuid.UUID | None]:
+    """exclusive (after, upper) ids of shard"""
+    low = shard * 2**128 // shards
+    high = (shard + 1) * 2**128 // shards
+    after = uuid.UUID(int=low - 1) if low else None
+    upper = uuid.UUID(int=high) if high < 2**128 else None
+    return after, upper
+
+
+class Pacer:
+    """spaces batches so workers together stay under rate items per second"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._next = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def wait(self, items: int):
+        if not self.rate:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + items / self.rate
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class WalletCheck:
+    """running chain check of one wallet, fed its ledger in seq order
+
+    complete is False when older rows may be in retired partitions, then
+    the chain and the total start at balance_before of the first row.
+    """
+
+    def __init__(self, run_id: int, wallet_id: uuid.UUID, complete: bool = True):
+        self.run_id = run_id
+        self.wallet_id = wallet_id
+        self.previous: Decimal | None = Decimal(0) if complete else None
+        self.total = Decimal(0)
+        self.rows = 0
+        self.issues: list[dict] = []
+
+    def issue(self, kind: str, expected, actual, transaction_id=None):
+        self.issues.append(
+            {
+                "run_id": self.run_id,
+                "wallet_id": self.wallet_id,
+                "kind": kind,
+                "transaction_id": transaction_id,
+                "expected": expected,
+                "actual": actual,
+            }
+        )
+
+    def feed(self, row):
+        if self.previous is None:
+            self.previous = self.total = row.balance_before
+        delta = row.amount if row.operation_type in CREDIT_TYPES else -row.amount
+        self.total += delta
+        if row.balance_before != self.previous:
+            kind = "chain" if self.rows else "opening_balance"
+            self.issue(kind, self.previous, row.balance_before, row.id)
+        if row.balance_after - row.balance_before != delta:
+            self.issue("amount", row.balance_before + delta, row.balance_after, row.id)
+        self.previous = row.balance_after
+        self.rows += 1
+
+    def finish(self, balance: Decimal) -> list[dict]:
+        if self.previous is None:
+            # whole history is retired, nothing to check against
+            return self.issues
+        if self.previous != balance:
+            self.issue("balance", self.previous, balance)
+        if self.total != balance:
+            self.issue("total", self.total, balance)
+        return self.issues
+
+
+async def check_batch(
+    run_id: int, after, upper, batch: int, retained_from: datetime | None
+):
+    """wallets after `after` and their ledger from one snapshot
+
+    retained_from is the start of the oldest partition, None when nothing
+    was retired.
+    """
+    async with database_manager.create_read_session() as session:
+        # first statement of the transaction, replica sessions are connected already
+        await session.execute(
+            text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        )
+        wallets = await WalletDAO.find_id_range(after, upper, batch, session)
+        if not wallets:
+            return wallets, 0, []
+        checks = {
+            wallet.id: WalletCheck(
+                run_id,
+                wallet.id,
+                retained_from is None or wallet.created_at >= retained_from,
+            )
+            for wallet in wallets
+        }
+        async for row in TransactionDAO.stream_ledger(list(checks), session):
+            checks[row.wallet_id].feed(row)
+        await session.rollback()
+    issues = []
+    for wallet in wallets:
+        issues.extend(checks[wallet.id].finish(wallet.balance))
+    return wallets, sum(check.rows for check in checks.values()), issues
+
+
+async def run_shard(
+    run_id: int,
+    shards: int,
+    checkpoint: ReconciliationCheckpoint,
+    batch: int,
+    pause: float,
+    pacer: Pacer,
+    limit: asyncio.Semaphore,
+    retained_from: datetime | None,
+):
+    after, upper = shard_bounds(checkpoint.shard, shards)
+    after = checkpoint.last_wallet_id or after
+    async with limit:
+        while True:
+            await pacer.wait(batch)
+            wallets, transactions, issues = await check_batch(
+                run_id, after, upper, batch, retained_from
+            )
+            done = len(wallets) < batch
+            last = wallets[-1][0] if wallets else None
+            async with database_manager.create_session() as session:
+                async with session.begin():
+                    await ReconciliationDAO.save_progress(
+                        run_id,
+                        checkpoint.shard,
+                        last,
+                        len(wallets),
+                        transactions,
+                        issues,
+                        done,
+                        session,
+                    )
+            for found in issues:
+                logger.warning(
+                    "Wallet {} {} mismatch: expected {} got {}",
+                    found["wallet_id"],
+                    found["kind"],
+                    found["expected"],
+                    found["actual"],
+                )
+            if done:
+                break
+            after = last
+            if pause:
+                await asyncio.sleep(pause)
+    logger.info(f"Shard {checkpoint.shard} of run {run_id} checked")
+
+
+async def reconcile(args):
+    async with database_manager.create_session() as session:
+        async with session.begin():
+            run_id = None
+            if args.resume:
+                run_id = await ReconciliationDAO.last_unfinished_run(session)
+            if run_id is None:
+                run_id = await ReconciliationDAO.start_run(args.shards, session)
+            checkpoints = await ReconciliationDAO.get_checkpoints(run_id, session)
+            partitions = await TransactionDAO.list_partitions(session)
+    # wallets created before the oldest partition may miss retired rows
+    retained_from = (
+        datetime.combine(partitions[0][1], datetime.min.time()) if partitions else None
+    )
+    shards = len(checkpoints)
+    pending = [checkpoint for checkpoint in checkpoints if not checkpoint.done]
+    logger.info(f"Run {run_id}: {len(pending)} of {shards} shards to check")
+
+    pacer = Pacer(args.rate)
+    limit = asyncio.Semaphore(args.workers)
+    await asyncio.gather(
+        *(
+            run_shard(
+                run_id,
+                shards,
+                checkpoint,
+                args.batch,
+                args.pause,
+                pacer,
+                limit,
+                retained_from,
+            )
+            for checkpoint in pending
+        )
+    )
+
+    async with database_manager.create_session() as session:
+        async with session.begin():
+            await ReconciliationDAO.finish_run(run_id, session)
+            checkpoints = await ReconciliationDAO.get_checkpoints(run_id, session)
+    logger.info(
+        "Run {}: {} wallets, {} ledger rows, {} issues",
+        run_id,
+        sum(c.wallets for c in checkpoints),
+        sum(c.transactions for c in checkpoints),
+        sum(c.issues for c in checkpoints),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=200, help="wallets per snapshot")
+    parser.add_argument(
+        "--rate", type=float, default=0, help="max wallets per second, 0 is no limit"
+    )
+    parser.add_argument("--pause", type=float, default=0, help="seconds after batch")
+    parser.add_argument("--resume", action="store_true")
+    asyncio.run(reconcile(parser.parse_args()))
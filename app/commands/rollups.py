@@ -0,0 +1,78 @@
+"""daily balance rollups maintenance
+
+usage:
+    python -m app.commands.rollups refresh
+    python -m app.commands.rollups backfill --workers 4
+Backfill rebuilds rollups month by month in parallel sessions while holding
+the watermark lock, then moves the watermark, so background refreshes just
+skip until it is done. It folds rows of transactions finished before it
+started, later ones are left to refresh.
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from loguru import logger
+from app.core.rollups import refresh_rollups
+from app.base.session_maker import database_manager
+from app.models.payments import Transaction
+from app.models.rollups import WalletDailyBalanceDAO, snapshot_xmin
+
+
+def month_chunks(start: datetime, end: datetime):
+    month = start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month <= end:
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        yield max(month, start), min(next_month, end + timedelta(microseconds=1))
+        month = next_month
+
+
+async def rebuild_chunk(
+    start: datetime, end: datetime, bound: int, limit: asyncio.Semaphore
+):
+    async with limit:
+        async with database_manager.create_session() as session:
+            async with session.begin():
+                rows = await WalletDailyBalanceDAO.rebuild_range(
+                    start, end, bound, session
+                )
+        logger.info(f"Rebuilt {rows} wallet days in [{start}, {end})")
+
+
+async def backfill(workers: int):
+    async with database_manager.create_session() as session:
+        async with session.begin():
+            watermark = await WalletDailyBalanceDAO.lock_watermark(session, wait=True)
+            # one snapshot: every row below bound is visible to min and max
+            bound, first, last = (
+                await session.execute(
+                    select(
+                        snapshot_xmin(),
+                        func.min(Transaction.created_at),
+                        func.max(Transaction.created_at),
+                    )
+                )
+            ).one()
+            if first is not None:
+                limit = asyncio.Semaphore(workers)
+                await asyncio.gather(
+                    *(
+                        rebuild_chunk(start, end, bound, limit)
+                        for start, end in month_chunks(first, last)
+                    )
+                )
+            watermark.last_txid = bound
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("action", choices=["refresh", "backfill"])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    if args.action == "refresh":
+        asyncio.run(refresh_rollups())
+    else:
+        asyncio.run(backfill(args.workers))
@@ -0,0 +1,195 @@
+"""admission control for CPU-heavy auth endpoints"""
+
+import math
+import time
+from fastapi import HTTPException, Request, status
+from loguru import logger
+from app.core.auth import PasswordHasher, password_hasher
+from app.core.cache import TTLCache
+from app.core.config import admission_settings
+from app.core.shared_cache import SharedCache, shared_cache
+
+# KEYS[1] bucket, ARGV rate, burst, now; returns seconds to wait, 0 if taken
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    """in-process token buckets, idle ones are evicted by LRU"""
+
+    def __init__(self, rate: float, burst: int, maxsize: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = TTLCache(maxsize=maxsize, ttl=burst / rate + 1)
+
+    async def take(self, key: str) -> float:
+        """take token, returns seconds to wait if bucket is empty"""
+        now = time.monotonic()
+        tokens, ts = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - ts) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets.set(key, (tokens, now))
+        return wait
+
+
+class RedisTokenBucket(TokenBucket):
+    """token buckets shared by workers, local ones are used while redis is down"""
+
+    def __init__(self, rate: float, burst: int, cache: SharedCache):
+        super().__init__(rate, burst)
+        self.cache = cache
+
+    async def take(self, key: str) -> float:
+        # the in-memory stand-in has no scripting, that isn't a redis failure
+        if not self.cache.enabled or not hasattr(self.cache.client, "eval"):
+            return await super().take(key)
+        try:
+            wait = await self.cache.client.eval(
+                TOKEN_BUCKET_SCRIPT,
+                1,
+                "bucket:" + key,
+                self.rate,
+                self.burst,
+                time.time(),
+            )
+            return float(wait)
+        except Exception as e:  # pylint: disable=broad-except
+            self.cache.mark_failed(e)
+            return await super().take(key)
+
+
+class AdmissionController:
+    """rejects early instead of queuing bcrypt work
+
+    Per-IP and per-email token buckets stop floods from one source, and a
+    global limit keeps the expected wait for a hashing worker under
+    target_wait: the limit adapts to the measured bcrypt time.
+    """
+
+    def __init__(
+        self,
+        hasher: PasswordHasher,
+        ip_bucket: TokenBucket,
+        email_bucket: TokenBucket,
+        target_wait: float,
+        enabled: bool = True,
+    ):
+        self.hasher = hasher
+        self.ip_bucket = ip_bucket
+        self.email_bucket = email_bucket
+        self.target_wait = target_wait
+        self.enabled = enabled
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = {"ip": 0, "email": 0, "overload": 0}
+
+    @property
+    def limit(self) -> int:
+        """admitted requests that the hashing pool serves within target_wait"""
+        if not self.hasher.service_time:
+            return self.hasher.workers * 4
+        return max(
+            self.hasher.workers,
+            int(self.target_wait / self.hasher.service_time * self.hasher.workers),
+        )
+
+    def _reject(self, reason: str, status_code: int, retry_after: float, detail: str):
+        self.rejected[reason] += 1
+        logger.warning(
+            f"Admission rejected by {reason}, retry after {retry_after:.1f}s"
+        )
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    async def __call__(self, request: Request):
+        if not self.enabled:
+            yield
+            return
+        if self.in_flight >= self.limit:
+            retry_after = (
+                self.in_flight * self.hasher.service_time / self.hasher.workers
+            )
+            self._reject(
+                "overload",
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                retry_after,
+                "server is busy",
+            )
+        ip = request.client.host if request.client else "unknown"
+        wait = await self.ip_bucket.take("ip:" + ip)
+        if wait:
+            self._reject(
+                "ip", status.HTTP_429_TOO_MANY_REQUESTS, wait, "too many requests"
+            )
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        # any json is accepted here, validation of the body comes later
+        email = body.get("email") if isinstance(body, dict) else None
+        if isinstance(email, str):
+            wait = await self.email_bucket.take("email:" + email.lower())
+            if wait:
+                self._reject(
+                    "email",
+                    status.HTTP_429_TOO_MANY_REQUESTS,
+                    wait,
+                    "too many requests",
+                )
+        self.in_flight += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "limit": self.limit,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+def _bucket(rate: float, burst: int) -> TokenBucket:
+    if admission_settings.ADMISSION_REDIS:
+        return RedisTokenBucket(rate, burst, shared_cache)
+    return TokenBucket(rate, burst)
+
+
+admission = AdmissionController(
+    hasher=password_hasher,
+    ip_bucket=_bucket(
+        admission_settings.ADMISSION_IP_RATE, admission_settings.ADMISSION_IP_BURST
+    ),
+    email_bucket=_bucket(
+        admission_settings.ADMISSION_EMAIL_RATE,
+        admission_settings.ADMISSION_EMAIL_BURST,
+    ),
+    target_wait=admission_settings.ADMISSION_TARGET_WAIT_MS / 1000,
+    enabled=admission_settings.ADMISSION_ENABLED,
+)
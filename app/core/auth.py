@@ -1,14 +1,23 @@
 """utils for register and auth user"""
 
+import asyncio
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError
 from pydantic import BaseModel
 from fastapi import Request, HTTPException, status, Depends
 from passlib.context import CryptContext
-from app.core.config import auth_settings
+from app.core.config import auth_settings, hash_settings
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.user import UserDAO
-from app.base.session_maker import SessionDep
+from app.models.user import UserDAO, User
+from app.schemas.user_schemas import CurrentUser
+from app.core.cache import identity_cache, user_versions
+from app.core.shared_cache import shared_cache
+from app.core.revocation import revocation_index
+from app.core.metrics import jwt_duration, password_hash_duration, password_hash_wait
+from app.base.session_maker import ReadSessionDep, database_manager
 from loguru import logger
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -24,14 +33,116 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def create_refresh_token(data: dict) -> str:
-    """create refresh token"""
+class PasswordHasher:
+    """run bcrypt on a bounded worker pool instead of the event loop"""
+
+    def __init__(self, workers: int, executor: str = "thread"):
+        self.workers = workers
+        self.executor_kind = executor
+        self._executor: Executor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._waiting = 0
+        self._running = 0
+        self._completed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        # moving average of one bcrypt call, seconds
+        self.service_time = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="pwd-hash"
+                )
+        return self._executor
+
+    async def _run(self, func, *args):
+        # semaphore has the same size as the pool, so waiting on it is the queue
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        loop = asyncio.get_running_loop()
+        enqueued = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        waited = time.perf_counter() - enqueued
+        password_hash_wait.observe(waited)
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        self._running += 1
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            password_hash_duration.observe(elapsed, operation=func.__name__)
+            if self.service_time:
+                self.service_time += (elapsed - self.service_time) * 0.2
+            else:
+                self.service_time = elapsed
+            self._running -= 1
+            self._completed += 1
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        """hash password in worker pool"""
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """verify password in worker pool"""
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        """queue depth and wait time of the pool"""
+        return {
+            "workers": self.workers,
+            "executor": self.executor_kind,
+            "queue_depth": self._waiting,
+            "running": self._running,
+            "completed": self._completed,
+            "wait_avg_ms": (
+                self._wait_total / self._completed * 1000 if self._completed else 0.0
+            ),
+            "wait_max_ms": self._wait_max * 1000,
+            "service_time_ms": self.service_time * 1000,
+        }
+
+    def shutdown(self):
+        """stop worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=hash_settings.HASH_WORKERS, executor=hash_settings.HASH_EXECUTOR
+)
+
+
+REFRESH_TOKEN_LIFETIME = timedelta(days=30)
+
+
+def create_refresh_token(data: dict, family: str | None = None) -> str:
+    """create refresh token, rotated tokens keep family of the first one"""
     encode_data = data.copy()
-    expire = datetime.now(timezone.utc) + timedelta(days=30)
-    encode_data.update({"type": "refresh", "exp": expire})
-    refresh_encode = jwt.encode(
-        encode_data, auth_settings.SECRET_KEY, auth_settings.ALGORITHM
+    expire = datetime.now(timezone.utc) + REFRESH_TOKEN_LIFETIME
+    encode_data.update(
+        {
+            "type": "refresh",
+            "exp": expire,
+            "jti": str(uuid.uuid4()),
+            "fam": family or str(uuid.uuid4()),
+        }
     )
+    with jwt_duration.time(operation="encode"):
+        refresh_encode = jwt.encode(
+            encode_data, auth_settings.SECRET_KEY, auth_settings.ALGORITHM
+        )
     return refresh_encode
 
 
@@ -39,13 +150,41 @@ def create_access_token(data: dict) -> str:
     """create access token func"""
     encode_data = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=30)
-    encode_data.update({"type": "access", "exp": expire})
-    access_encode = jwt.encode(
-        encode_data, auth_settings.SECRET_KEY, auth_settings.ALGORITHM
-    )
+    encode_data.update({"type": "access", "exp": expire, "jti": str(uuid.uuid4())})
+    with jwt_duration.time(operation="encode"):
+        access_encode = jwt.encode(
+            encode_data, auth_settings.SECRET_KEY, auth_settings.ALGORITHM
+        )
     return access_encode
 
 
+def user_claims(user: User) -> dict:
+    """access token claims, with UserInfo fields in stateless mode"""
+    claims = {"sub": str(user.id)}
+    if auth_settings.STATELESS_CLAIMS:
+        claims.update({"name": user.name, "email": user.email, "ver": user.version})
+    return claims
+
+
+async def claims_are_fresh(user_id: int, version: int, session: AsyncSession) -> bool:
+    """reject claims issued before the last update of the user
+
+    The local version only proves claims stale, other workers may have
+    updated the user since. Redis has the published version, without it
+    (or once the entry expired) the version is read from postgres.
+    """
+    known = user_versions.get(user_id)
+    if known is not None and version < known:
+        return False
+    current = await shared_cache.get_version(User, user_id)
+    if current is None:
+        current = await UserDAO.find_version(user_id, session)
+        if current is None:
+            return False
+    user_versions.set(user_id, max(current, known or 0))
+    return version >= current
+
+
 def get_access_token(requset: Request):
     token = requset.cookies.get("access_token")
     if not token:
@@ -55,20 +194,45 @@ def get_access_token(requset: Request):
     return token
 
 
+def token_subject(token: str) -> str | None:
+    """sub of a valid access token, None for anything else"""
+    try:
+        with jwt_duration.time(operation="decode"):
+            payload = jwt.decode(
+                token,
+                auth_settings.SECRET_KEY,
+                algorithms=[auth_settings.ALGORITHM],
+            )
+    except JWTError:
+        return None
+    return payload.get("sub") if payload.get("type") == "access" else None
+
+
 async def get_current_user(
     request: Request,
-    session: AsyncSession = SessionDep,
-):
+    session: AsyncSession = Depends(ReadSessionDep),
+) -> CurrentUser:
     token = get_access_token(request)
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="No token")
 
-    try:
-        payload = jwt.decode(
-            token,
-            auth_settings.SECRET_KEY,
-            algorithms=[auth_settings.ALGORITHM],
+    if await shared_cache.is_revoked(token):
+        identity_cache.pop(token)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked"
         )
+
+    cached = identity_cache.get(token)
+    if cached is not None:
+        return cached[1]
+
+    try:
+        with jwt_duration.time(operation="decode"):
+            payload = jwt.decode(
+                token,
+                auth_settings.SECRET_KEY,
+                algorithms=[auth_settings.ALGORITHM],
+            )
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Bad token"
@@ -81,31 +245,96 @@ async def get_current_user(
     # если id в БД int:
     user_id = int(user_id)
 
-    user = await UserDAO.find_one_or_none_by_id(id=user_id, session=session)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
-        )
+    if "ver" in payload and await claims_are_fresh(user_id, payload["ver"], session):
+        # stateless mode: identity comes from signed claims, no user row load
+        snapshot = CurrentUser(id=user_id, name=payload["name"], email=payload["email"])
+    else:
+        user = await UserDAO.find_one_or_none_by_id(id=user_id, session=session)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
+            )
+        snapshot = CurrentUser.model_validate(user)
 
-    return user
+    ttl = payload["exp"] - time.time() if "exp" in payload else None
+    identity_cache.set(token, (payload, snapshot), ttl=ttl)
+    return snapshot
 
 
 async def authentificate_user(
     email: BaseModel, plain_password: str, session: AsyncSession
 ):
-    logger.info(
-        f"Data for authentification: \nemail:{email},\nplain_password:{plain_password}\n"
-    )
-    user = await UserDAO.find_user_by_filter(filter=email, session=session)
-    logger.info(f"user object:{user}")
-    if not user or verify_password(plain_password, user.password) is False:
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="user doesn't exist",
-            )
+    user = await UserDAO.find_credentials(email.email, session)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="user doesn't exist",
+        )
+    # bcrypt must not pin a pooled connection
+    await database_manager.release(session)
+    if await password_hasher.verify(plain_password, user.password) is False:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="incorect password or email",
         )
     return user
+
+
+def decode_refresh_token(token: str) -> dict:
+    """validate refresh token signature and claims"""
+    try:
+        with jwt_duration.time(operation="decode"):
+            payload = jwt.decode(
+                token,
+                auth_settings.SECRET_KEY,
+                algorithms=[auth_settings.ALGORITHM],
+            )
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Bad token"
+        )
+    if payload.get("type") != "refresh" or not {"sub", "jti", "fam"} <= payload.keys():
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Bad token"
+        )
+    return payload
+
+
+async def revoke_refresh_family(payload: dict, session: AsyncSession):
+    """revoke every token rotated from the same login"""
+    await revocation_index.revoke(
+        uuid.UUID(payload["fam"]),
+        int(payload["sub"]),
+        datetime.now(timezone.utc) + REFRESH_TOKEN_LIFETIME,
+        session,
+    )
+
+
+async def rotate_refresh_token(token: str, session: AsyncSession) -> tuple[User, dict]:
+    """spend refresh token once, reuse of a spent one revokes its family"""
+    payload = decode_refresh_token(token)
+    jti, family = uuid.UUID(payload["jti"]), uuid.UUID(payload["fam"])
+    if await revocation_index.is_revoked([family], session):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked"
+        )
+    expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+    spent = not await revocation_index.revoke(
+        jti, int(payload["sub"]), expires_at, session
+    )
+    if spent:
+        logger.warning(f"Refresh token reuse detected for user {payload['sub']}")
+        # own transaction, the request one is rolled back by the error below
+        async with database_manager.create_session() as own_session:
+            async with own_session.begin():
+                await revoke_refresh_family(payload, own_session)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token reuse detected"
+        )
+    user = await UserDAO.find_one_or_none_by_id(id=int(payload["sub"]), session=session)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
+        )
+    await database_manager.release(session)
+    return user, payload
@@ -0,0 +1,115 @@
+"""in-process caches"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+from app.core.config import cache_settings
+
+
+class TTLCache:
+    """bounded LRU cache with per-entry ttl"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """get value and mark it as recently used"""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        """put value, evicting least recently used entries if full"""
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + ttl, value)
+        while len(self._data) > self.maxsize:
+            old_key, (_, old_value) = self._data.popitem(last=False)
+            self._on_remove(old_key, old_value)
+            self.evictions += 1
+
+    def pop(self, key: Hashable):
+        """drop one entry"""
+        if key in self._data:
+            self._remove(key)
+
+    def clear(self):
+        """drop all entries"""
+        for key in list(self._data):
+            self._remove(key)
+
+    def _remove(self, key: Hashable):
+        _, value = self._data.pop(key)
+        self._on_remove(key, value)
+
+    def _on_remove(self, key: Hashable, value: Any):
+        pass
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """hit/miss/eviction counters"""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class IdentityCache(TTLCache):
+    """token -> (verified payload, user snapshot) with index by user id"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        self._by_user: dict[str, set[str]] = {}
+
+    def set(self, key: str, value: Any, ttl: float | None = None):
+        super().set(key, value, ttl)
+        if key in self._data:
+            self._by_user.setdefault(str(value[0]["sub"]), set()).add(key)
+
+    def _on_remove(self, key: Hashable, value: Any):
+        user_id = str(value[0]["sub"])
+        tokens = self._by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(key)
+            if not tokens:
+                del self._by_user[user_id]
+
+    def invalidate_user(self, user_id: Any):
+        """drop all cached tokens of user"""
+        for token in list(self._by_user.get(str(user_id), ())):
+            self.pop(token)
+
+
+identity_cache = IdentityCache(
+    maxsize=cache_settings.IDENTITY_CACHE_SIZE, ttl=cache_settings.IDENTITY_CACHE_TTL
+)
+
+# latest known User.version per id, kept for the lifetime of an access token
+user_versions = TTLCache(maxsize=cache_settings.IDENTITY_CACHE_SIZE, ttl=30 * 60)
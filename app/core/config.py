@@ -1,9 +1,9 @@
 """config with settings classes"""
 
 from pathlib import Path
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
-from loguru import logger
 
 ENV_PATH = Path(__file__).resolve().parents[2] / ".env"
 
@@ -16,6 +16,16 @@ class DBSettings(BaseSettings):
     DB_NAME: str
     DB_USER: str
     DB_PASSWORD: str
+    # full sqlalchemy urls of read replicas, json list in env
+    DB_REPLICA_URLS: list[str] = []
+    DB_REPLICA_POLICY: Literal["round_robin", "least_loaded"] = "round_robin"
+    # reads go to primary this long after a client wrote
+    DB_STICKY_SECONDS: int = 5
+    DB_REPLICA_EJECT_SECONDS: int = 30
+    # asyncpg prepared statements per connection, 0 disables (pgbouncer)
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500
+    # sqlalchemy compiled statement cache per engine
+    DB_QUERY_CACHE_SIZE: int = 1200
 
     model_config = SettingsConfigDict(
         env_file=ENV_PATH,
@@ -34,6 +44,182 @@ class AuthSettings(BaseSettings):
 
     SECRET_KEY: str
     ALGORITHM: str
+    # embed UserInfo claims in access tokens and answer /me without db
+    STATELESS_CLAIMS: bool = False
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
+    )
+
+
+class HashSettings(BaseSettings):
+    """setting class for password hashing pool"""
+
+    HASH_WORKERS: int = Field(default=4, ge=1)
+    HASH_EXECUTOR: str = Field(default="thread", pattern="^(thread|process)$")
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
+    )
+
+
+class CacheSettings(BaseSettings):
+    """setting class for in-process caches"""
+
+    IDENTITY_CACHE_SIZE: int = Field(default=10_000, ge=0)
+    IDENTITY_CACHE_TTL: float = Field(default=300, ge=0)
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
+    )
+
+
+class RedisSettings(BaseSettings):
+    """setting class for shared redis cache"""
+
+    REDIS_URL: str | None = None
+    REDIS_CACHE_TTL: int = Field(default=300, ge=1)
+    REDIS_LOCK_TTL_MS: int = Field(default=2_000, ge=1)
+    REDIS_RETRY_AFTER: float = Field(default=5.0, ge=0)
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
+    )
+
+
+class RevocationSettings(BaseSettings):
+    """setting class for revoked refresh tokens index"""
+
+    REVOCATION_BUCKET_SECONDS: int = Field(default=24 * 60 * 60, ge=60)
+    # first stage of a bucket, buckets double as revocations come in
+    REVOCATION_BUCKET_CAPACITY: int = Field(default=1024, ge=1)
+    REVOCATION_FP_RATE: float = Field(default=0.001, gt=0, lt=1)
+    REVOCATION_SYNC_INTERVAL: float = Field(default=1.0, ge=0)
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
+    )
+
+
+class LedgerSettings(BaseSettings):
+    """setting class for group commit of wallet operations"""
+
+    LEDGER_GROUP_COMMIT: bool = False
+    LEDGER_BATCH_SIZE: int = Field(default=500, ge=1)
+    LEDGER_MAX_LATENCY_MS: float = Field(default=2.0, ge=0)
+    LEDGER_QUEUE_SIZE: int = Field(default=10_000, ge=1)
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
+    )
+
+
+class RollupSettings(BaseSettings):
+    """setting class for daily balance rollups"""
+
+    # seconds between incremental refreshes, 0 disables the background task
+    ROLLUP_INTERVAL: float = Field(default=0, ge=0)
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
+    )
+
+
+class IdempotencySettings(BaseSettings):
+    """setting class for Idempotency-Key handling"""
+
+    IDEMPOTENCY_CACHE_SIZE: int = Field(default=10_000, ge=0)
+    IDEMPOTENCY_TTL: int = Field(default=24 * 60 * 60, ge=1)
+    # how long a crashed in-flight request blocks its key
+    IDEMPOTENCY_LOCK_SECONDS: int = Field(default=60, ge=1)
+    # bodies are hashed as they stream, longer ones aren't stored or replayed
+    IDEMPOTENCY_MAX_BODY_BYTES: int = Field(default=32 * 1024 * 1024, ge=1)
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
+    )
+
+
+class AdmissionSettings(BaseSettings):
+    """setting class for admission control of CPU-heavy auth endpoints"""
+
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_IP_RATE: float = Field(default=1.0, gt=0)
+    ADMISSION_IP_BURST: int = Field(default=10, ge=1)
+    ADMISSION_EMAIL_RATE: float = Field(default=0.2, gt=0)
+    ADMISSION_EMAIL_BURST: int = Field(default=5, ge=1)
+    # admitted requests may wait this long for a hashing worker
+    ADMISSION_TARGET_WAIT_MS: float = Field(default=500, gt=0)
+    # share token buckets between workers through REDIS_URL
+    ADMISSION_REDIS: bool = False
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
+    )
+
+
+class LogSettings(BaseSettings):
+    """setting class for logging"""
+
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    # module prefix -> level, e.g. {"app.base.BaseDAO": "WARNING"}
+    LOG_LEVELS: dict[str, str] = {}
+    # module prefix -> share of records below WARNING that are written
+    LOG_SAMPLING: dict[str, float] = {}
+    SLOW_QUERY_MS: float = Field(default=200, ge=0)
+    SLOW_QUERY_SAMPLING: float = Field(default=1.0, ge=0, le=1)
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
+    )
+
+
+class MetricsSettings(BaseSettings):
+    """setting class for prometheus metrics"""
+
+    METRICS_ENABLED: bool = True
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
+    )
+
+
+class WarmupSettings(BaseSettings):
+    """setting class for startup warm-up"""
+
+    WARMUP_ENABLED: bool = True
+    # connections opened per engine before readiness, capped by pool size
+    WARMUP_CONNECTIONS: int = 2
+    WARMUP_RETRY_SECONDS: float = 2.0
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
+    )
+
+
+class SettlementSettings(BaseSettings):
+    """setting class for batch transfers"""
+
+    SETTLEMENT_MAX_ITEMS: int = 50_000
+    # checked while the body streams in, before anything is parsed
+    SETTLEMENT_MAX_BYTES: int = 16 * 1024 * 1024
+    # attempts of the whole batch on serialization failure or deadlock
+    SETTLEMENT_RETRIES: int = 5
+    SETTLEMENT_RETRY_BACKOFF_MS: int = 50
+
+    model_config = SettingsConfigDict(
+        env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
+    )
+
+
+class ExportSettings(BaseSettings):
+    """setting class for statement exports"""
+
+    # rows per cursor fetch, csv chunk and parquet row group
+    EXPORT_BATCH_SIZE: int = 50_000
+    # 1 is fastest, exports are mostly decimals and timestamps
+    EXPORT_GZIP_LEVEL: int = 1
 
     model_config = SettingsConfigDict(
         env_file=ENV_PATH, env_file_encoding="utf-8", extra="ignore"
@@ -41,5 +227,17 @@ class AuthSettings(BaseSettings):
 
 
 auth_settings = AuthSettings()
+export_settings = ExportSettings()
+settlement_settings = SettlementSettings()
+warmup_settings = WarmupSettings()
+metrics_settings = MetricsSettings()
+log_settings = LogSettings()
+admission_settings = AdmissionSettings()
+idempotency_settings = IdempotencySettings()
+rollup_settings = RollupSettings()
+ledger_settings = LedgerSettings()
+revocation_settings = RevocationSettings()
+hash_settings = HashSettings()
+cache_settings = CacheSettings()
+redis_settings = RedisSettings()
 db_settings = DBSettings()
-logger.info(db_settings.DB_URL)
@@ -0,0 +1,239 @@
+"""group commit of wallet operations"""
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from decimal import Decimal
+from sqlalchemy.exc import SQLAlchemyError
+from loguru import logger
+from app.core.config import ledger_settings
+from app.core.idempotency import IdempotencyConflict, IdempotentWrite
+from app.base.session_maker import database_manager
+from app.models.payments import (
+    BalanceLimitExceeded,
+    InsufficientFunds,
+    WalletDAO,
+    WalletNotFound,
+)
+
+
+class CommitFailed(RuntimeError):
+    """commit of a batch failed, its operations may or may not be applied"""
+
+
+@dataclass
+class PendingOperation:
+    wallet_id: uuid.UUID
+    operation_type: str
+    amount: Decimal
+    user_id: int | None
+    future: asyncio.Future
+    idempotency: IdempotentWrite | None = None
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class LedgerWriter:
+    """applies queued wallet operations in batches with one commit per batch
+
+    A batch is flushed when it has batch_size operations or when its first
+    operation waited max_latency. Callers get their ledger row only after
+    the batch is committed.
+    """
+
+    def __init__(self, batch_size: int, max_latency: float, queue_size: int):
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.queue_size = queue_size
+        self._queue: asyncio.Queue | None = None
+        self._queued: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self._pending: set[asyncio.Future] = set()
+        self.batches = 0
+        self.operations = 0
+        self.max_batch = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+
+    def start(self):
+        """start writer task in running loop"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._queued = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._run(), name="ledger-writer")
+
+    async def stop(self):
+        """stop accepting operations, flush the queued ones and fail the rest
+
+        Callers still blocked on a full queue when the writer exits get
+        RuntimeError instead of a future that never resolves.
+        """
+        if self._task is None:
+            return
+        self._closing = True
+        self._queued.set()
+        await self._task
+        self._task = None
+        stopped = RuntimeError("ledger writer stopped")
+        for future in self._pending:
+            if not future.done():
+                future.set_exception(stopped)
+        self._pending.clear()
+
+    async def submit(
+        self,
+        wallet_id: uuid.UUID,
+        operation_type: str,
+        amount: Decimal,
+        user_id: int | None = None,
+        idempotency: IdempotentWrite | None = None,
+    ):
+        """queue operation and wait until its batch is durable
+
+        The idempotency key is claimed and its response stored in the batch
+        transaction, together with the write.
+        """
+        if not self.running:
+            raise RuntimeError("ledger writer is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._pending.add(future)
+        try:
+            # full queue blocks callers, this is the backpressure
+            await self._queue.put(
+                PendingOperation(
+                    wallet_id, operation_type, amount, user_id, future, idempotency
+                )
+            )
+            self._queued.set()
+            return await future
+        finally:
+            self._pending.discard(future)
+
+    async def _wait_queued(self, timeout: float | None = None) -> bool:
+        """wait for submit without taking an item, so cancelling loses nothing"""
+        self._queued.clear()
+        try:
+            await asyncio.wait_for(self._queued.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                batch = [self._queue.get_nowait()]
+            except asyncio.QueueEmpty:
+                if self._closing:
+                    break
+                await self._wait_queued()
+                continue
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if self._closing or timeout <= 0:
+                    break
+                if not await self._wait_queued(timeout):
+                    break
+            await self._flush(batch)
+        logger.info("Ledger writer stopped")
+
+    async def _flush(self, batch: list[PendingOperation]):
+        try:
+            results = await self._apply(batch)
+        except SQLAlchemyError as e:
+            # one bad operation must not fail its neighbours, nothing of the
+            # batch was committed so retrying can't apply anything twice
+            logger.error(f"Batch of {len(batch)} failed, retry one by one: {e}")
+            results = []
+            for op in batch:
+                try:
+                    results.extend(await self._apply([op]))
+                except (SQLAlchemyError, CommitFailed) as op_error:
+                    results.append(op_error)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error(f"Batch of {len(batch)} failed: {e}")
+            results = [e] * len(batch)
+        now = time.perf_counter()
+        for op, result in zip(batch, results):
+            waited = now - op.enqueued_at
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            if op.future.done():
+                continue
+            if isinstance(result, Exception):
+                op.future.set_exception(result)
+            else:
+                op.future.set_result(result)
+        self.batches += 1
+        self.operations += len(batch)
+        self.max_batch = max(self.max_batch, len(batch))
+
+    async def _apply(self, batch: list[PendingOperation]) -> list:
+        """apply batch in one transaction, results are in batch order
+
+        Wallets are locked in id order, so two batches touching the same
+        wallets can't deadlock; operations on one wallet keep their order.
+        A failed commit raises CommitFailed, the batch may have been
+        applied and must not be retried.
+        """
+        results: list = [None] * len(batch)
+        order = sorted(range(len(batch)), key=lambda i: batch[i].wallet_id)
+        async with database_manager.create_session() as session:
+            for i in order:
+                op = batch[i]
+                try:
+                    if op.idempotency is not None:
+                        await op.idempotency.claim(session)
+                    row = await WalletDAO.apply_operation(
+                        op.wallet_id,
+                        op.operation_type,
+                        op.amount,
+                        session,
+                        user_id=op.user_id,
+                    )
+                    if op.idempotency is not None:
+                        await op.idempotency.store(row, session)
+                    results[i] = row
+                except (
+                    WalletNotFound,
+                    InsufficientFunds,
+                    BalanceLimitExceeded,
+                    IdempotencyConflict,
+                ) as e:
+                    results[i] = e
+            try:
+                await session.commit()
+            except SQLAlchemyError as e:
+                raise CommitFailed(f"commit of {len(batch)} operations failed") from e
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "batches": self.batches,
+            "operations": self.operations,
+            "batch_size_avg": self.operations / self.batches if self.batches else 0.0,
+            "batch_size_max": self.max_batch,
+            "wait_avg_ms": (
+                self._wait_total / self.operations * 1000 if self.operations else 0.0
+            ),
+            "wait_max_ms": self._wait_max * 1000,
+        }
+
+
+ledger_writer = LedgerWriter(
+    batch_size=ledger_settings.LEDGER_BATCH_SIZE,
+    max_latency=ledger_settings.LEDGER_MAX_LATENCY_MS / 1000,
+    queue_size=ledger_settings.LEDGER_QUEUE_SIZE,
+)
@@ -0,0 +1,311 @@
+"""Idempotency-Key support for unsafe endpoints"""
+
+import asyncio
+import hashlib
+import json
+import re
+import uuid
+from http.cookies import SimpleCookie
+from typing import Any
+from fastapi import HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from loguru import logger
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.auth import token_subject
+from app.core.cache import TTLCache
+from app.core.config import idempotency_settings
+from app.base.session_maker import database_manager
+from app.models.idempotency import IdempotencyKeyDAO
+
+StoredResponse = tuple[int, list, bytes]
+
+# headers that belong to the original exchange only
+SKIP_HEADERS = {b"date", b"server", b"content-length"}
+
+
+JSON_HEADERS = [["content-type", "application/json"]]
+
+
+def _json_response(status_code: int, detail: str) -> StoredResponse:
+    body = json.dumps({"detail": detail}).encode()
+    return status_code, JSON_HEADERS, body
+
+
+class IdempotencyConflict(HTTPException):
+    """key was taken over by a retry after its lock expired"""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="request with this key is handled by a retry",
+        )
+
+
+class BodyDigest:
+    """receive wrapper hashing the request body as the app reads it
+
+    Nothing is buffered, so streamed uploads reach the handler as they
+    arrive. Bodies over limit are cut off with 413 before they are parsed.
+    """
+
+    def __init__(self, receive, limit: int):
+        self._receive = receive
+        self.limit = limit
+        self.size = 0
+        self.complete = False
+        self._hash = hashlib.sha256()
+
+    async def __call__(self):
+        message = await self._receive()
+        if message["type"] == "http.request" and not self.complete:
+            body = message.get("body", b"")
+            self.size += len(body)
+            if self.size > self.limit:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"request body is limited to {self.limit} bytes",
+                )
+            self._hash.update(body)
+            self.complete = not message.get("more_body", False)
+        return message
+
+    @property
+    def fingerprint(self) -> str | None:
+        """sha256 of the body once it is read to the end"""
+        return self._hash.hexdigest() if self.complete else None
+
+    async def drain(self) -> str | None:
+        """hash the rest the app didn't read, None if over limit or client left"""
+        try:
+            while not self.complete:
+                if (await self())["type"] == "http.disconnect":
+                    return None
+        except HTTPException:
+            return None
+        return self.fingerprint
+
+
+class IdempotentWrite:
+    """Idempotency-Key of the running request, for the write it guards
+
+    The handler claims the key and stores its response in the transaction
+    of the write, so a crash before the middleware records the response
+    can't make a retry apply the write again.
+    """
+
+    def __init__(self, key: str, owner: uuid.UUID, digest: BodyDigest):
+        self.key = key
+        self.owner = owner
+        self.digest = digest
+        self.response_model: type[BaseModel] | None = None
+
+    async def claim(self, session: AsyncSession):
+        """call before the write, raises IdempotencyConflict if key is lost"""
+        if not await IdempotencyKeyDAO.claim(self.key, self.owner, session):
+            raise IdempotencyConflict()
+
+    async def store(self, result: Any, session: AsyncSession, status_code: int = 200):
+        """store json response of the write in its transaction"""
+        if self.response_model is not None:
+            result = self.response_model.model_validate(result)
+        if isinstance(result, BaseModel):
+            body = result.model_dump_json().encode()
+        else:
+            body = json.dumps(jsonable_encoder(result)).encode()
+        await IdempotencyKeyDAO.complete(
+            self.key,
+            self.owner,
+            self.digest.fingerprint,
+            status_code,
+            JSON_HEADERS,
+            body,
+            session,
+        )
+
+
+def idempotent_write(
+    request: Request, response_model: type[BaseModel] | None = None
+) -> IdempotentWrite | None:
+    """claim of request made with Idempotency-Key, None otherwise"""
+    write = getattr(request.state, "idempotency", None)
+    if write is not None:
+        write.response_model = response_model
+    return write
+
+
+def key_scope(scope, headers: dict) -> bytes:
+    """user id from access token, so a retry after /refresh has the same key
+
+    Anonymous requests (register) are scoped by client address, so one
+    client can't replay or block keys of another. Empty if neither is known.
+    """
+    cookies = SimpleCookie(headers.get(b"cookie", b"").decode("latin-1"))
+    if "access_token" in cookies:
+        subject = token_subject(cookies["access_token"].value)
+        if subject:
+            return f"user:{subject}".encode()
+    client = scope.get("client")
+    return f"client:{client[0]}".encode() if client else b""
+
+
+class IdempotencyMiddleware:
+    """replay stored responses of POST requests repeated with same Idempotency-Key
+
+    Keys are scoped by path and user id (client address for anonymous
+    requests), bodies are fingerprinted while the app streams them in.
+    Recent responses are answered from an in-memory LRU, older ones from
+    the idempotencykeys table; concurrent duplicates in one worker wait for
+    the first request, in other workers they get 409 until it finishes. 5xx
+    responses are not stored, so such requests can be retried.
+    """
+
+    def __init__(self, app, paths: list[str]):
+        self.app = app
+        self.paths = [re.compile(path) for path in paths]
+        self.ttl = idempotency_settings.IDEMPOTENCY_TTL
+        self.lock_seconds = idempotency_settings.IDEMPOTENCY_LOCK_SECONDS
+        self.max_body = idempotency_settings.IDEMPOTENCY_MAX_BODY_BYTES
+        self.cache = TTLCache(
+            maxsize=idempotency_settings.IDEMPOTENCY_CACHE_SIZE, ttl=self.ttl
+        )
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.replayed = 0
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not any(path.fullmatch(scope["path"]) for path in self.paths)
+        ):
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(b"idempotency-key")
+        owner_scope = key_scope(scope, headers)
+        # keys nobody can be bound to would be shared by all clients
+        if not idempotency_key or not owner_scope:
+            return await self.app(scope, receive, send)
+
+        content_length = headers.get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_body:
+            response = _json_response(
+                413, f"request body is limited to {self.max_body} bytes"
+            )
+            return await self._replay(response, send)
+        digest = BodyDigest(receive, self.max_body)
+        key = hashlib.sha256(
+            b"\n".join([scope["path"].encode(), idempotency_key, owner_scope])
+        ).hexdigest()
+
+        cached = self.cache.get(key)
+        if cached is None and key in self._inflight:
+            cached = await asyncio.shield(self._inflight[key])
+        if cached is not None:
+            return await self._replay_stored(*cached, digest, send)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        stored = None
+        try:
+            stored = await self._execute(key, scope, digest, send)
+        finally:
+            del self._inflight[key]
+            if stored is not None:
+                self.cache.set(key, stored)
+            future.set_result(stored)
+
+    async def _execute(self, key, scope, digest, send):
+        """run request holding the key, (fingerprint, response) to remember"""
+        owner = uuid.uuid4()
+        async with database_manager.create_session() as session:
+            async with session.begin():
+                existing = await IdempotencyKeyDAO.acquire(
+                    key, owner, self.lock_seconds, self.ttl, session
+                )
+        if existing is not None:
+            if existing.status_code is None:
+                await self._replay(
+                    _json_response(409, "request with this key is in progress"), send
+                )
+                return None
+            response = (
+                existing.status_code,
+                existing.response_headers,
+                existing.response_body,
+            )
+            await self._replay_stored(existing.fingerprint, response, digest, send)
+            return (existing.fingerprint, response)
+
+        captured = {"status": 500, "headers": [], "body": []}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = [
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in message.get("headers", [])
+                    if name.lower() not in SKIP_HEADERS
+                ]
+            elif message["type"] == "http.response.body":
+                captured["body"].append(message.get("body", b""))
+            await send(message)
+
+        scope.setdefault("state", {})["idempotency"] = IdempotentWrite(
+            key, owner, digest
+        )
+        try:
+            await self.app(scope, digest, capture)
+        except Exception:
+            await self._release(key, owner)
+            raise
+        fingerprint = await digest.drain()
+        if captured["status"] >= 500 or fingerprint is None:
+            await self._release(key, owner)
+            return None
+        response = (captured["status"], captured["headers"], b"".join(captured["body"]))
+        # the handler may have stored a json rendering with its write already,
+        # the exact response with all headers replaces it
+        async with database_manager.create_session() as session:
+            async with session.begin():
+                await IdempotencyKeyDAO.complete(
+                    key, owner, fingerprint, *response, session
+                )
+        return (fingerprint, response)
+
+    async def _replay_stored(self, fingerprint, response, digest, send):
+        """replay if body is the one the response was stored for"""
+        if fingerprint is not None and await digest.drain() != fingerprint:
+            response = _json_response(
+                422, "Idempotency-Key reused with different payload"
+            )
+        await self._replay(response, send)
+
+    async def _release(self, key: str, owner: uuid.UUID):
+        try:
+            async with database_manager.create_session() as session:
+                async with session.begin():
+                    await IdempotencyKeyDAO.release(key, owner, session)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error(f"Can't release idempotency key: {e}")
+
+    async def _replay(self, response: StoredResponse, send):
+        status_code, headers, body = response
+        self.replayed += 1
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": [
+                    (name.encode("latin-1"), value.encode("latin-1"))
+                    for name, value in headers
+                ]
+                + [
+                    (b"content-length", str(len(body)).encode()),
+                    (b"idempotent-replayed", b"true"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    def stats(self) -> dict:
+        return {"replayed": self.replayed, "cache": self.cache.stats()}
@@ -0,0 +1,115 @@
+"""logging setup: queued loguru sink, per-module levels, sampling, redaction"""
+
+import random
+import re
+import sys
+from loguru import logger
+from sqlalchemy.engine import Engine
+from app.core.config import log_settings
+from app.core.metrics import on_statement
+
+SECRET_FIELDS = (
+    "password",
+    "confirm_password",
+    "plain_password",
+    "token",
+    "access_token",
+    "refresh_token",
+    "secret",
+    "secret_key",
+)
+SECRET_PATTERN = re.compile(
+    r"""(?P<key>['"]?(?:%s)['"]?\s*[:=]\s*)(?P<value>'[^']*'|"[^"]*"|[^\s,)}]+)"""
+    % "|".join(SECRET_FIELDS),
+    re.IGNORECASE,
+)
+JWT_PATTERN = re.compile(r"eyJ[\w-]+\.[\w-]+\.[\w-]+")
+URL_PASSWORD_PATTERN = re.compile(r"(://[^:/\s]+:)[^@\s]+@")
+
+
+def redact(text: str) -> str:
+    """mask passwords, tokens and credentials in urls"""
+    text = SECRET_PATTERN.sub(r"\g<key>***", text)
+    text = JWT_PATTERN.sub("***", text)
+    return URL_PASSWORD_PATTERN.sub(r"\1***@", text)
+
+
+def _redact_record(record):
+    record["message"] = redact(record["message"])
+    for key, value in record["extra"].items():
+        if key.lower() in SECRET_FIELDS:
+            record["extra"][key] = "***"
+        elif isinstance(value, str):
+            record["extra"][key] = redact(value)
+
+
+def _longest_prefix(name: str, rules: dict):
+    best = None
+    for prefix in rules:
+        if (name == prefix or name.startswith(prefix + ".")) and (
+            best is None or len(prefix) > len(best)
+        ):
+            best = prefix
+    return rules[best] if best is not None else None
+
+
+def make_filter(default_level: str, levels: dict[str, str], sampling: dict[str, float]):
+    """loguru filter with per-module levels and sampling of chatty records"""
+    default_no = logger.level(default_level).no
+    level_nos = {prefix: logger.level(level).no for prefix, level in levels.items()}
+    warning_no = logger.level("WARNING").no
+    cache: dict[str, tuple[int, float | None]] = {}
+
+    def log_filter(record) -> bool:
+        name = record["name"] or ""
+        rule = cache.get(name)
+        if rule is None:
+            level_no = _longest_prefix(name, level_nos)
+            rule = cache[name] = (
+                default_no if level_no is None else level_no,
+                _longest_prefix(name, sampling),
+            )
+        min_no, rate = rule
+        if record["level"].no < min_no:
+            return False
+        if rate is not None and record["level"].no < warning_no:
+            return random.random() < rate
+        return True
+
+    return log_filter
+
+
+def setup_logging():
+    """replace default stderr handler with non-blocking queued one"""
+    levels = [log_settings.LOG_LEVEL, *log_settings.LOG_LEVELS.values()]
+    logger.remove()
+    logger.configure(patcher=_redact_record)
+    logger.add(
+        sys.stderr,
+        level=min(logger.level(level).no for level in levels),
+        filter=make_filter(
+            log_settings.LOG_LEVEL, log_settings.LOG_LEVELS, log_settings.LOG_SAMPLING
+        ),
+        serialize=log_settings.LOG_JSON,
+        enqueue=True,
+        backtrace=False,
+        diagnose=False,
+    )
+
+
+def install_slow_query_log(
+    engine: Engine,
+    threshold_ms: float = log_settings.SLOW_QUERY_MS,
+    sampling: float = log_settings.SLOW_QUERY_SAMPLING,
+):
+    """log statements slower than threshold instead of echoing all of them"""
+
+    def log_slow(statement: str, elapsed: float):
+        elapsed *= 1000
+        if elapsed >= threshold_ms and random.random() < sampling:
+            # parameters are not logged, they may hold user data
+            logger.warning(
+                "Slow query {:.1f}ms: {}", elapsed, " ".join(statement.split())[:1000]
+            )
+
+    on_statement(engine, log_slow)
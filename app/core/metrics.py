@@ -0,0 +1,297 @@
+"""minimal prometheus metrics registry and instrumentation"""
+
+import re
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterable
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.config import metrics_settings
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# (name, type, help, [(labels, value)])
+Family = tuple[str, str, str, list[tuple[dict, float]]]
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+class Registry:
+    """holds metrics and collector callbacks, renders text exposition format"""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._metrics: list = []
+        self._collectors: list[Callable[[], Iterable[Family]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, func: Callable[[], Iterable[Family]]):
+        """register callback producing metric families at scrape time"""
+        self._collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        # several collectors may feed one family, e.g. pool of every engine
+        families: dict[str, tuple[str, str, list]] = {}
+        for collect in self._collectors:
+            for name, kind, help_text, samples in collect():
+                families.setdefault(name, (kind, help_text, []))[2].extend(samples)
+        for name, (kind, help_text, samples) in families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(
+                f"{name}{_labels(labels)} {value}" for labels, value in samples
+            )
+        return "\n".join(lines) + "\n"
+
+
+class Counter:
+    def __init__(self, registry: Registry, name: str, help_text: str):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self._values: dict[tuple, float] = {}
+        registry.register(self)
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = tuple(labels.items())
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_labels(dict(key))} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        registry: Registry,
+        name: str,
+        help_text: str,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        # labels -> [count per bucket..., +Inf count, sum]
+        self._values: dict[tuple, list[float]] = {}
+        registry.register(self)
+
+    def observe(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = tuple(labels.items())
+        row = self._values.get(key)
+        if row is None:
+            row = self._values[key] = [0] * (len(self.buckets) + 2)
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """observe duration of with block"""
+        if not self.registry.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, row in self._values.items():
+            labels = dict(key)
+            total = 0
+            for bound, count in zip((*self.buckets, "+Inf"), row[:-1]):
+                total += count
+                lines.append(
+                    f"{self.name}_bucket{_labels({**labels, 'le': bound})} {total}"
+                )
+            lines.append(f"{self.name}_sum{_labels(labels)} {row[-1]}")
+            lines.append(f"{self.name}_count{_labels(labels)} {total}")
+        return lines
+
+
+registry = Registry(enabled=metrics_settings.METRICS_ENABLED)
+
+http_request_duration = Histogram(
+    registry, "http_request_duration_seconds", "HTTP request latency by route"
+)
+db_statement_duration = Histogram(
+    registry, "db_statement_duration_seconds", "SQL statement latency by operation"
+)
+db_pool_checkout_wait = Histogram(
+    registry, "db_pool_checkout_wait_seconds", "wait for a pooled connection"
+)
+db_transaction_duration = Histogram(
+    registry, "db_transaction_duration_seconds", "DBSessionManager scope duration"
+)
+db_commit_duration = Histogram(registry, "db_commit_duration_seconds", "commit latency")
+password_hash_duration = Histogram(
+    registry, "password_hash_duration_seconds", "bcrypt time in worker pool"
+)
+password_hash_wait = Histogram(
+    registry, "password_hash_wait_seconds", "wait for free bcrypt worker"
+)
+jwt_duration = Histogram(registry, "jwt_duration_seconds", "JWT encode and decode time")
+
+
+class MetricsMiddleware:
+    """per-route latency histogram, route templates keep label cardinality low"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not registry.enabled:
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status_code,
+            )
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """queue pool that records how long checkouts wait"""
+
+    def _do_get(self):
+        if not registry.enabled:
+            return super()._do_get()
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - started)
+
+
+# consumers of statement timings per engine, see on_statement
+_statement_consumers: dict[Engine, list[Callable[[str, float], None]]] = {}
+
+
+def on_statement(engine: Engine, consumer: Callable[[str, float], None]):
+    """call consumer(statement, seconds) after each statement of engine
+
+    Statements are timed by one pair of cursor hooks per engine, however
+    many consumers (metrics, slow query log) read the timing.
+    """
+    consumers = _statement_consumers.get(engine)
+    if consumers is None:
+        consumers = _statement_consumers[engine] = []
+        _time_statements(engine, consumers)
+    consumers.append(consumer)
+
+
+def _time_statements(engine: Engine, consumers: list):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        elapsed = time.perf_counter() - conn.info["statement_started"].pop()
+        for consumer in consumers:
+            consumer(statement, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None:
+            started = context.connection.info.get("statement_started")
+            if started:
+                started.pop()
+
+
+def instrument_engine(engine: Engine, name: str = "primary"):
+    """statement timing and pool utilization for engine"""
+    if not registry.enabled:
+        return
+
+    def observe(statement: str, elapsed: float):
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+        db_statement_duration.observe(elapsed, engine=name, operation=operation)
+
+    on_statement(engine, observe)
+
+    @registry.collector
+    def pool_usage():
+        pool = engine.pool
+        yield (
+            "db_pool_connections",
+            "gauge",
+            "pooled connections by state",
+            [
+                ({"engine": name, "state": "checked_out"}, pool.checkedout()),
+                ({"engine": name, "state": "idle"}, pool.checkedin()),
+                ({"engine": name, "state": "size"}, pool.size()),
+                ({"engine": name, "state": "overflow"}, max(pool.overflow(), 0)),
+            ],
+        )
+
+
+def stats_collector(prefix: str, stats: Callable[[], dict], help_text: str):
+    """expose numeric values of a stats() dict as gauges"""
+
+    @registry.collector
+    def collect():
+        for key, value in _flatten(stats()):
+            yield (f"{prefix}_{key}", "gauge", help_text, [({}, float(value))])
+
+
+def _flatten(stats: dict, prefix: str = ""):
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}{key}"), value
@@ -0,0 +1,172 @@
+"""index of revoked refresh tokens"""
+
+import hashlib
+import math
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import revocation_settings
+from app.models.tokens import RevokedTokenDAO
+
+
+class BloomFilter:
+    """fixed size bloom filter over uuids"""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value: uuid.UUID):
+        # double hashing, two 64 bit halves of one digest
+        digest = hashlib.blake2b(value.bytes, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: uuid.UUID):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value: uuid.UUID) -> bool:
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value)
+        )
+
+
+class ScalableBloomFilter:
+    """bloom filter that grows by adding a twice larger stage when full
+
+    Stage i is built for fp_rate / 2 ** (i + 1), so the combined false
+    positive rate stays under fp_rate however many stages there are.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.fp_rate = fp_rate
+        self.stages = [BloomFilter(capacity, fp_rate / 2)]
+
+    def add(self, value: uuid.UUID):
+        stage = self.stages[-1]
+        if stage.count >= stage.capacity:
+            stage = BloomFilter(
+                stage.capacity * 2, self.fp_rate / 2 ** (len(self.stages) + 1)
+            )
+            self.stages.append(stage)
+        stage.add(value)
+
+    def __contains__(self, value: uuid.UUID) -> bool:
+        return any(value in stage for stage in self.stages)
+
+    @property
+    def count(self) -> int:
+        return sum(stage.count for stage in self.stages)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(stage.bits) for stage in self.stages)
+
+
+class RevocationIndex:
+    """bloom filters bucketed by token expiry, backed by revoked_tokens table
+
+    A whole bucket is dropped once every token in it has expired, so memory
+    is bounded by the number of tokens revoked within one refresh lifetime.
+    Buckets start at capacity entries and grow with the revocations they get.
+    Positive answers are confirmed against the table.
+    """
+
+    def __init__(
+        self,
+        bucket_seconds: int,
+        capacity: int,
+        fp_rate: float,
+        sync_interval: float,
+    ):
+        self.bucket_seconds = bucket_seconds
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.sync_interval = sync_interval
+        self._buckets: dict[int, ScalableBloomFilter] = {}
+        self._watermark: datetime | None = None
+        self._synced_at = 0.0
+        self.false_positives = 0
+
+    def _bucket(self, expires_at: datetime) -> int:
+        return int(expires_at.timestamp()) // self.bucket_seconds
+
+    def add(self, id: uuid.UUID, expires_at: datetime):
+        """remember revoked id"""
+        bucket = self._bucket(expires_at)
+        bloom = self._buckets.get(bucket)
+        if bloom is None:
+            bloom = self._buckets[bucket] = ScalableBloomFilter(
+                self.capacity, self.fp_rate
+            )
+        bloom.add(id)
+
+    def might_contain(self, id: uuid.UUID) -> bool:
+        """O(1) check, no false negatives for synced revocations"""
+        return any(id in bloom for bloom in self._buckets.values())
+
+    def _expire_buckets(self):
+        current = int(time.time()) // self.bucket_seconds
+        for bucket in [b for b in self._buckets if b < current]:
+            del self._buckets[bucket]
+
+    async def sync(self, session: AsyncSession, force: bool = False):
+        """load revocations made by other workers since last sync"""
+        if not force and time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = time.monotonic()
+        # overlap covers rows committed late with an earlier created_at
+        since = self._watermark - timedelta(seconds=5) if self._watermark else None
+        for id, expires_at, created_at in await RevokedTokenDAO.revoked_since(
+            since, session
+        ):
+            self.add(id, expires_at)
+            if self._watermark is None or created_at > self._watermark:
+                self._watermark = created_at
+        self._expire_buckets()
+
+    async def is_revoked(self, ids: list[uuid.UUID], session: AsyncSession) -> bool:
+        """True if any of ids is revoked"""
+        await self.sync(session)
+        candidates = [id for id in ids if self.might_contain(id)]
+        if not candidates:
+            return False
+        if await RevokedTokenDAO.find_revoked(candidates, session):
+            return True
+        self.false_positives += 1
+        return False
+
+    async def revoke(
+        self,
+        id: uuid.UUID,
+        user_id: int,
+        expires_at: datetime,
+        session: AsyncSession,
+    ) -> bool:
+        """revoke id durably, False if it was already revoked"""
+        revoked = await RevokedTokenDAO.revoke(id, user_id, expires_at, session)
+        self.add(id, expires_at)
+        return revoked
+
+    def stats(self) -> dict:
+        return {
+            "buckets": len(self._buckets),
+            "entries": sum(b.count for b in self._buckets.values()),
+            "bytes": sum(b.nbytes for b in self._buckets.values()),
+            "false_positives": self.false_positives,
+        }
+
+
+revocation_index = RevocationIndex(
+    bucket_seconds=revocation_settings.REVOCATION_BUCKET_SECONDS,
+    capacity=revocation_settings.REVOCATION_BUCKET_CAPACITY,
+    fp_rate=revocation_settings.REVOCATION_FP_RATE,
+    sync_interval=revocation_settings.REVOCATION_SYNC_INTERVAL,
+)
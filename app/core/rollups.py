@@ -0,0 +1,46 @@
+"""background refresh of daily balance rollups"""
+
+import asyncio
+from loguru import logger
+from app.core.config import rollup_settings
+from app.base.session_maker import database_manager
+from app.models.rollups import WalletDailyBalanceDAO
+
+
+async def refresh_rollups():
+    """one incremental refresh in own transaction"""
+    async with database_manager.create_session() as session:
+        async with session.begin():
+            return await WalletDailyBalanceDAO.refresh(session)
+
+
+class RollupRefresher:
+    """periodically folds new ledger rows into rollups"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run(), name="rollup-refresher")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await refresh_rollups()
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error(f"Rollup refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+rollup_refresher = RollupRefresher(interval=rollup_settings.ROLLUP_INTERVAL)
@@ -0,0 +1,151 @@
+"""batch settlement of wallet to wallet transfers"""
+
+import asyncio
+import random
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from loguru import logger
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.base.session_maker import database_manager
+from app.core.config import settlement_settings
+from app.core.idempotency import IdempotentWrite
+from app.models.payments import MAX_BALANCE, TransactionDAO, WalletDAO
+from app.schemas.payment_schemas import (
+    SettlementResult,
+    TransferItem,
+    TransferResult,
+)
+
+# serialization_failure, deadlock_detected
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+
+
+def is_retryable(error: DBAPIError) -> bool:
+    orig = error.orig
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(
+        orig.__cause__, "sqlstate", None
+    )
+    return sqlstate in RETRYABLE_SQLSTATES
+
+
+async def settle_once(
+    items: list[TransferItem], user_id: int, session: AsyncSession
+) -> list[TransferResult]:
+    """validate against locked balances, then one UPDATE and bulk ledger insert
+
+    Items are applied in order on running balances, so a transfer may be
+    funded by an earlier one of the same batch. Source wallets must belong
+    to user.
+    """
+    wallets = await WalletDAO.lock_for_update(
+        {item.from_wallet_id for item in items} | {item.to_wallet_id for item in items},
+        session,
+    )
+    balances = {wallet_id: row.balance for wallet_id, row in wallets.items()}
+    deltas: dict[uuid.UUID, Decimal] = defaultdict(Decimal)
+    ledger = []
+    results = []
+    for index, item in enumerate(items):
+        source = wallets.get(item.from_wallet_id)
+        error = None
+        if source is None or source.user_id != user_id:
+            error = "source wallet not found"
+        elif item.to_wallet_id not in wallets:
+            error = "destination wallet not found"
+        elif item.from_wallet_id == item.to_wallet_id:
+            error = "same wallet"
+        elif balances[item.from_wallet_id] < item.amount:
+            error = "insufficient funds"
+        elif balances[item.to_wallet_id] + item.amount > MAX_BALANCE:
+            # would fail the whole batch with a numeric overflow
+            error = "destination balance limit exceeded"
+        if error is not None:
+            results.append(
+                TransferResult(
+                    index=index,
+                    reference=item.reference,
+                    status="rejected",
+                    error=error,
+                )
+            )
+            continue
+
+        ids = []
+        for wallet_id, operation_type, delta in (
+            (item.from_wallet_id, "transfer_out", -item.amount),
+            (item.to_wallet_id, "transfer_in", item.amount),
+        ):
+            before = balances[wallet_id]
+            balances[wallet_id] = before + delta
+            deltas[wallet_id] += delta
+            ids.append(uuid.uuid4())
+            ledger.append(
+                {
+                    "id": ids[-1],
+                    "wallet_id": wallet_id,
+                    "operation_type": operation_type,
+                    "amount": item.amount,
+                    "balance_before": before,
+                    "balance_after": balances[wallet_id],
+                }
+            )
+        results.append(
+            TransferResult(
+                index=index,
+                reference=item.reference,
+                status="settled",
+                debit_id=ids[0],
+                credit_id=ids[1],
+            )
+        )
+
+    await WalletDAO.apply_deltas(
+        {wallet_id: delta for wallet_id, delta in deltas.items() if delta}, session
+    )
+    if ledger:
+        # rows are inserted in list order, so their seq follows apply order
+        await TransactionDAO.add_many(ledger, session)
+    return results
+
+
+async def settle(
+    items: list[TransferItem],
+    user_id: int,
+    idempotency: IdempotentWrite | None = None,
+) -> SettlementResult:
+    """settle batch in one transaction, retried on serialization failure"""
+    attempts = settlement_settings.SETTLEMENT_RETRIES
+    for attempt in range(1, attempts + 1):
+        try:
+            async with database_manager.create_session() as session:
+                async with session.begin():
+                    if idempotency is not None:
+                        await idempotency.claim(session)
+                    results = await settle_once(items, user_id, session)
+                    settled = sum(result.status == "settled" for result in results)
+                    outcome = SettlementResult(
+                        settled=settled,
+                        rejected=len(items) - settled,
+                        attempts=attempt,
+                        results=results,
+                    )
+                    if idempotency is not None:
+                        await idempotency.store(outcome, session)
+            break
+        except DBAPIError as e:
+            if attempt == attempts or not is_retryable(e):
+                raise
+            delay = settlement_settings.SETTLEMENT_RETRY_BACKOFF_MS / 1000
+            delay *= 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            logger.warning(
+                "Settlement of {} items conflicted, attempt {}/{}, retry in {:.3f}s",
+                len(items),
+                attempt,
+                attempts,
+                delay,
+            )
+            await asyncio.sleep(delay)
+    logger.info(f"Settled {settled} of {len(items)} transfers for user {user_id}")
+    return outcome
@@ -0,0 +1,339 @@
+"""redis cache shared by all workers"""
+
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Iterable
+from loguru import logger
+from app.core.config import redis_settings
+
+# keys per DEL command when invalidating many records
+BATCH_KEYS = 1000
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f"Can't serialize {type(value).__name__}")
+
+
+def dump_snapshot(record) -> str:
+    """serialize columns of record, except the model's secret_columns"""
+    secret = getattr(type(record), "secret_columns", ())
+    data = {k: v for k, v in record.to_dict().items() if k not in secret}
+    return json.dumps(data, default=_default, separators=(",", ":"))
+
+
+def load_snapshot(model, raw: str | bytes):
+    """restore detached model instance from snapshot"""
+    data = json.loads(raw)
+    values = {}
+    for column in model.__table__.columns:
+        value = data.get(column.name)
+        if value is not None:
+            python_type = column.type.python_type
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            elif python_type in (Decimal, uuid.UUID):
+                value = python_type(value)
+        values[column.name] = value
+    return model(**values)
+
+
+def token_key(token: str) -> str:
+    """short key for token, raw tokens are never stored"""
+    return "revoked:" + hashlib.sha256(token.encode()).hexdigest()
+
+
+class InMemoryRedis:
+    """minimal stand-in for redis.asyncio.Redis used by SharedCache"""
+
+    def __init__(self):
+        self._data: dict[str, tuple[float | None, Any]] = {}
+
+    def _alive(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def get(self, key: str):
+        return self._alive(key)
+
+    async def mget(self, keys: Iterable[str]):
+        return [self._alive(key) for key in keys]
+
+    async def set(self, key: str, value, ex=None, px=None, nx: bool = False):
+        if nx and self._alive(key) is not None:
+            return None
+        ttl = ex if ex is not None else (px / 1000 if px is not None else None)
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._data[key] = (expires_at, value)
+        return True
+
+    async def delete(self, *keys: str):
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    async def exists(self, *keys: str):
+        return sum(self._alive(key) is not None for key in keys)
+
+    def pipeline(self, transaction: bool = True):
+        return _InMemoryPipeline(self)
+
+    async def aclose(self):
+        self._data.clear()
+
+
+class _InMemoryPipeline:
+    def __init__(self, client: InMemoryRedis):
+        self.client = client
+        self.calls: list[Awaitable] = []
+
+    def get(self, key: str):
+        self.calls.append(self.client.get(key))
+        return self
+
+    def set(self, key: str, value, ex=None, px=None, nx: bool = False):
+        self.calls.append(self.client.set(key, value, ex=ex, px=px, nx=nx))
+        return self
+
+    def delete(self, *keys: str):
+        self.calls.append(self.client.delete(*keys))
+        return self
+
+    async def execute(self):
+        calls, self.calls = self.calls, []
+        return [await call for call in calls]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.calls = []
+
+
+class SharedCache:
+    """model snapshots and revoked tokens in redis, postgres stays the source"""
+
+    def __init__(
+        self,
+        client=None,
+        ttl: int = 300,
+        lock_ttl_ms: int = 2_000,
+        retry_after: float = 5.0,
+    ):
+        self.client = client
+        self.ttl = ttl
+        self.lock_ttl_ms = lock_ttl_ms
+        self.retry_after = retry_after
+        self._down_until = 0.0
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @classmethod
+    def from_settings(cls) -> "SharedCache":
+        client = None
+        if redis_settings.REDIS_URL:
+            from redis.asyncio import Redis
+
+            client = Redis.from_url(
+                redis_settings.REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.2
+            )
+        return cls(
+            client,
+            ttl=redis_settings.REDIS_CACHE_TTL,
+            lock_ttl_ms=redis_settings.REDIS_LOCK_TTL_MS,
+            retry_after=redis_settings.REDIS_RETRY_AFTER,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.client is not None and time.monotonic() >= self._down_until
+
+    def mark_failed(self, e: Exception):
+        """count redis error and bypass redis for retry_after seconds"""
+        self.errors += 1
+        self._down_until = time.monotonic() + self.retry_after
+        logger.warning(f"Redis unavailable, fallback to postgres: {e}")
+
+    @staticmethod
+    def model_key(model, id) -> str:
+        return f"{model.__tablename__}:{id}"
+
+    async def get_many(self, model, ids: list) -> dict:
+        """pipelined multi-get of model snapshots, missing ids are skipped"""
+        if not ids or not self.enabled:
+            return {}
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for id in ids:
+                    pipe.get(self.model_key(model, id))
+                raws = await pipe.execute()
+        except Exception as e:  # pylint: disable=broad-except
+            self.mark_failed(e)
+            return {}
+        found = {id: load_snapshot(model, raw) for id, raw in zip(ids, raws) if raw}
+        self.hits += len(found)
+        self.misses += len(ids) - len(found)
+        return found
+
+    async def set_many(self, records: Iterable):
+        """store snapshots of orm records"""
+        if not self.enabled:
+            return
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for record in records:
+                    pipe.set(
+                        self.model_key(type(record), record.id),
+                        dump_snapshot(record),
+                        ex=self.ttl,
+                    )
+                await pipe.execute()
+        except Exception as e:  # pylint: disable=broad-except
+            self.mark_failed(e)
+
+    async def invalidate(self, model, ids: Iterable):
+        """drop snapshots after writes"""
+        keys = [self.model_key(model, id) for id in ids]
+        if not keys or not self.enabled:
+            return
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                # bulk writes may touch a lot of rows, keep commands small
+                for start in range(0, len(keys), BATCH_KEYS):
+                    pipe.delete(*keys[start : start + BATCH_KEYS])
+                await pipe.execute()
+        except Exception as e:  # pylint: disable=broad-except
+            self.mark_failed(e)
+
+    async def get_or_load(self, model, id, loader: Callable[[], Awaitable[Any]]):
+        """cached read with stampede protection
+
+        Concurrent misses in this process share one loader call, and only
+        the worker holding the redis lock goes to postgres; others wait
+        briefly for its result before falling back to their own query.
+        Waiters get a detached copy, the loaded instance stays with the
+        session of the request that loaded it.
+        """
+        if not self.enabled:
+            return await loader()
+        found = await self.get_many(model, [id])
+        if id in found:
+            return found[id]
+        if not self.enabled:
+            return await loader()
+        key = self.model_key(model, id)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            snapshot = await asyncio.shield(inflight)
+            return load_snapshot(model, snapshot) if snapshot is not None else None
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            record = await self._load_locked(model, id, key, loader)
+            future.set_result(dump_snapshot(record) if record is not None else None)
+            return record
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _load_locked(self, model, id, key: str, loader):
+        lock_key = "lock:" + key
+        try:
+            locked = await self.client.set(lock_key, 1, px=self.lock_ttl_ms, nx=True)
+        except Exception as e:  # pylint: disable=broad-except
+            self.mark_failed(e)
+            return await loader()
+        if not locked:
+            deadline = time.monotonic() + self.lock_ttl_ms / 1000
+            while time.monotonic() < deadline and self.enabled:
+                await asyncio.sleep(0.01)
+                found = await self.get_many(model, [id])
+                if id in found:
+                    return found[id]
+            return await loader()
+        try:
+            record = await loader()
+            if record is not None:
+                await self.set_many([record])
+            return record
+        finally:
+            try:
+                await self.client.delete(lock_key)
+            except Exception as e:  # pylint: disable=broad-except
+                self.mark_failed(e)
+
+    async def revoke_token(self, token: str, ttl: float):
+        """mark token as revoked for all workers"""
+        if not self.enabled or ttl <= 0:
+            return
+        try:
+            await self.client.set(token_key(token), 1, ex=max(int(ttl), 1))
+        except Exception as e:  # pylint: disable=broad-except
+            self.mark_failed(e)
+
+    async def is_revoked(self, token: str) -> bool:
+        """check revoked tokens store"""
+        if not self.enabled:
+            return False
+        try:
+            return bool(await self.client.exists(token_key(token)))
+        except Exception as e:  # pylint: disable=broad-except
+            self.mark_failed(e)
+            return False
+
+    async def set_versions(self, model, versions: dict, ttl: int):
+        """publish latest versions of many records in one round trip"""
+        if not versions or not self.enabled:
+            return
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for id, version in versions.items():
+                    pipe.set("version:" + self.model_key(model, id), version, ex=ttl)
+                await pipe.execute()
+        except Exception as e:  # pylint: disable=broad-except
+            self.mark_failed(e)
+
+    async def get_version(self, model, id) -> int | None:
+        """latest published version, None if unknown"""
+        if not self.enabled:
+            return None
+        try:
+            raw = await self.client.get("version:" + self.model_key(model, id))
+        except Exception as e:  # pylint: disable=broad-except
+            self.mark_failed(e)
+            return None
+        return int(raw) if raw is not None else None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+
+
+shared_cache = SharedCache.from_settings()
@@ -0,0 +1,83 @@
+"""startup warm-up: pool connections, mappers, bcrypt and jwt"""
+
+import asyncio
+import time
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import configure_mappers
+from app.core.config import warmup_settings
+
+
+async def open_connections(engine: AsyncEngine, count: int):
+    """check out count connections at once so the pool keeps them idle"""
+    count = min(count, engine.pool.size())
+    connections = []
+    try:
+        # a failed connect mustn't leak the ones already checked out
+        for _ in range(count):
+            connections.append(await engine.connect())
+        await asyncio.gather(
+            *(connection.execute(text("select 1")) for connection in connections)
+        )
+    finally:
+        for connection in connections:
+            await connection.close()
+
+
+async def prime_crypto():
+    """bcrypt backend detection and jose key parsing happen on first use"""
+    from jose import jwt
+    from app.core.auth import create_access_token, password_hasher
+    from app.core.config import auth_settings
+
+    # one hash per worker, process workers import passlib on their own
+    await asyncio.gather(
+        *(password_hasher.hash("warm-up") for _ in range(password_hasher.workers))
+    )
+    jwt.decode(
+        create_access_token({"sub": "0"}),
+        auth_settings.SECRET_KEY,
+        algorithms=[auth_settings.ALGORITHM],
+    )
+
+
+async def warm_up(connections: int = warmup_settings.WARMUP_CONNECTIONS) -> dict:
+    """run warm-up steps, return time spent in each"""
+    from app.base.database import engine, replica_engines
+
+    timings = {}
+    started = time.perf_counter()
+    configure_mappers()
+    timings["mappers"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(open_connections(e, connections) for e in (engine, *replica_engines))
+    )
+    timings["pool"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await prime_crypto()
+    timings["crypto"] = time.perf_counter() - started
+    return timings
+
+
+async def warm_up_until_ready(state):
+    """retry warm-up until it succeeds, then mark state ready"""
+    while True:
+        try:
+            state.warmup = await warm_up()
+            state.ready = True
+            logger.info(
+                "Warm-up done: {}",
+                ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in state.warmup.items()),
+            )
+            return
+        except Exception as e:
+            logger.warning(
+                "Warm-up failed, retry in {}s: {}",
+                warmup_settings.WARMUP_RETRY_SECONDS,
+                e,
+            )
+            await asyncio.sleep(warmup_settings.WARMUP_RETRY_SECONDS)
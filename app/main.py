@@ -1,10 +1,123 @@
+"""app factory, `uvicorn app.main:create_app --factory` or `app.main:app`"""
+
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from functools import cache
 from fastapi import FastAPI
-from app.api.v1.auth_router import auth_router
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.core.config import ledger_settings, warmup_settings
+from app.core.log import setup_logging
+
+
+@cache
+def register_collectors():
+    """export stats() of app singletons once per process"""
+    from app.base.session_maker import database_manager
+    from app.core.admission import admission
+    from app.core.auth import password_hasher
+    from app.core.cache import identity_cache
+    from app.core.group_commit import ledger_writer
+    from app.core.metrics import stats_collector
+    from app.core.revocation import revocation_index
+    from app.core.shared_cache import shared_cache
+
+    stats_collector("password_hasher", password_hasher.stats, "bcrypt worker pool")
+    stats_collector("identity_cache", identity_cache.stats, "in-process identity cache")
+    stats_collector("shared_cache", shared_cache.stats, "redis snapshot cache")
+    stats_collector(
+        "revocation_index", revocation_index.stats, "token revocation index"
+    )
+    stats_collector("ledger_writer", ledger_writer.stats, "group commit ledger writer")
+    stats_collector("database", database_manager.stats, "primary and replica reads")
+    stats_collector("admission", admission.stats, "login and register admission")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from app.core.auth import password_hasher
+    from app.core.group_commit import ledger_writer
+    from app.core.rollups import rollup_refresher
+    from app.core.shared_cache import shared_cache
+    from app.core.warmup import warm_up_until_ready
+
+    app.state.ready = not warmup_settings.WARMUP_ENABLED
+    app.state.warmup = {}
+    # warm up in background so liveness answers while pool and bcrypt prime
+    warmup = (
+        asyncio.create_task(warm_up_until_ready(app.state))
+        if warmup_settings.WARMUP_ENABLED
+        else None
+    )
+    if ledger_settings.LEDGER_GROUP_COMMIT:
+        ledger_writer.start()
+    rollup_refresher.start()
+    yield
+    app.state.ready = False
+    if warmup is not None:
+        warmup.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmup
+    await rollup_refresher.stop()
+    await ledger_writer.stop()
+    password_hasher.shutdown()
+    await shared_cache.close()
+
+
+def create_app() -> FastAPI:
+    """build app, routers and their dependencies are imported here"""
+    from app.api.v1.auth_router import auth_router
+    from app.api.v1.wallet_router import wallet_router
+    from app.api.v1.settlement_router import settlement_router
+    from app.core.idempotency import IdempotencyMiddleware
+    from app.core.metrics import MetricsMiddleware, registry
+
+    setup_logging()
+    register_collectors()
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.ready = False
+    app.add_middleware(
+        IdempotencyMiddleware,
+        paths=[
+            r"/api/v1/auth/register",
+            r"/api/v1/wallets/[^/]+/(deposit|withdraw)",
+            r"/api/v1/settlements",
+        ],
+    )
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(auth_router)
+    app.include_router(wallet_router)
+    app.include_router(settlement_router)
+
+    @app.get("/app")
+    async def start_app():
+        return {"appochka"}
+
+    @app.get("/health/live", include_in_schema=False)
+    async def live():
+        return {"status": "alive"}
+
+    @app.get("/health/ready", include_in_schema=False)
+    async def ready():
+        if not app.state.ready:
+            # warm-up errors are logged, they may name hosts and users
+            return JSONResponse({"status": "warming up"}, status_code=503)
+        return {"status": "ready", "warmup": app.state.warmup}
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        if not registry.enabled:
+            return PlainTextResponse("metrics disabled\n", status_code=404)
+        return PlainTextResponse(
+            registry.render(), media_type="text/plain; version=0.0.4"
+        )
 
-app = FastAPI()
-app.include_router(auth_router)
+    return app
 
 
-@app.get("/app")
-async def start_app():
-    return {"appochka"}
+def __getattr__(name: str):
+    # `app.main:app` keeps working, importing the module alone builds nothing
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,163 @@
+"""Model and DAO for stored responses of idempotent requests"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import (
+    JSON,
+    TIMESTAMP,
+    Integer,
+    LargeBinary,
+    String,
+    delete,
+    func,
+    or_,
+    select,
+)
+from sqlalchemy.dialects.postgresql import UUID, insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+from loguru import logger
+from app.base.database import Base
+from app.base.BaseDAO import BaseDAO
+
+
+class IdempotencyKey(Base):
+    """Idempotency-Key with request fingerprint and stored response
+
+    status_code is NULL while the first request is still running. owner is
+    new on every acquisition, only its holder may store a response. The
+    fingerprint is known once the body is read, it is stored with it.
+    """
+
+    key: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    fingerprint: Mapped[str | None] = mapped_column(String(64))
+    owner: Mapped[uuid.UUID | None] = mapped_column(UUID)
+    status_code: Mapped[int | None] = mapped_column(Integer)
+    response_headers: Mapped[list | None] = mapped_column(JSON)
+    response_body: Mapped[bytes | None] = mapped_column(LargeBinary)
+    locked_until: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False
+    )
+    expires_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False, index=True
+    )
+
+
+class IdempotencyKeyDAO(BaseDAO):
+    """DAO class for idempotency keys"""
+
+    model = IdempotencyKey
+
+    @classmethod
+    async def acquire(
+        cls,
+        key: str,
+        owner: uuid.UUID,
+        lock_seconds: int,
+        ttl: int,
+        session: AsyncSession,
+    ) -> IdempotencyKey | None:
+        """claim key for execution, returns existing record if it is taken
+
+        Expired records and abandoned locks are taken over.
+        """
+        now = datetime.now(timezone.utc)
+        query = insert(IdempotencyKey).values(
+            key=key,
+            owner=owner,
+            locked_until=now + timedelta(seconds=lock_seconds),
+            expires_at=now + timedelta(seconds=ttl),
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[IdempotencyKey.key],
+            set_={
+                "fingerprint": None,
+                "owner": query.excluded.owner,
+                "status_code": None,
+                "response_headers": None,
+                "response_body": None,
+                "locked_until": query.excluded.locked_until,
+                "expires_at": query.excluded.expires_at,
+                "updated_at": func.now(),
+            },
+            where=or_(
+                IdempotencyKey.expires_at <= now,
+                (IdempotencyKey.status_code.is_(None))
+                & (IdempotencyKey.locked_until <= now),
+            ),
+        ).returning(IdempotencyKey.id)
+        try:
+            if (await session.execute(query)).scalar_one_or_none() is not None:
+                return None
+            return await cls.find_by_key(key, session)
+        except SQLAlchemyError as e:
+            logger.error(f"Error in acquire idempotency key: {e}")
+            raise
+
+    @classmethod
+    async def find_by_key(cls, key: str, session: AsyncSession):
+        """find record by key"""
+        result = await session.execute(
+            select(IdempotencyKey).where(IdempotencyKey.key == key)
+        )
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def claim(cls, key: str, owner: uuid.UUID, session: AsyncSession) -> bool:
+        """lock unfinished key of owner until the end of the transaction
+
+        Called in the transaction of the write the key guards, a takeover
+        of an expired lock waits for it and then sees the stored response.
+        """
+        query = (
+            IdempotencyKey.__table__.update()
+            .where(
+                IdempotencyKey.key == key,
+                IdempotencyKey.owner == owner,
+                IdempotencyKey.status_code.is_(None),
+            )
+            .values(updated_at=func.now())
+            .returning(IdempotencyKey.id)
+        )
+        return (await session.execute(query)).scalar_one_or_none() is not None
+
+    @classmethod
+    async def complete(
+        cls,
+        key: str,
+        owner: uuid.UUID,
+        fingerprint: str | None,
+        status_code: int,
+        headers: list,
+        body: bytes,
+        session: AsyncSession,
+    ):
+        """store response of finished request"""
+        await session.execute(
+            IdempotencyKey.__table__.update()
+            .where(IdempotencyKey.key == key, IdempotencyKey.owner == owner)
+            .values(
+                fingerprint=fingerprint,
+                status_code=status_code,
+                response_headers=headers,
+                response_body=body,
+                updated_at=func.now(),
+            )
+        )
+
+    @classmethod
+    async def release(cls, key: str, owner: uuid.UUID, session: AsyncSession):
+        """forget key of failed request so it can be retried"""
+        await session.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.key == key,
+                IdempotencyKey.owner == owner,
+                IdempotencyKey.status_code.is_(None),
+            )
+        )
+
+    @classmethod
+    async def purge_expired(cls, session: AsyncSession) -> int:
+        query = delete(IdempotencyKey).where(IdempotencyKey.expires_at <= func.now())
+        return (await session.execute(query)).rowcount
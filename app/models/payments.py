@@ -1,11 +1,34 @@
 """Models and DAO for payments and wallets"""
 
 import uuid
+from datetime import date, datetime
 from decimal import Decimal
 from typing import TYPE_CHECKING
-from sqlalchemy import Numeric, ForeignKey, String
+from sqlalchemy import (
+    TIMESTAMP,
+    BigInteger,
+    Row,
+    Sequence,
+    any_,
+    bindparam,
+    cast,
+    Index,
+    Numeric,
+    ForeignKey,
+    String,
+    func,
+    insert,
+    literal,
+    select,
+    text,
+    true,
+    update,
+)
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from loguru import logger
 from app.base.database import Base
 from app.base.BaseDAO import BaseDAO
 
@@ -25,10 +48,41 @@ class Wallet(Base):
     transactions = relationship("Transaction", back_populates="wallet")
 
 
+# ledger order: taken by the INSERT, after the wallet row lock, so per
+# wallet it follows the balance chain, unlike created_at or the random id
+LEDGER_SEQ = Sequence("transactions_seq_seq")
+
+
 class Transaction(Base):
-    """Transaction model"""
+    """Transaction model, partitioned by month of created_at"""
+
+    __table_args__ = (
+        # covers the whole history keyset, pages never sort
+        Index("ix_transactions_wallet_id_seq", "wallet_id", text("seq DESC")),
+        # tiny index for range scans of append-only created_at, used by backfill
+        Index("ix_transactions_created_at_brin", "created_at", postgresql_using="brin"),
+        # rows of transactions not yet rolled up, always at the right edge
+        Index("ix_transactions_txid", "txid"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID, primary_key=True)
+    # partition key has to be part of primary key, clock_timestamp() is the
+    # insert time, now() would be the start of a transaction that may have
+    # waited for the wallet lock
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP, server_default=func.clock_timestamp(), primary_key=True
+    )
+    seq: Mapped[int] = mapped_column(
+        BigInteger, LEDGER_SEQ, server_default=LEDGER_SEQ.next_value(), nullable=False
+    )
+    # id of the writing transaction, rollups fold rows in commit order by
+    # comparing it with the xmin of their snapshot
+    txid: Mapped[int] = mapped_column(
+        BigInteger,
+        server_default=text("pg_current_xact_id()::text::bigint"),
+        nullable=False,
+    )
     wallet_id: Mapped[uuid.UUID] = mapped_column(UUID, ForeignKey("wallets.id"))
     operation_type: Mapped[str] = mapped_column(String, nullable=False)
     amount: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
@@ -37,13 +91,369 @@ class Transaction(Base):
     wallet = relationship("Wallet", back_populates="transactions")
 
 
+# largest value of a Numeric(12, 2) balance
+MAX_BALANCE = Decimal("9999999999.99")
+
+
+class WalletNotFound(LookupError):
+    """wallet doesn't exist or belongs to other user"""
+
+
+class InsufficientFunds(ValueError):
+    """withdraw would make balance negative"""
+
+
+class BalanceLimitExceeded(ValueError):
+    """deposit would push balance over MAX_BALANCE"""
+
+
 class WalletDAO(BaseDAO):
     """DAO class for wallet model"""
 
     model = Wallet
 
+    @classmethod
+    def _operation_query(
+        cls,
+        wallet_id: uuid.UUID,
+        operation_type: str,
+        amount: Decimal,
+        delta: Decimal,
+        user_id: int | None,
+    ):
+        """UPDATE wallet and INSERT ledger row in one statement
+
+        Overdraft and the Numeric(12, 2) limit are checked in the WHERE
+        clause, so concurrent operations on one wallet only wait for the row
+        lock of the UPDATE.
+        """
+        limit = (
+            Wallet.balance + delta <= MAX_BALANCE
+            if delta > 0
+            else Wallet.balance + delta >= 0
+        )
+        condition = [Wallet.id == wallet_id, limit]
+        if user_id is not None:
+            condition.append(Wallet.user_id == user_id)
+        updated = (
+            update(Wallet)
+            .where(*condition)
+            .values(balance=Wallet.balance + delta, updated_at=func.now())
+            .returning(Wallet.id, Wallet.balance)
+            .cte("updated")
+        )
+        ledger = (
+            insert(Transaction)
+            .from_select(
+                [
+                    "id",
+                    "wallet_id",
+                    "operation_type",
+                    "amount",
+                    "balance_before",
+                    "balance_after",
+                ],
+                select(
+                    literal(uuid.uuid4(), UUID),
+                    updated.c.id,
+                    literal(operation_type),
+                    literal(amount, Numeric(12, 2)),
+                    updated.c.balance - delta,
+                    updated.c.balance,
+                ),
+            )
+            .returning(
+                Transaction.id,
+                Transaction.wallet_id,
+                Transaction.operation_type,
+                Transaction.amount,
+                Transaction.balance_before,
+                Transaction.balance_after,
+                Transaction.created_at,
+                Transaction.seq,
+            )
+            .cte("ledger")
+        )
+        exists = (
+            select(func.count())
+            .select_from(Wallet)
+            .where(*condition[:1] + condition[2:])
+            .scalar_subquery()
+        )
+        return select(ledger, exists.label("wallet_exists")).select_from(
+            select(literal(1)).subquery().outerjoin(ledger, true())
+        )
+
+    @classmethod
+    async def apply_operation(
+        cls,
+        wallet_id: uuid.UUID,
+        operation_type: str,
+        amount: Decimal,
+        session: AsyncSession,
+        user_id: int | None = None,
+    ):
+        """deposit or withdraw in one round trip, returns ledger row"""
+        delta = amount if operation_type == "deposit" else -amount
+        query = cls._operation_query(wallet_id, operation_type, amount, delta, user_id)
+        try:
+            result = await session.execute(query)
+        except SQLAlchemyError as e:
+            logger.error(f"Error in {operation_type} for wallet {wallet_id}: {e}")
+            raise
+        row = result.one()
+        if row.id is None:
+            if not row.wallet_exists:
+                raise WalletNotFound(wallet_id)
+            if delta > 0:
+                raise BalanceLimitExceeded(wallet_id)
+            raise InsufficientFunds(wallet_id)
+        return row
+
+    @classmethod
+    async def deposit(
+        cls,
+        wallet_id: uuid.UUID,
+        amount: Decimal,
+        session: AsyncSession,
+        user_id: int | None = None,
+    ):
+        """add amount to wallet balance"""
+        return await cls.apply_operation(wallet_id, "deposit", amount, session, user_id)
+
+    @classmethod
+    async def withdraw(
+        cls,
+        wallet_id: uuid.UUID,
+        amount: Decimal,
+        session: AsyncSession,
+        user_id: int | None = None,
+    ):
+        """take amount from wallet balance if it is enough"""
+        return await cls.apply_operation(
+            wallet_id, "withdraw", amount, session, user_id
+        )
+
+    @classmethod
+    async def find_id_range(
+        cls,
+        after: uuid.UUID | None,
+        upper: uuid.UUID | None,
+        limit: int,
+        session: AsyncSession,
+    ) -> list[Row]:
+        """(id, balance, created_at) of wallets with after < id < upper in id order"""
+        query = (
+            select(Wallet.id, Wallet.balance, Wallet.created_at)
+            .order_by(Wallet.id)
+            .limit(limit)
+        )
+        if after is not None:
+            query = query.where(Wallet.id > after)
+        if upper is not None:
+            query = query.where(Wallet.id < upper)
+        return list((await session.execute(query)).all())
+
+    @classmethod
+    async def lock_for_update(cls, ids, session: AsyncSession) -> dict[uuid.UUID, Row]:
+        """lock wallets in id order, concurrent batches queue instead of deadlocking
+
+        Rows carry id, user_id and balance.
+        """
+        query = (
+            select(Wallet.id, Wallet.user_id, Wallet.balance)
+            .where(Wallet.id == any_(bindparam("ids", type_=ARRAY(UUID))))
+            .order_by(Wallet.id)
+            .with_for_update()
+        )
+        try:
+            result = await session.execute(query, {"ids": sorted(ids)})
+        except SQLAlchemyError as e:
+            logger.error(f"Error in lock_for_update: {e}")
+            raise
+        return {row.id: row for row in result}
+
+    @classmethod
+    async def apply_deltas(
+        cls, deltas: dict[uuid.UUID, Decimal], session: AsyncSession
+    ):
+        """add net delta to every wallet in one UPDATE"""
+        if not deltas:
+            return
+        try:
+            await session.execute(
+                text(
+                    "UPDATE wallets SET balance = wallets.balance + d.delta, "
+                    "updated_at = now() "
+                    "FROM unnest(CAST(:ids AS uuid[]), CAST(:deltas AS numeric[])) "
+                    "AS d(id, delta) WHERE wallets.id = d.id"
+                ),
+                {"ids": list(deltas), "deltas": list(deltas.values())},
+            )
+        except SQLAlchemyError as e:
+            logger.error(f"Error in apply_deltas: {e}")
+            raise
+
 
 class TransactionDAO(BaseDAO):
     """DAO class for transactions"""
 
     model = Transaction
+
+    @classmethod
+    async def find_wallet_history(
+        cls,
+        wallet_id: uuid.UUID,
+        session: AsyncSession,
+        limit: int,
+        before: int | None = None,
+        operation_type: str | None = None,
+        date_from: datetime | None = None,
+        date_to: datetime | None = None,
+    ) -> list:
+        """newest first page of ledger rows, before is seq of last seen row
+
+        Reads only the columns of TransactionHistoryItem and walks the
+        per-wallet ledger index, so page cost doesn't depend on history
+        length.
+        """
+        query = select(
+            Transaction.id,
+            Transaction.seq,
+            Transaction.operation_type,
+            Transaction.amount,
+            Transaction.balance_after,
+            Transaction.created_at,
+        ).where(Transaction.wallet_id == wallet_id)
+        if operation_type is not None:
+            query = query.where(Transaction.operation_type == operation_type)
+        if date_from is not None:
+            query = query.where(Transaction.created_at >= date_from)
+        if date_to is not None:
+            query = query.where(Transaction.created_at < date_to)
+        if before is not None:
+            query = query.where(Transaction.seq < before)
+        query = query.order_by(Transaction.seq.desc()).limit(limit)
+        try:
+            result = await session.execute(query)
+            return result.all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error in find_wallet_history: {e}")
+            raise
+
+    @classmethod
+    async def stream_ledger(
+        cls, wallet_ids: list[uuid.UUID], session: AsyncSession, batch_size: int = 5000
+    ):
+        """yield ledger rows of wallets grouped by wallet in seq order"""
+        query = (
+            select(
+                Transaction.wallet_id,
+                Transaction.id,
+                Transaction.operation_type,
+                Transaction.amount,
+                Transaction.balance_before,
+                Transaction.balance_after,
+            )
+            .where(Transaction.wallet_id == any_(bindparam("ids", type_=ARRAY(UUID))))
+            .order_by(Transaction.wallet_id, Transaction.seq)
+            .execution_options(yield_per=batch_size)
+        )
+        try:
+            result = await session.stream(query, {"ids": wallet_ids})
+            async for partition in result.partitions():
+                for row in partition:
+                    yield row
+        except SQLAlchemyError as e:
+            logger.error(f"Error in stream_ledger: {e}")
+            raise
+
+    @classmethod
+    async def stream_statement(
+        cls,
+        wallet_id: uuid.UUID,
+        session: AsyncSession,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        batch_size: int = 50_000,
+        as_text: bool = False,
+    ):
+        """yield lists of plain ledger tuples oldest first from server-side cursor,
+        as_text has postgres render every column"""
+        columns = [
+            Transaction.id,
+            Transaction.created_at,
+            Transaction.operation_type,
+            Transaction.amount,
+            Transaction.balance_before,
+            Transaction.balance_after,
+        ]
+        if as_text:
+            columns = [cast(column, String) for column in columns]
+        query = select(*columns).where(Transaction.wallet_id == wallet_id)
+        if start is not None:
+            query = query.where(Transaction.created_at >= start)
+        if end is not None:
+            query = query.where(Transaction.created_at < end)
+        query = query.order_by(Transaction.seq).execution_options(yield_per=batch_size)
+        try:
+            result = await session.stream(query)
+            async for partition in result.tuples().partitions():
+                yield partition
+        except SQLAlchemyError as e:
+            logger.error(f"Error in stream_statement: {e}")
+            raise
+
+    @staticmethod
+    def partition_name(month: date) -> str:
+        return f"transactions_y{month.year}m{month.month:02d}"
+
+    @classmethod
+    async def create_partition(cls, month: date, session: AsyncSession) -> str:
+        """create monthly partition if it doesn't exist"""
+        start = month.replace(day=1)
+        end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        name = cls.partition_name(start)
+        await session.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF transactions "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        )
+        logger.info(f"Partition {name} is ready")
+        return name
+
+    @classmethod
+    async def list_partitions(cls, session: AsyncSession) -> list[tuple[str, date]]:
+        """monthly partitions with their first day, default one is skipped"""
+        result = await session.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'transactions'::regclass "
+                "AND c.relname ~ '^transactions_y[0-9]{4}m[0-9]{2}$' "
+                "ORDER BY c.relname"
+            )
+        )
+        return [
+            (name, date(int(name[14:18]), int(name[19:21]), 1))
+            for name in result.scalars().all()
+        ]
+
+    @classmethod
+    async def retire_partitions(
+        cls, before: date, session: AsyncSession, drop: bool = False
+    ) -> list[str]:
+        """detach (and drop) partitions that end before given month"""
+        retired = []
+        for name, month in await cls.list_partitions(session):
+            if month >= before.replace(day=1):
+                continue
+            await session.execute(
+                text(f"ALTER TABLE transactions DETACH PARTITION {name}")
+            )
+            if drop:
+                await session.execute(text(f"DROP TABLE {name}"))
+            logger.info(f"Partition {name} {'dropped' if drop else 'detached'}")
+            retired.append(name)
+        return retired
@@ -0,0 +1,138 @@
+"""Models and DAO for ledger reconciliation runs"""
+
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import (
+    TIMESTAMP,
+    Boolean,
+    ForeignKey,
+    Integer,
+    Numeric,
+    String,
+    UniqueConstraint,
+    func,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+from app.base.database import Base
+from app.base.BaseDAO import BaseDAO
+
+
+class ReconciliationRun(Base):
+    """One pass over all wallets, split in shards of uuid space"""
+
+    shards: Mapped[int] = mapped_column(Integer, nullable=False)
+    finished_at: Mapped[datetime | None] = mapped_column(TIMESTAMP)
+
+
+class ReconciliationCheckpoint(Base):
+    """Progress of one shard, wallets up to last_wallet_id are checked"""
+
+    __table_args__ = (UniqueConstraint("run_id", "shard"),)
+
+    run_id: Mapped[int] = mapped_column(
+        ForeignKey("reconciliationruns.id", ondelete="CASCADE")
+    )
+    shard: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_wallet_id: Mapped[uuid.UUID | None] = mapped_column(UUID)
+    wallets: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    transactions: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default="0"
+    )
+    issues: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    done: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="false")
+
+
+class ReconciliationIssue(Base):
+    """Ledger row or wallet that doesn't add up"""
+
+    run_id: Mapped[int] = mapped_column(
+        ForeignKey("reconciliationruns.id", ondelete="CASCADE"), index=True
+    )
+    wallet_id: Mapped[uuid.UUID] = mapped_column(UUID, nullable=False)
+    # opening_balance, amount, chain, balance, total
+    kind: Mapped[str] = mapped_column(String, nullable=False)
+    transaction_id: Mapped[uuid.UUID | None] = mapped_column(UUID)
+    expected: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False)
+    actual: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False)
+
+
+class ReconciliationDAO(BaseDAO):
+    """DAO class for reconciliation runs and their checkpoints"""
+
+    model = ReconciliationRun
+
+    @classmethod
+    async def start_run(cls, shards: int, session: AsyncSession) -> int:
+        (run_id,) = await cls.add_many([{"shards": shards}], session)
+        await session.execute(
+            ReconciliationCheckpoint.__table__.insert(),
+            [{"run_id": run_id, "shard": shard} for shard in range(shards)],
+        )
+        return run_id
+
+    @classmethod
+    async def last_unfinished_run(cls, session: AsyncSession) -> int | None:
+        query = (
+            select(ReconciliationRun.id)
+            .where(ReconciliationRun.finished_at.is_(None))
+            .order_by(ReconciliationRun.id.desc())
+            .limit(1)
+        )
+        return (await session.execute(query)).scalar_one_or_none()
+
+    @classmethod
+    async def get_checkpoints(
+        cls, run_id: int, session: AsyncSession
+    ) -> list[ReconciliationCheckpoint]:
+        query = (
+            select(ReconciliationCheckpoint)
+            .where(ReconciliationCheckpoint.run_id == run_id)
+            .order_by(ReconciliationCheckpoint.shard)
+        )
+        return list((await session.execute(query)).scalars().all())
+
+    @classmethod
+    async def save_progress(
+        cls,
+        run_id: int,
+        shard: int,
+        last_wallet_id: uuid.UUID | None,
+        wallets: int,
+        transactions: int,
+        issues: list[dict],
+        done: bool,
+        session: AsyncSession,
+    ):
+        """store issues of a batch and move shard checkpoint in one transaction"""
+        if issues:
+            await session.execute(ReconciliationIssue.__table__.insert(), issues)
+        values = {
+            "wallets": ReconciliationCheckpoint.wallets + wallets,
+            "transactions": ReconciliationCheckpoint.transactions + transactions,
+            "issues": ReconciliationCheckpoint.issues + len(issues),
+            "done": done,
+            "updated_at": func.now(),
+        }
+        if last_wallet_id is not None:
+            values["last_wallet_id"] = last_wallet_id
+        await session.execute(
+            update(ReconciliationCheckpoint)
+            .where(
+                ReconciliationCheckpoint.run_id == run_id,
+                ReconciliationCheckpoint.shard == shard,
+            )
+            .values(**values)
+        )
+
+    @classmethod
+    async def finish_run(cls, run_id: int, session: AsyncSession):
+        await session.execute(
+            update(ReconciliationRun)
+            .where(ReconciliationRun.id == run_id)
+            .values(finished_at=func.now(), updated_at=func.now())
+        )
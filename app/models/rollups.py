@@ -0,0 +1,257 @@
+"""Models and DAO for daily wallet balance rollups"""
+
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import (
+    BigInteger,
+    Date,
+    Integer,
+    Numeric,
+    String,
+    Text,
+    UniqueConstraint,
+    case,
+    cast,
+    func,
+    literal,
+    select,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import (
+    UUID,
+    aggregate_order_by,
+    array_agg,
+    insert,
+)
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+from loguru import logger
+from app.base.database import Base
+from app.base.BaseDAO import BaseDAO
+from app.models.payments import Transaction
+
+LEDGER_WATERMARK = "wallet_daily_balances"
+
+
+class WalletDailyBalance(Base):
+    """Per wallet and day aggregate of the ledger"""
+
+    __table_args__ = (UniqueConstraint("wallet_id", "day"),)
+
+    wallet_id: Mapped[uuid.UUID] = mapped_column(UUID, nullable=False)
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    opening_balance: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
+    closing_balance: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
+    credits: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False)
+    debits: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False)
+    operations: Mapped[int] = mapped_column(Integer, nullable=False)
+    # ledger seq of the opening and closing rows, rows folded later may be
+    # older than ones already folded
+    first_seq: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    last_seq: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+
+class RollupWatermark(Base):
+    """Ledger rows of transactions with txid below last_txid are rolled up"""
+
+    name: Mapped[str] = mapped_column(String, unique=True, nullable=False)
+    last_txid: Mapped[int | None] = mapped_column(BigInteger)
+
+
+def snapshot_xmin():
+    """txids below it are finished, their rows are visible if committed"""
+    return cast(
+        cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger
+    )
+
+
+def aggregate_ledger(*conditions):
+    """select of daily aggregates over ledger rows matching conditions"""
+    day = cast(Transaction.created_at, Date)
+    change = Transaction.balance_after - Transaction.balance_before
+    return (
+        select(
+            Transaction.wallet_id,
+            day.label("day"),
+            array_agg(aggregate_order_by(Transaction.balance_before, Transaction.seq))[
+                1
+            ].label("opening_balance"),
+            array_agg(
+                aggregate_order_by(Transaction.balance_after, Transaction.seq.desc())
+            )[1].label("closing_balance"),
+            func.sum(func.greatest(change, 0)).label("credits"),
+            func.sum(func.greatest(-change, 0)).label("debits"),
+            func.count().label("operations"),
+            func.min(Transaction.seq).label("first_seq"),
+            func.max(Transaction.seq).label("last_seq"),
+        )
+        .where(*conditions)
+        .group_by(Transaction.wallet_id, day)
+    )
+
+
+ROLLUP_COLUMNS = [
+    "wallet_id",
+    "day",
+    "opening_balance",
+    "closing_balance",
+    "credits",
+    "debits",
+    "operations",
+    "first_seq",
+    "last_seq",
+]
+
+
+def merge_days(day: dict, other: dict):
+    """fold aggregate of other ledger rows of the same wallet day into day"""
+    if other["first_seq"] < day["first_seq"]:
+        day["opening_balance"] = other["opening_balance"]
+        day["first_seq"] = other["first_seq"]
+    if other["last_seq"] > day["last_seq"]:
+        day["closing_balance"] = other["closing_balance"]
+        day["last_seq"] = other["last_seq"]
+    day["credits"] += other["credits"]
+    day["debits"] += other["debits"]
+    day["operations"] += other["operations"]
+
+
+class WalletDailyBalanceDAO(BaseDAO):
+    """DAO class for daily balance rollups"""
+
+    model = WalletDailyBalance
+
+    @classmethod
+    async def lock_watermark(cls, session: AsyncSession, wait: bool):
+        await session.execute(
+            insert(RollupWatermark)
+            .values(name=LEDGER_WATERMARK)
+            .on_conflict_do_nothing(index_elements=[RollupWatermark.name])
+        )
+        query = (
+            select(RollupWatermark)
+            .where(RollupWatermark.name == LEDGER_WATERMARK)
+            .with_for_update(skip_locked=not wait)
+        )
+        return (await session.execute(query)).scalar_one_or_none()
+
+    @classmethod
+    async def refresh(cls, session: AsyncSession) -> int:
+        """fold ledger rows of transactions finished since watermark into rollups
+
+        created_at and seq are taken before commit, so a later commit can
+        carry an older value than rows already seen. txid below the snapshot
+        xmin means the writer has finished, rows are folded by that instead.
+        """
+        watermark = await cls.lock_watermark(session, wait=False)
+        if watermark is None:
+            logger.info("Rollup refresh is running elsewhere, skip")
+            return 0
+        bound = (await session.execute(select(snapshot_xmin()))).scalar_one()
+        conditions = [Transaction.txid < bound]
+        if watermark.last_txid is not None:
+            if bound <= watermark.last_txid:
+                return 0
+            conditions.append(Transaction.txid >= watermark.last_txid)
+        query = insert(WalletDailyBalance).from_select(
+            ROLLUP_COLUMNS, aggregate_ledger(*conditions)
+        )
+        excluded = query.excluded
+        earlier = excluded.first_seq < WalletDailyBalance.first_seq
+        later = excluded.last_seq > WalletDailyBalance.last_seq
+        query = query.on_conflict_do_update(
+            index_elements=["wallet_id", "day"],
+            set_={
+                "opening_balance": case(
+                    (earlier, excluded.opening_balance),
+                    else_=WalletDailyBalance.opening_balance,
+                ),
+                "first_seq": func.least(
+                    WalletDailyBalance.first_seq, excluded.first_seq
+                ),
+                "closing_balance": case(
+                    (later, excluded.closing_balance),
+                    else_=WalletDailyBalance.closing_balance,
+                ),
+                "last_seq": func.greatest(
+                    WalletDailyBalance.last_seq, excluded.last_seq
+                ),
+                "credits": WalletDailyBalance.credits + excluded.credits,
+                "debits": WalletDailyBalance.debits + excluded.debits,
+                "operations": WalletDailyBalance.operations + excluded.operations,
+                "updated_at": func.now(),
+            },
+        )
+        try:
+            result = await session.execute(query)
+        except SQLAlchemyError as e:
+            logger.error(f"Error in rollup refresh: {e}")
+            raise
+        watermark.last_txid = bound
+        await session.flush()
+        logger.info(f"Rolled up {result.rowcount} wallet days below txid {bound}")
+        return result.rowcount
+
+    @classmethod
+    async def rebuild_range(
+        cls, start: datetime, end: datetime, bound: int, session: AsyncSession
+    ) -> int:
+        """recompute rollups of days in [start, end) from rows below txid bound"""
+        query = insert(WalletDailyBalance).from_select(
+            ROLLUP_COLUMNS,
+            aggregate_ledger(
+                Transaction.created_at >= start,
+                Transaction.created_at < end,
+                Transaction.txid < bound,
+            ),
+        )
+        query = query.on_conflict_do_update(
+            index_elements=["wallet_id", "day"],
+            set_={column: query.excluded[column] for column in ROLLUP_COLUMNS[2:]}
+            | {"updated_at": func.now()},
+        )
+        result = await session.execute(query)
+        return result.rowcount
+
+    @classmethod
+    async def statement(
+        cls,
+        wallet_id: uuid.UUID,
+        date_from: date,
+        date_to: date,
+        session: AsyncSession,
+    ) -> list[dict]:
+        """daily rows for [date_from, date_to], fresh ledger tail included
+
+        Rollups and the tail not yet folded are read in one statement, so a
+        refresh committing in between can't count rows twice or miss them.
+        """
+        watermark = (
+            select(RollupWatermark.last_txid)
+            .where(RollupWatermark.name == LEDGER_WATERMARK)
+            .scalar_subquery()
+        )
+        rolled = select(
+            *(WalletDailyBalance.__table__.c[c] for c in ROLLUP_COLUMNS)
+        ).where(
+            WalletDailyBalance.wallet_id == wallet_id,
+            WalletDailyBalance.day >= date_from,
+            WalletDailyBalance.day <= date_to,
+        )
+        tail = aggregate_ledger(
+            Transaction.wallet_id == wallet_id,
+            Transaction.created_at >= datetime.combine(date_from, datetime.min.time()),
+            Transaction.created_at
+            < datetime.combine(date_to + timedelta(days=1), datetime.min.time()),
+            Transaction.txid >= func.coalesce(watermark, literal(0)),
+        )
+        days: dict[date, dict] = {}
+        for row in await session.execute(union_all(rolled, tail)):
+            part = row._asdict()
+            if row.day in days:
+                merge_days(days[row.day], part)
+            else:
+                days[row.day] = part
+        return [days[day] for day in sorted(days)]
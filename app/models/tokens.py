@@ -0,0 +1,75 @@
+"""Model and DAO for revoked refresh tokens"""
+
+import uuid
+from datetime import datetime
+from sqlalchemy import TIMESTAMP, Index, Integer, select, delete, func
+from sqlalchemy.dialects.postgresql import UUID, insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+from loguru import logger
+from app.base.database import Base
+from app.base.BaseDAO import BaseDAO
+
+
+class RevokedToken(Base):
+    """Revoked refresh token jti or token family id"""
+
+    __table_args__ = (Index("ix_revokedtokens_created_at", "created_at"),)
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False, index=True
+    )
+
+
+class RevokedTokenDAO(BaseDAO):
+    """DAO class for revoked tokens"""
+
+    model = RevokedToken
+
+    @classmethod
+    async def revoke(
+        cls, id: uuid.UUID, user_id: int, expires_at: datetime, session: AsyncSession
+    ) -> bool:
+        """revoke id, False if it was already revoked"""
+        try:
+            query = (
+                insert(RevokedToken)
+                .values(id=id, user_id=user_id, expires_at=expires_at)
+                .on_conflict_do_nothing(index_elements=[RevokedToken.id])
+                .returning(RevokedToken.id)
+            )
+            result = await session.execute(query)
+            return result.scalar_one_or_none() is not None
+        except SQLAlchemyError as e:
+            logger.error(f"Error in revoke: {e}")
+            raise
+
+    @classmethod
+    async def find_revoked(
+        cls, ids: list[uuid.UUID], session: AsyncSession
+    ) -> set[uuid.UUID]:
+        """ids from list that are revoked"""
+        query = select(RevokedToken.id).where(RevokedToken.id.in_(ids))
+        result = await session.execute(query)
+        return set(result.scalars().all())
+
+    @classmethod
+    async def revoked_since(cls, since: datetime | None, session: AsyncSession):
+        """(id, expires_at, created_at) rows added after since"""
+        query = select(
+            RevokedToken.id, RevokedToken.expires_at, RevokedToken.created_at
+        ).where(RevokedToken.expires_at > func.now())
+        if since is not None:
+            query = query.where(RevokedToken.created_at >= since)
+        result = await session.execute(query)
+        return result.all()
+
+    @classmethod
+    async def purge_expired(cls, session: AsyncSession) -> int:
+        """drop rows of tokens that expired anyway"""
+        query = delete(RevokedToken).where(RevokedToken.expires_at <= func.now())
+        result = await session.execute(query)
+        return result.rowcount
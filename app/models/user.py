@@ -2,13 +2,24 @@
 
 import uuid
 from typing import TYPE_CHECKING
-from sqlalchemy import ForeignKey
+from sqlalchemy import (
+    ForeignKey,
+    Index,
+    Integer,
+    Row,
+    bindparam,
+    func,
+    select,
+    text,
+)
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.base.database import Base, str_uniq
-from app.base.BaseDAO import BaseDAO
+from app.base.BaseDAO import BaseDAO, after_commit
+from app.core.cache import identity_cache, user_versions
+from app.core.shared_cache import shared_cache
 
 if TYPE_CHECKING:
     from app.models.payments import Wallet
@@ -17,18 +28,70 @@ if TYPE_CHECKING:
 class User(Base):
     """User model"""
 
+    # case-insensitive uniqueness, serves UserDAO.find_credentials
+    __table_args__ = (Index("ix_users_email_lower", text("lower(email)"), unique=True),)
+    # never leaves postgres, cached users have password None
+    secret_columns = ("password",)
+
     name: Mapped[str]
     email: Mapped[str_uniq]
     password: Mapped[str] = mapped_column(nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
     wallet: Mapped["Wallet | None"] = relationship(back_populates="user")
 
 
+# built once, login runs it on every request
+CREDENTIALS_QUERY = (
+    select(User.id, User.name, User.email, User.password, User.version)
+    .where(func.lower(User.email) == bindparam("email"))
+    .limit(1)
+)
+
+VERSION_QUERY = select(User.version).where(User.id == bindparam("id"))
+
+
 class UserDAO(BaseDAO):
     """UserDAO class"""
 
     model = User
+    cached = True
 
     @classmethod
     async def find_user_by_filter(cls, filter: BaseModel, session: AsyncSession):
-        user = await cls.find_all_by_filter(filter, session)
-        return user[0] if user else None
+        return await cls.find_first_by_filter(filter, session)
+
+    @classmethod
+    async def find_credentials(cls, email: str, session: AsyncSession) -> Row | None:
+        """plain row with columns login needs, email is case-insensitive"""
+        result = await session.execute(CREDENTIALS_QUERY, {"email": email.lower()})
+        return result.first()
+
+    @classmethod
+    async def find_version(cls, user_id: int, session: AsyncSession) -> int | None:
+        """current version of user, None if user doesn't exist"""
+        result = await session.execute(VERSION_QUERY, {"id": user_id})
+        return result.scalar_one_or_none()
+
+    @classmethod
+    def _extra_update_values(cls) -> dict:
+        return {"version": User.version + 1}
+
+    @classmethod
+    def _written_columns(cls) -> tuple:
+        return (User.id, User.version)
+
+    @classmethod
+    def _after_write(cls, rows, session: AsyncSession):
+        """drop cached identities and publish new versions once users commit"""
+        super()._after_write(rows, session)
+        versions = {row.id: row.version for row in rows}
+        if not versions:
+            return
+
+        async def publish():
+            for user_id, version in versions.items():
+                identity_cache.invalidate_user(user_id)
+                user_versions.set(user_id, version)
+            await shared_cache.set_versions(User, versions, ttl=30 * 60)
+
+        after_commit(session, publish)
@@ -1,8 +1,110 @@
 import uuid
-from pydantic import BaseModel
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Literal
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class CreateWallet(BaseModel):
     id: uuid.UUID
     user_id: int
     balance: int = 0
+
+
+class WalletOperation(BaseModel):
+    """schema for deposit and withdraw"""
+
+    amount: Decimal = Field(gt=0, max_digits=12, decimal_places=2)
+
+
+class TransactionInfo(BaseModel):
+    """schema for ledger row"""
+
+    id: uuid.UUID
+    wallet_id: uuid.UUID
+    operation_type: str
+    amount: Decimal
+    balance_before: Decimal
+    balance_after: Decimal
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TransactionHistoryItem(BaseModel):
+    """lean schema for wallet history"""
+
+    id: uuid.UUID
+    operation_type: str
+    amount: Decimal
+    balance_after: Decimal
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TransactionPage(BaseModel):
+    """page of wallet history with cursor for the next one"""
+
+    items: list[TransactionHistoryItem]
+    next_cursor: str | None = None
+
+
+class DailyBalance(BaseModel):
+    """schema for one day of wallet statement"""
+
+    day: date
+    opening_balance: Decimal
+    closing_balance: Decimal
+    credits: Decimal
+    debits: Decimal
+    operations: int
+
+
+class WalletStatement(BaseModel):
+    """wallet statement for period"""
+
+    wallet_id: uuid.UUID
+    date_from: date
+    date_to: date
+    opening_balance: Decimal | None
+    closing_balance: Decimal | None
+    credits: Decimal
+    debits: Decimal
+    operations: int
+    days: list[DailyBalance]
+
+
+class TransferItem(BaseModel):
+    """one wallet to wallet transfer of a settlement batch"""
+
+    reference: str | None = Field(default=None, max_length=100)
+    from_wallet_id: uuid.UUID
+    to_wallet_id: uuid.UUID
+    amount: Decimal = Field(gt=0, max_digits=12, decimal_places=2)
+
+
+class TransferBatch(BaseModel):
+    """settlement batch as plain json"""
+
+    items: list[TransferItem]
+
+
+class TransferResult(BaseModel):
+    """outcome of one transfer"""
+
+    index: int
+    reference: str | None = None
+    status: Literal["settled", "rejected"]
+    error: str | None = None
+    debit_id: uuid.UUID | None = None
+    credit_id: uuid.UUID | None = None
+
+
+class SettlementResult(BaseModel):
+    """outcome of settlement batch"""
+
+    settled: int
+    rejected: int
+    attempts: int
+    results: list[TransferResult]
@@ -4,7 +4,6 @@ import uuid
 from pydantic import BaseModel, Field, model_validator, ConfigDict
 from pydantic.networks import EmailStr
 from fastapi import HTTPException, status
-from app.core.auth import hash_password
 
 
 class UserBase(BaseModel):
@@ -37,6 +36,16 @@ class UserInfo(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CurrentUser(BaseModel):
+    """lightweight snapshot of authenticated user"""
+
+    id: int
+    name: str
+    email: EmailStr
+
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+
 class UserRegister(UserBase):
     """shemas for user registration"""
 
@@ -49,5 +58,4 @@ class UserRegister(UserBase):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="passwords do not match"
             )
-        self.password = hash_password(self.password)
         return self
@@ -0,0 +1,158 @@
+"""in-process load test of auth and wallet flows through ASGI transport
+
+usage: python -m benchmarks.asgi_load --users 200 --concurrency 32 --output before.json
+Drives app.main:app with httpx.ASGITransport, no server or network in the
+way. Point DB_* at a disposable database migrated with `alembic upgrade head`
+(or any stand-in with the same schema). Admission control is off unless
+ADMISSION_ENABLED is set, so the numbers show the app rather than the limiter.
+Every phase runs for all virtual users before the next one starts and the
+created users, wallets and ledger rows are deleted at the end.
+"""
+
+import os
+
+os.environ.setdefault("ADMISSION_ENABLED", "false")
+
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable
+import httpx
+from sqlalchemy import delete, select
+from app.main import app
+from app.base.database import engine
+from app.base.session_maker import database_manager
+from app.models.user import User
+from app.models.payments import Transaction, Wallet
+from benchmarks.results import report, summarize
+
+PASSWORD = "bench-password"
+
+
+class VirtualUser:
+    def __init__(self, transport: httpx.ASGITransport, run: str, number: int):
+        self.client = httpx.AsyncClient(transport=transport, base_url="http://bench")
+        self.email = f"bench-{run}-{number}@example.com"
+        self.wallet_id: uuid.UUID | None = None
+
+    async def register(self):
+        return await self.client.post(
+            "/api/v1/auth/register",
+            json={
+                "name": "bench-user",
+                "email": self.email,
+                "password": PASSWORD,
+                "confirm_password": PASSWORD,
+            },
+        )
+
+    async def login(self):
+        return await self.client.post(
+            "/api/v1/auth/login", json={"email": self.email, "password": PASSWORD}
+        )
+
+    async def me(self):
+        return await self.client.post("/api/v1/auth/me")
+
+    async def deposit(self):
+        return await self.client.post(
+            f"/api/v1/wallets/{self.wallet_id}/deposit", json={"amount": "2.00"}
+        )
+
+    async def withdraw(self):
+        return await self.client.post(
+            f"/api/v1/wallets/{self.wallet_id}/withdraw", json={"amount": "1.00"}
+        )
+
+    async def transactions(self):
+        return await self.client.get(
+            f"/api/v1/wallets/{self.wallet_id}/transactions", params={"limit": 20}
+        )
+
+
+async def phase(
+    users: list[VirtualUser],
+    call: Callable[[VirtualUser], Awaitable[httpx.Response]],
+    repeat: int,
+    concurrency: int,
+) -> dict:
+    limit = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(user: VirtualUser):
+        nonlocal errors
+        async with limit:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = await call(user)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(user) for user in users))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def attach_wallets(users: list[VirtualUser]):
+    by_email = {user.email: user for user in users}
+    async with database_manager.create_session() as session:
+        rows = await session.execute(
+            select(User.email, Wallet.id)
+            .join(Wallet, Wallet.user_id == User.id)
+            .where(User.email.in_(by_email))
+        )
+        for email, wallet_id in rows:
+            by_email[email].wallet_id = wallet_id
+
+
+async def cleanup(users: list[VirtualUser]):
+    emails = [user.email for user in users]
+    async with database_manager.create_session() as session:
+        async with session.begin():
+            user_ids = select(User.id).where(User.email.in_(emails))
+            wallet_ids = select(Wallet.id).where(Wallet.user_id.in_(user_ids))
+            await session.execute(
+                delete(Transaction).where(Transaction.wallet_id.in_(wallet_ids))
+            )
+            await session.execute(delete(Wallet).where(Wallet.user_id.in_(user_ids)))
+            await session.execute(delete(User).where(User.email.in_(emails)))
+
+
+async def main(args):
+    transport = httpx.ASGITransport(app=app)
+    run = uuid.uuid4().hex[:8]
+    users = [VirtualUser(transport, run, number) for number in range(args.users)]
+    results = {}
+    async with app.router.lifespan_context(app):
+        try:
+            results["register"] = await phase(
+                users, VirtualUser.register, 1, args.concurrency
+            )
+            results["login"] = await phase(
+                users, VirtualUser.login, 1, args.concurrency
+            )
+            await attach_wallets(users)
+            for name in ("me", "deposit", "withdraw", "transactions"):
+                results[name] = await phase(
+                    users, getattr(VirtualUser, name), args.repeat, args.concurrency
+                )
+        finally:
+            await cleanup(users)
+            for user in users:
+                await user.client.aclose()
+    await engine.dispose()
+    report("asgi_load", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--repeat", type=int, default=10, help="requests per user for me and wallet"
+    )
+    parser.add_argument("--output", help="write json results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,106 @@
+"""compare BaseDAO.add loop with bulk insert paths
+
+usage: python -m benchmarks.bulk_insert --rows 50000
+Every case runs in a transaction that is rolled back, the database stays clean.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from decimal import Decimal
+from pydantic import BaseModel
+from app.base.session_maker import database_manager
+from app.models.user import UserDAO
+from app.models.payments import WalletDAO, TransactionDAO
+from app.schemas.payment_schemas import CreateWallet
+from app.schemas.user_schemas import UserBase
+
+
+class TransactionRow(BaseModel):
+    id: uuid.UUID
+    wallet_id: uuid.UUID
+    operation_type: str
+    amount: Decimal
+    balance_before: Decimal
+    balance_after: Decimal
+
+
+def users(n: int, run: str):
+    for i in range(n):
+        yield UserBase(
+            name=f"bench-user-{i}",
+            email=f"bench-{run}-{i}@example.com",
+            password="x" * 60,
+        )
+
+
+async def add_loop(dao, rows, session):
+    for row in rows:
+        await dao.add(row, session)
+
+
+async def run_case(name: str, rows: int, case):
+    async with database_manager.create_session() as session:
+        transaction = await session.begin()
+        started = time.perf_counter()
+        await case(session)
+        elapsed = time.perf_counter() - started
+        await transaction.rollback()
+    print(f"{name:<28} {rows:>8} rows {elapsed:8.2f}s {rows / elapsed:>12,.0f} rows/s")
+
+
+async def main(rows: int, loop_rows: int):
+    run = uuid.uuid4().hex[:8]
+    await run_case(
+        "users add loop",
+        loop_rows,
+        lambda s: add_loop(UserDAO, users(loop_rows, run), s),
+    )
+    await run_case(
+        "users add_many", rows, lambda s: UserDAO.add_many(users(rows, run), s)
+    )
+    await run_case(
+        "users upsert_many",
+        rows,
+        lambda s: UserDAO.upsert_many(users(rows, run), s, conflict_columns=("email",)),
+    )
+    await run_case(
+        "users bulk_load", rows, lambda s: UserDAO.bulk_load(users(rows, run), s)
+    )
+
+    async def ledger(session, method):
+        user_ids = await UserDAO.bulk_load(users(1, run), session)
+        wallet_id = uuid.uuid4()
+        await WalletDAO.add_many(
+            [CreateWallet(id=wallet_id, user_id=user_ids[0])], session
+        )
+        await method(
+            (
+                TransactionRow(
+                    id=uuid.uuid4(),
+                    wallet_id=wallet_id,
+                    operation_type="deposit",
+                    amount=Decimal(1),
+                    balance_before=Decimal(i),
+                    balance_after=Decimal(i + 1),
+                )
+                for i in range(rows)
+            ),
+            session,
+        )
+
+    await run_case(
+        "transactions add_many", rows, lambda s: ledger(s, TransactionDAO.add_many)
+    )
+    await run_case(
+        "transactions bulk_load", rows, lambda s: ledger(s, TransactionDAO.bulk_load)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--loop-rows", type=int, default=2_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.loop_rows))
@@ -0,0 +1,121 @@
+"""login throughput and pool pressure, connection held vs released for bcrypt
+
+usage: python -m benchmarks.login_concurrency --logins 200 --concurrency 64
+Runs the login path (UserDAO.find_credentials + bcrypt verify) twice at the
+same pool size: once holding the connection across verify like the old
+TransactionDep, once releasing it after the lookup. A probe doing SELECT 1 runs alongside
+and shows how long other requests wait for a pool slot.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from sqlalchemy import delete, text
+from app.base.database import engine
+from app.base.session_maker import database_manager
+from app.core.auth import PasswordHasher, hash_password
+from app.models.user import User, UserDAO
+from app.schemas.user_schemas import UserBase
+
+PASSWORD = "bench-password"
+
+
+async def setup() -> str:
+    email = f"bench-login-{uuid.uuid4().hex[:8]}@example.com"
+    async with database_manager.create_session() as session:
+        async with session.begin():
+            await UserDAO.add_many(
+                [
+                    UserBase(
+                        name="bench-login",
+                        email=email,
+                        password=hash_password(PASSWORD),
+                    )
+                ],
+                session,
+            )
+    return email
+
+
+async def login(email: str, hasher: PasswordHasher, release: bool):
+    async with database_manager.create_session() as session:
+        async with database_manager.create_lazy_transaction(session):
+            user = await UserDAO.find_credentials(email, session)
+            if release:
+                await database_manager.release(session)
+            assert await hasher.verify(PASSWORD, user.password)
+
+
+async def probe(stop: asyncio.Event, waits: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        async with database_manager.create_session() as session:
+            await session.execute(text("select 1"))
+        waits.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+
+
+async def run(email: str, args, release: bool) -> dict:
+    hasher = PasswordHasher(workers=args.hash_workers)
+    limit = asyncio.Semaphore(args.concurrency)
+    peak = 0
+
+    async def one():
+        nonlocal peak
+        async with limit:
+            await login(email, hasher, release)
+            peak = max(peak, engine.pool.checkedout())
+
+    async def sample(stop: asyncio.Event):
+        nonlocal peak
+        while not stop.is_set():
+            peak = max(peak, engine.pool.checkedout())
+            await asyncio.sleep(0.005)
+
+    stop, waits = asyncio.Event(), []
+    background = [
+        asyncio.create_task(probe(stop, waits)),
+        asyncio.create_task(sample(stop)),
+    ]
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*background)
+    hasher.shutdown()
+    waits.sort()
+    return {
+        "mode": "release" if release else "hold",
+        "logins_per_s": args.logins / elapsed,
+        "peak_checked_out": peak,
+        "probe_p50_ms": statistics.median(waits) * 1000 if waits else 0.0,
+        "probe_max_ms": waits[-1] * 1000 if waits else 0.0,
+    }
+
+
+async def main(args):
+    email = await setup()
+    try:
+        for release in (False, True):
+            result = await run(email, args, release)
+            print(
+                "{mode:>8}: {logins_per_s:8.1f} logins/s, peak {peak_checked_out} "
+                "connections, probe p50 {probe_p50_ms:.1f} ms max {probe_max_ms:.1f} ms".format(
+                    **result
+                )
+            )
+    finally:
+        async with database_manager.create_session() as session:
+            async with session.begin():
+                await session.execute(delete(User).where(User.email == email))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--hash-workers", type=int, default=16)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,141 @@
+"""microbenchmarks of hot auth and dao paths
+
+usage: python -m benchmarks.micro --iterations 2000 --output micro.json
+hash_password and create_access_token need no database, pass --no-db to run
+only those. Database cases create one user in a transaction that is rolled
+back at the end.
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+import uuid
+from starlette.requests import Request
+from app.base.database import engine
+from app.base.session_maker import database_manager
+from app.core.auth import create_access_token, get_current_user, hash_password
+from app.core.cache import identity_cache
+from app.core.log import setup_logging
+from app.models.user import UserDAO
+from app.schemas.user_schemas import EmailModel, UserBase
+from benchmarks.results import report, summarize
+
+
+async def measure(call, iterations: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        result = call()
+        if asyncio.iscoroutine(result):
+            await result
+        latencies.append(time.perf_counter() - begin)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def allocated(call, iterations: int) -> float:
+    """mean peak KiB allocated per call"""
+    tracemalloc.start()
+    total = 0
+    try:
+        for _ in range(iterations):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            await call()
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return total / iterations / 1024
+
+
+def cookie_request(token: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [(b"cookie", f"access_token={token}".encode())],
+        }
+    )
+
+
+async def db_cases(iterations: int, results: dict):
+    async with database_manager.create_session() as session:
+        transaction = await session.begin()
+        try:
+            email = f"bench-micro-{uuid.uuid4().hex[:8]}@example.com"
+            (user_id,) = await UserDAO.add_many(
+                [UserBase(name="bench-micro", email=email, password="x" * 60)],
+                session,
+            )
+            ids = [user_id] * 50
+            request = cookie_request(create_access_token({"sub": str(user_id)}))
+
+            async def current_user_cold():
+                identity_cache.clear()
+                await get_current_user(request, session)
+
+            results["get_current_user_cold"] = await measure(
+                current_user_cold, iterations
+            )
+            results["get_current_user_cached"] = await measure(
+                lambda: get_current_user(request, session), iterations
+            )
+            results["dao_find_one_or_none_by_id"] = await measure(
+                lambda: UserDAO.find_one_or_none_by_id(user_id, session), iterations
+            )
+            results["dao_find_first_by_filter"] = await measure(
+                lambda: UserDAO.find_first_by_filter(EmailModel(email=email), session),
+                iterations,
+            )
+            results["dao_find_many_by_ids_50"] = await measure(
+                lambda: UserDAO.find_many_by_ids(ids, session), iterations
+            )
+            # login lookup, ORM entity vs credential row
+            for name, lookup in (
+                (
+                    "login_lookup_entity",
+                    lambda: UserDAO.find_user_by_filter(
+                        EmailModel(email=email), session
+                    ),
+                ),
+                (
+                    "login_lookup_credentials",
+                    lambda: UserDAO.find_credentials(email, session),
+                ),
+            ):
+                results[name] = await measure(lookup, iterations)
+                results[name]["alloc_kib"] = await allocated(lookup, 200)
+            results["dao_find_all_by_filter"] = await measure(
+                lambda: UserDAO.find_all_by_filter(EmailModel(email=email), session),
+                iterations,
+            )
+        finally:
+            await transaction.rollback()
+            identity_cache.clear()
+
+
+async def main(args):
+    setup_logging()
+    results = {
+        "hash_password": await measure(
+            lambda: hash_password("bench-password"), args.hash_iterations
+        ),
+        "create_access_token": await measure(
+            lambda: create_access_token({"sub": "1"}), args.iterations
+        ),
+    }
+    if not args.no_db:
+        await db_cases(args.iterations, results)
+        await engine.dispose()
+    report("micro", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--hash-iterations", type=int, default=20)
+    parser.add_argument("--no-db", action="store_true")
+    parser.add_argument("--output", help="write json results to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+"""latency summaries and json results that can be compared across commits
+
+usage: python -m benchmarks.results old.json new.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int = 0) -> dict:
+    """req/s and tail latency in ms"""
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "rps": len(ordered) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(suite: str, params: dict, results: dict, output: str | None):
+    """print table and optionally write json"""
+    for name, result in results.items():
+        print(
+            f"{name:<28} {result['rps']:>10,.1f}/s  p50 {result['p50_ms']:8.2f} ms"
+            f"  p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms"
+            + (f"  {result['errors']} errors" if result.get("errors") else "")
+        )
+    if output:
+        with open(output, "w") as file:
+            json.dump(
+                {
+                    "suite": suite,
+                    "revision": git_revision(),
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "python": platform.python_version(),
+                    "params": params,
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+
+
+def compare(old: dict, new: dict, threshold: float) -> bool:
+    """print relative change per case, False when something regressed"""
+    ok = True
+    print(f"{old.get('revision')} -> {new.get('revision')}")
+    for name, after in new["results"].items():
+        before = old["results"].get(name)
+        if before is None:
+            print(f"{name:<28} new")
+            continue
+        rps = (after["rps"] - before["rps"]) / before["rps"] if before["rps"] else 0.0
+        p99 = (
+            (after["p99_ms"] - before["p99_ms"]) / before["p99_ms"]
+            if before["p99_ms"]
+            else 0.0
+        )
+        regressed = rps < -threshold or p99 > threshold
+        ok = ok and not regressed
+        print(
+            f"{name:<28} rps {rps:+7.1%}  p99 {p99:+7.1%}"
+            + ("  REGRESSION" if regressed else "")
+        )
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+    with open(args.old) as old, open(args.new) as new:
+        sys.exit(0 if compare(json.load(old), json.load(new), args.threshold) else 1)
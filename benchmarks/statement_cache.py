@@ -0,0 +1,77 @@
+"""per-call overhead of BaseDAO lookups, construct per call vs cached construct
+
+usage: python -m benchmarks.statement_cache --iterations 20000
+       python -m benchmarks.statement_cache --url postgresql+asyncpg://...
+Default is an in-memory sqlite stand-in, which shows the python side only.
+Against Postgres the asyncpg prepared statement cache from make_engine is
+in play as well, rerun with DB_PREPARED_STATEMENT_CACHE_SIZE=0 to compare.
+"""
+
+import argparse
+import asyncio
+import uuid
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.base.database import make_engine
+from app.core.log import setup_logging
+from app.models.user import User, UserDAO
+import app.models.payments  # noqa: F401, mappers need Wallet
+from app.schemas.user_schemas import EmailModel, UserBase
+from benchmarks.micro import measure
+from benchmarks.results import report
+
+
+async def main(args):
+    setup_logging()
+    engine = make_engine(args.url)
+    if engine.dialect.name == "sqlite":
+        async with engine.begin() as connection:
+            await connection.run_sync(User.__table__.create)
+    async with async_sessionmaker(engine, class_=AsyncSession)() as session:
+        transaction = await session.begin()
+        try:
+            email = f"bench-stmt-{uuid.uuid4().hex[:8]}@example.com"
+            (user_id,) = await UserDAO.add_many(
+                [UserBase(name="bench-stmt", email=email, password="x" * 60)],
+                session,
+            )
+            by_email = EmailModel(email=email)
+
+            async def by_id_inline():
+                result = await session.execute(select(User).filter_by(id=user_id))
+                return result.scalar_one_or_none()
+
+            async def first_inline():
+                query = select(User).filter_by(**by_email.model_dump()).limit(1)
+                return (await session.execute(query)).scalars().first()
+
+            results = {
+                "by_id_construct_per_call": await measure(
+                    by_id_inline, args.iterations
+                ),
+                "by_id_cached_construct": await measure(
+                    lambda: UserDAO._load_by_id(user_id, session), args.iterations
+                ),
+                "first_by_filter_construct_per_call": await measure(
+                    first_inline, args.iterations
+                ),
+                "first_by_filter_cached_construct": await measure(
+                    lambda: UserDAO.find_first_by_filter(by_email, session),
+                    args.iterations,
+                ),
+                "credentials_row": await measure(
+                    lambda: UserDAO.find_credentials(email, session), args.iterations
+                ),
+            }
+        finally:
+            await transaction.rollback()
+            await engine.dispose()
+    report("statement_cache", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="sqlite+aiosqlite://")
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--output", help="write json results to this file")
+    asyncio.run(main(parser.parse_args()))
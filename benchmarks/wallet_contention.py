@@ -0,0 +1,118 @@
+"""deposit/withdraw throughput against one hot wallet
+
+usage: python -m benchmarks.wallet_contention --workers 32 --ops 20000
+Checks that the ledger is consistent with the final balance and removes
+the benchmark user, wallet and ledger rows at the end.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from decimal import Decimal
+from sqlalchemy import delete, select
+from app.base.session_maker import database_manager
+from app.models.user import User, UserDAO
+from app.models.payments import Transaction, Wallet, WalletDAO, InsufficientFunds
+from app.schemas.payment_schemas import CreateWallet
+from app.schemas.user_schemas import UserBase
+
+
+async def setup() -> tuple[int, uuid.UUID]:
+    async with database_manager.create_session() as session:
+        async with session.begin():
+            run = uuid.uuid4().hex[:8]
+            (user_id,) = await UserDAO.add_many(
+                [
+                    UserBase(
+                        name="bench-wallet",
+                        email=f"bench-{run}@example.com",
+                        password="x" * 60,
+                    )
+                ],
+                session,
+            )
+            wallet_id = uuid.uuid4()
+            await WalletDAO.add_many(
+                [CreateWallet(id=wallet_id, user_id=user_id)], session
+            )
+    return user_id, wallet_id
+
+
+async def worker(wallet_id: uuid.UUID, ops: int, rejected: list):
+    for i in range(ops):
+        async with database_manager.create_session() as session:
+            async with session.begin():
+                try:
+                    if i % 3 == 2:
+                        await WalletDAO.withdraw(wallet_id, Decimal(1), session)
+                    else:
+                        await WalletDAO.deposit(wallet_id, Decimal(2), session)
+                except InsufficientFunds:
+                    rejected.append(i)
+
+
+async def check(wallet_id: uuid.UUID) -> bool:
+    async with database_manager.create_session() as session:
+        balance = (
+            await session.execute(select(Wallet.balance).where(Wallet.id == wallet_id))
+        ).scalar_one()
+        rows = (
+            await session.execute(
+                select(
+                    Transaction.operation_type,
+                    Transaction.amount,
+                    Transaction.balance_before,
+                    Transaction.balance_after,
+                )
+                .where(Transaction.wallet_id == wallet_id)
+                .order_by(Transaction.seq)
+            )
+        ).all()
+    signed = [a if op == "deposit" else -a for op, a, _, _ in rows]
+    rows_ok = all(
+        after - before == delta for (_, _, before, after), delta in zip(rows, signed)
+    )
+    # in seq order every balance_after is the balance_before of the next row
+    chain = [Decimal(0)] + [after for _, _, _, after in rows]
+    chain_ok = chain[-1] == balance and all(
+        before == previous for (_, _, before, _), previous in zip(rows, chain)
+    )
+    return rows_ok and chain_ok and sum(signed, Decimal(0)) == balance
+
+
+async def cleanup(user_id: int, wallet_id: uuid.UUID):
+    async with database_manager.create_session() as session:
+        async with session.begin():
+            await session.execute(
+                delete(Transaction).where(Transaction.wallet_id == wallet_id)
+            )
+            await session.execute(delete(Wallet).where(Wallet.id == wallet_id))
+            await session.execute(delete(User).where(User.id == user_id))
+
+
+async def main(workers: int, ops: int):
+    user_id, wallet_id = await setup()
+    rejected: list = []
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(worker(wallet_id, ops // workers, rejected) for _ in range(workers))
+        )
+        elapsed = time.perf_counter() - started
+        done = ops // workers * workers
+        print(
+            f"{done} ops with {workers} workers in {elapsed:.2f}s: "
+            f"{done / elapsed:,.0f} ops/s, {len(rejected)} rejected withdrawals"
+        )
+        print("ledger consistent:", await check(wallet_id))
+    finally:
+        await cleanup(user_id, wallet_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=20_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.workers, args.ops))
@@ -8,6 +8,14 @@ from alembic import context
 from app.base.database import engine, db_settings, Base
 from app.models.user import User
 from app.models.payments import Wallet, Transaction
+from app.models.tokens import RevokedToken
+from app.models.rollups import WalletDailyBalance, RollupWatermark
+from app.models.idempotency import IdempotencyKey
+from app.models.reconciliation import (
+    ReconciliationRun,
+    ReconciliationCheckpoint,
+    ReconciliationIssue,
+)
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,26 @@
+"""add user version
+
+Revision ID: 5c1e7a9d3b42
+Revises: 0ebac4ef28b2
+Create Date: 2026-10-18 15:02:11.408213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e7a9d3b42'
+down_revision: Union[str, None] = '0ebac4ef28b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'version')
@@ -0,0 +1,37 @@
+"""add revoked tokens
+
+Revision ID: 8d2f4b6e1a07
+Revises: 5c1e7a9d3b42
+Create Date: 2026-10-18 15:31:47.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f4b6e1a07'
+down_revision: Union[str, None] = '5c1e7a9d3b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('revokedtokens',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_revokedtokens_expires_at'), 'revokedtokens', ['expires_at'], unique=False)
+    op.create_index('ix_revokedtokens_created_at', 'revokedtokens', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_revokedtokens_created_at', table_name='revokedtokens')
+    op.drop_index(op.f('ix_revokedtokens_expires_at'), table_name='revokedtokens')
+    op.drop_table('revokedtokens')
@@ -0,0 +1,39 @@
+"""add ledger seq to transactions
+
+Revision ID: a5c8e1f04d73
+Revises: f3b7d2a91c58
+Create Date: 2026-10-19 10:21:37.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5c8e1f04d73'
+down_revision: Union[str, None] = 'f3b7d2a91c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE SEQUENCE transactions_seq_seq')
+    op.add_column('transactions', sa.Column('seq', sa.BigInteger(), nullable=True))
+    # existing rows keep the (created_at, id) order they were read in so far
+    op.execute(
+        'UPDATE transactions t SET seq = o.seq FROM ('
+        'SELECT id, created_at, row_number() OVER (ORDER BY created_at, id) AS seq '
+        'FROM transactions) o WHERE t.id = o.id AND t.created_at = o.created_at'
+    )
+    op.execute("SELECT setval('transactions_seq_seq', coalesce((SELECT max(seq) FROM transactions), 0) + 1, false)")
+    op.alter_column('transactions', 'seq', nullable=False, server_default=sa.text("nextval('transactions_seq_seq')"))
+    op.execute('ALTER SEQUENCE transactions_seq_seq OWNED BY transactions.seq')
+    op.alter_column('transactions', 'created_at', server_default=sa.text('clock_timestamp()'))
+
+
+def downgrade() -> None:
+    op.alter_column('transactions', 'created_at', server_default=sa.text('now()'))
+    op.drop_column('transactions', 'seq')
+    op.execute('DROP SEQUENCE IF EXISTS transactions_seq_seq')
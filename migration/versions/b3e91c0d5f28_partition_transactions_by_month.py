@@ -0,0 +1,84 @@
+"""partition transactions by month
+
+Revision ID: b3e91c0d5f28
+Revises: 8d2f4b6e1a07
+Create Date: 2026-10-18 16:12:05.117640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e91c0d5f28'
+down_revision: Union[str, None] = '8d2f4b6e1a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# months created ahead of now, later ones come from app.commands.partitions
+MONTHS_AHEAD = 3
+
+
+def upgrade() -> None:
+    op.rename_table('transactions', 'transactions_legacy')
+    op.execute('ALTER TABLE transactions_legacy RENAME CONSTRAINT transactions_pkey TO transactions_legacy_pkey')
+    op.create_table('transactions',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('wallet_id', sa.UUID(), nullable=False),
+    sa.Column('operation_type', sa.String(), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('balance_before', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('balance_after', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['wallet_id'], ['wallets.id'], ),
+    sa.PrimaryKeyConstraint('id', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    op.execute('CREATE TABLE transactions_default PARTITION OF transactions DEFAULT')
+    op.execute(f"""
+    DO $$
+    DECLARE
+        month date := date_trunc('month', coalesce(
+            (SELECT min(created_at) FROM transactions_legacy), now()))::date;
+        last date := (date_trunc('month', now()) + interval '{MONTHS_AHEAD} month')::date;
+    BEGIN
+        WHILE month <= last LOOP
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                'transactions_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM'),
+                month, (month + interval '1 month')::date);
+            month := (month + interval '1 month')::date;
+        END LOOP;
+    END $$;
+    """)
+    op.execute(
+        'INSERT INTO transactions (id, created_at, wallet_id, operation_type, amount, balance_before, balance_after, updated_at) '
+        'SELECT id, created_at, wallet_id, operation_type, amount, balance_before, balance_after, updated_at FROM transactions_legacy'
+    )
+    op.drop_table('transactions_legacy')
+    op.create_index('ix_transactions_wallet_id_created_at', 'transactions', ['wallet_id', sa.text('created_at DESC')], unique=False)
+
+
+def downgrade() -> None:
+    op.rename_table('transactions', 'transactions_partitioned')
+    op.create_table('transactions',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('wallet_id', sa.UUID(), nullable=False),
+    sa.Column('operation_type', sa.String(), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('balance_before', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('balance_after', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['wallet_id'], ['wallets.id'], ),
+    sa.PrimaryKeyConstraint('id', name='transactions_pkey_plain')
+    )
+    op.execute(
+        'INSERT INTO transactions (id, wallet_id, operation_type, amount, balance_before, balance_after, created_at, updated_at) '
+        'SELECT id, wallet_id, operation_type, amount, balance_before, balance_after, created_at, updated_at FROM transactions_partitioned'
+    )
+    op.execute('DROP TABLE transactions_partitioned CASCADE')
+    op.execute('ALTER TABLE transactions RENAME CONSTRAINT transactions_pkey_plain TO transactions_pkey')
@@ -0,0 +1,28 @@
+"""index transactions by wallet and seq
+
+Revision ID: b8d4f2a6c913
+Revises: a5c8e1f04d73
+Create Date: 2026-10-19 10:48:02.331905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d4f2a6c913'
+down_revision: Union[str, None] = 'a5c8e1f04d73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_transactions_wallet_id_seq', 'transactions', ['wallet_id', sa.text('seq DESC')], unique=False)
+    op.drop_index('ix_transactions_wallet_id_created_at', table_name='transactions')
+
+
+def downgrade() -> None:
+    op.create_index('ix_transactions_wallet_id_created_at', 'transactions', ['wallet_id', sa.text('created_at DESC')], unique=False)
+    op.drop_index('ix_transactions_wallet_id_seq', table_name='transactions')
@@ -0,0 +1,57 @@
+"""rollup watermark by writer txid
+
+Revision ID: c2e7a9f15b40
+Revises: b8d4f2a6c913
+Create Date: 2026-10-19 11:32:54.870213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e7a9f15b40'
+down_revision: Union[str, None] = 'b8d4f2a6c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # real txids start at 3: existing rows up to the old watermark get 0 and
+    # count as rolled up, newer ones get 1 and are folded by the next refresh
+    op.add_column('transactions', sa.Column('txid', sa.BigInteger(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE transactions SET txid = 1 WHERE created_at > coalesce("
+        "(SELECT last_created_at FROM rollupwatermarks WHERE name = 'wallet_daily_balances'), "
+        "'-infinity')"
+    )
+    op.alter_column('transactions', 'txid', server_default=sa.text('pg_current_xact_id()::text::bigint'))
+    op.create_index('ix_transactions_txid', 'transactions', ['txid'], unique=False)
+
+    op.add_column('rollupwatermarks', sa.Column('last_txid', sa.BigInteger(), nullable=True))
+    op.execute("UPDATE rollupwatermarks SET last_txid = 1 WHERE last_created_at IS NOT NULL")
+    op.drop_column('rollupwatermarks', 'last_created_at')
+
+    op.add_column('walletdailybalances', sa.Column('first_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('walletdailybalances', sa.Column('last_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.execute(
+        'UPDATE walletdailybalances b SET first_seq = s.first_seq, last_seq = s.last_seq FROM ('
+        'SELECT wallet_id, created_at::date AS day, min(seq) AS first_seq, max(seq) AS last_seq '
+        'FROM transactions WHERE txid = 0 GROUP BY 1, 2) s '
+        'WHERE b.wallet_id = s.wallet_id AND b.day = s.day'
+    )
+    op.alter_column('walletdailybalances', 'first_seq', server_default=None)
+    op.alter_column('walletdailybalances', 'last_seq', server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column('walletdailybalances', 'last_seq')
+    op.drop_column('walletdailybalances', 'first_seq')
+    op.add_column('rollupwatermarks', sa.Column('last_created_at', sa.TIMESTAMP(), nullable=True))
+    # lag-based refresh resumes from now, rebuild with rollups backfill if needed
+    op.execute("UPDATE rollupwatermarks SET last_created_at = localtimestamp WHERE last_txid IS NOT NULL")
+    op.drop_column('rollupwatermarks', 'last_txid')
+    op.drop_index('ix_transactions_txid', table_name='transactions')
+    op.drop_column('transactions', 'txid')
@@ -0,0 +1,51 @@
+"""add wallet daily balances
+
+Revision ID: c47a0e93d1b6
+Revises: b3e91c0d5f28
+Create Date: 2026-10-18 16:48:39.551802
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47a0e93d1b6'
+down_revision: Union[str, None] = 'b3e91c0d5f28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('walletdailybalances',
+    sa.Column('wallet_id', sa.UUID(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('opening_balance', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('closing_balance', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('credits', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('debits', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('operations', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('wallet_id', 'day')
+    )
+    op.create_table('rollupwatermarks',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('last_created_at', sa.TIMESTAMP(), nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index('ix_transactions_created_at_brin', 'transactions', ['created_at'], unique=False, postgresql_using='brin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_created_at_brin', table_name='transactions', postgresql_using='brin')
+    op.drop_table('rollupwatermarks')
+    op.drop_table('walletdailybalances')
@@ -0,0 +1,26 @@
+"""add owner to idempotency keys
+
+Revision ID: d4a1c7e83f26
+Revises: c2e7a9f15b40
+Create Date: 2026-10-19 12:40:11.092384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a1c7e83f26'
+down_revision: Union[str, None] = 'c2e7a9f15b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('idempotencykeys', sa.Column('owner', sa.UUID(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('idempotencykeys', 'owner')
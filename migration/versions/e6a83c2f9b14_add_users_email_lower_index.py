@@ -0,0 +1,27 @@
+"""add users lower(email) unique index
+
+Revision ID: e6a83c2f9b14
+Revises: d91b2f7c6e35
+Create Date: 2026-10-18 18:05:12.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a83c2f9b14'
+down_revision: Union[str, None] = 'd91b2f7c6e35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # fails if emails differing only by case already exist, merge them first
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_email_lower', table_name='users')
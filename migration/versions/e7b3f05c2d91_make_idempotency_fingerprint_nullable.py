@@ -0,0 +1,27 @@
+"""make idempotency key fingerprint nullable
+
+Revision ID: e7b3f05c2d91
+Revises: d4a1c7e83f26
+Create Date: 2026-10-19 15:02:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b3f05c2d91'
+down_revision: Union[str, None] = 'd4a1c7e83f26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('idempotencykeys', 'fingerprint', existing_type=sa.String(length=64), nullable=True)
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM idempotencykeys WHERE fingerprint IS NULL")
+    op.alter_column('idempotencykeys', 'fingerprint', existing_type=sa.String(length=64), nullable=False)
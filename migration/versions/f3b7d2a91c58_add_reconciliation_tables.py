@@ -0,0 +1,65 @@
+"""add reconciliation tables
+
+Revision ID: f3b7d2a91c58
+Revises: e6a83c2f9b14
+Create Date: 2026-10-18 19:12:47.205116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b7d2a91c58'
+down_revision: Union[str, None] = 'e6a83c2f9b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('reconciliationruns',
+    sa.Column('shards', sa.Integer(), nullable=False),
+    sa.Column('finished_at', sa.TIMESTAMP(), nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('reconciliationcheckpoints',
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('last_wallet_id', sa.UUID(), nullable=True),
+    sa.Column('wallets', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('transactions', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('issues', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('done', sa.Boolean(), server_default='false', nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['run_id'], ['reconciliationruns.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('run_id', 'shard')
+    )
+    op.create_table('reconciliationissues',
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('wallet_id', sa.UUID(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('transaction_id', sa.UUID(), nullable=True),
+    sa.Column('expected', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('actual', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['run_id'], ['reconciliationruns.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_reconciliationissues_run_id'), 'reconciliationissues', ['run_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_reconciliationissues_run_id'), table_name='reconciliationissues')
+    op.drop_table('reconciliationissues')
+    op.drop_table('reconciliationcheckpoints')
+    op.drop_table('reconciliationruns')
@@ -0,0 +1,13 @@
+import os
+
+# settings are read at import time, tests never connect to these
+for name, value in {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "test",
+    "DB_USER": "test",
+    "DB_PASSWORD": "test",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+}.items():
+    os.environ.setdefault(name, value)
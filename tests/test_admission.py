@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+from app.core.admission import RedisTokenBucket, TokenBucket
+from app.core.shared_cache import InMemoryRedis, SharedCache
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst_then_asks_to_wait():
+    bucket = TokenBucket(rate=1, burst=3)
+    assert [await bucket.take("ip:1") for _ in range(3)] == [0, 0, 0]
+    wait = await bucket.take("ip:1")
+    assert 0.9 < wait <= 1
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_keys_are_independent():
+    bucket = TokenBucket(rate=1, burst=1)
+    assert await bucket.take("ip:1") == 0
+    assert await bucket.take("ip:1") > 0
+    assert await bucket.take("ip:2") == 0
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=50, burst=1)
+    assert await bucket.take("email:a") == 0
+    assert await bucket.take("email:a") > 0
+    await asyncio.sleep(0.05)
+    assert await bucket.take("email:a") == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_bucket_without_eval_stays_local_and_keeps_cache_up():
+    cache = SharedCache(InMemoryRedis())
+    bucket = RedisTokenBucket(rate=1, burst=1, cache=cache)
+    assert await bucket.take("ip:1") == 0
+    assert await bucket.take("ip:1") > 0
+    assert cache.enabled
+    assert cache.errors == 0
@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.core import auth
+from app.core.auth import PasswordHasher, claims_are_fresh
+from app.core.cache import user_versions
+from app.core.shared_cache import InMemoryRedis, shared_cache
+from app.models.user import UserDAO
+from app.schemas.user_schemas import UserRegister
+
+
+@pytest.fixture
+def slow_hash(monkeypatch):
+    """hash_password that sleeps and records peak concurrency"""
+    state = {"running": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def hash_password(password):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.05)
+        with lock:
+            state["running"] -= 1
+        return "hashed:" + password
+
+    monkeypatch.setattr(auth, "hash_password", hash_password)
+    return state
+
+
+@pytest.mark.asyncio
+async def test_hasher_runs_at_most_workers_at_once(slow_hash):
+    hasher = PasswordHasher(workers=2)
+    try:
+        results = await asyncio.gather(*(hasher.hash(f"pw{i}") for i in range(6)))
+    finally:
+        hasher.shutdown()
+    assert results == [f"hashed:pw{i}" for i in range(6)]
+    assert slow_hash["peak"] == 2
+
+
+@pytest.mark.asyncio
+async def test_hasher_reports_queue_depth_and_wait(slow_hash):
+    hasher = PasswordHasher(workers=1)
+    try:
+        tasks = [asyncio.create_task(hasher.hash("pw")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        busy = hasher.stats()
+        await asyncio.gather(*tasks)
+    finally:
+        hasher.shutdown()
+    assert busy["running"] == 1
+    assert busy["queue_depth"] == 2
+    stats = hasher.stats()
+    assert stats["completed"] == 3
+    assert stats["queue_depth"] == 0 and stats["running"] == 0
+    # last one waited for the two before it
+    assert stats["wait_max_ms"] >= 90
+    assert stats["service_time_ms"] >= 40
+
+
+@pytest.mark.asyncio
+async def test_hasher_does_not_block_event_loop(slow_hash):
+    hasher = PasswordHasher(workers=1)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    try:
+        await hasher.hash("pw")
+    finally:
+        task.cancel()
+        hasher.shutdown()
+    assert ticks >= 3
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_round_trip_with_bcrypt():
+    hasher = PasswordHasher(workers=2)
+    try:
+        hashed = await hasher.hash("correct horse")
+        assert hashed.startswith("$2b$")
+        assert await hasher.verify("correct horse", hashed) is True
+        assert await hasher.verify("wrong horse", hashed) is False
+    finally:
+        hasher.shutdown()
+
+
+def test_registration_schema_does_not_hash():
+    user = UserRegister(
+        name="alice",
+        email="alice@example.com",
+        password="secret1",
+        confirm_password="secret1",
+    )
+    assert user.password == "secret1"
+
+
+@pytest.fixture
+def db_versions(monkeypatch):
+    """UserDAO.find_version backed by a dict, records lookups"""
+    versions = {}
+    lookups = []
+
+    async def find_version(user_id, session):
+        lookups.append(user_id)
+        return versions.get(user_id)
+
+    monkeypatch.setattr(UserDAO, "find_version", find_version)
+    monkeypatch.setattr(shared_cache, "client", None)
+    user_versions.pop(42)
+    yield versions, lookups
+    user_versions.pop(42)
+
+
+@pytest.mark.asyncio
+async def test_unknown_version_is_read_from_db(db_versions):
+    versions, lookups = db_versions
+    versions[42] = 3
+    # nothing known locally (evicted) and no redis: old claims are stale
+    assert await claims_are_fresh(42, 2, None) is False
+    assert lookups == [42]
+    assert await claims_are_fresh(42, 3, None) is True
+
+
+@pytest.mark.asyncio
+async def test_local_version_is_not_trusted_as_fresh(db_versions):
+    versions, lookups = db_versions
+    # another worker bumped the user, this one only saw version 2
+    user_versions.set(42, 2)
+    versions[42] = 3
+    assert await claims_are_fresh(42, 2, None) is False
+    assert lookups == [42]
+    # stale claims are rejected locally without a lookup
+    assert await claims_are_fresh(42, 1, None) is False
+    assert lookups == [42]
+
+
+@pytest.mark.asyncio
+async def test_missing_user_claims_are_not_fresh(db_versions):
+    assert await claims_are_fresh(42, 1, None) is False
+
+
+@pytest.mark.asyncio
+async def test_published_version_skips_db(db_versions, monkeypatch):
+    versions, lookups = db_versions
+    monkeypatch.setattr(shared_cache, "client", InMemoryRedis())
+    monkeypatch.setattr(shared_cache, "_down_until", 0.0)
+    await shared_cache.set_versions(auth.User, {42: 5}, ttl=60)
+    assert await claims_are_fresh(42, 5, None) is True
+    assert await claims_are_fresh(42, 4, None) is False
+    assert lookups == []
@@ -0,0 +1,40 @@
+import uuid
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from sqlalchemy.dialects import postgresql
+from app.models.payments import TransactionDAO
+from app.models.user import User  # noqa: F401, mappers need User
+
+
+class CapturingSession:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, query, params=None):
+        self.statements.append(query)
+        return self
+
+    def all(self):
+        return []
+
+
+@pytest.mark.asyncio
+async def test_upsert_conflicts_on_whole_primary_key():
+    session = CapturingSession()
+    row = {
+        "id": uuid.uuid4(),
+        "created_at": datetime(2024, 5, 1),
+        "wallet_id": uuid.uuid4(),
+        "operation_type": "deposit",
+        "amount": Decimal("1.00"),
+        "balance_before": Decimal("0.00"),
+        "balance_after": Decimal("1.00"),
+    }
+    await TransactionDAO.upsert_many([row], session)
+
+    (query,) = session.statements
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (id, created_at) DO UPDATE" in sql
+    assert "created_at = excluded.created_at" not in sql
+    assert "amount = excluded.amount" in sql
@@ -0,0 +1,110 @@
+import itertools
+import pytest
+from app.core import cache
+from app.core.cache import IdentityCache, TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def test_get_returns_default_for_missing_key():
+    ttl_cache = TTLCache(maxsize=2, ttl=10)
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.get("a", "default") == "default"
+    assert ttl_cache.stats()["misses"] == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    ttl_cache = TTLCache(maxsize=2, ttl=10)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    assert ttl_cache.get("a") == 1  # b is now the oldest
+    ttl_cache.set("c", 3)
+    assert ttl_cache.get("b") is None
+    assert (ttl_cache.get("a"), ttl_cache.get("c")) == (1, 3)
+    assert ttl_cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=10)
+    ttl_cache.set("a", 1)
+    clock.now += 9.9
+    assert ttl_cache.get("a") == 1
+    clock.now += 0.1
+    assert ttl_cache.get("a") is None
+    assert len(ttl_cache) == 0
+    assert ttl_cache.stats()["expirations"] == 1
+
+
+def test_entry_ttl_is_capped_by_cache_ttl(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=10)
+    ttl_cache.set("short", 1, ttl=2)
+    ttl_cache.set("long", 2, ttl=60)
+    clock.now += 5
+    assert ttl_cache.get("short") is None
+    clock.now += 5
+    assert ttl_cache.get("long") is None
+
+
+def test_nothing_is_stored_without_room_or_time():
+    disabled = TTLCache(maxsize=0, ttl=10)
+    disabled.set("a", 1)
+    assert len(disabled) == 0
+    ttl_cache = TTLCache(maxsize=10, ttl=10)
+    ttl_cache.set("expired", 1, ttl=0)
+    assert len(ttl_cache) == 0
+
+
+def test_set_replaces_value_and_refreshes_ttl(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=10)
+    ttl_cache.set("a", 1)
+    clock.now += 8
+    ttl_cache.set("a", 2)
+    clock.now += 8
+    assert ttl_cache.get("a") == 2
+    assert len(ttl_cache) == 1
+
+
+def test_pop_and_clear():
+    ttl_cache = TTLCache(maxsize=10, ttl=10)
+    for key, value in zip("abc", itertools.count()):
+        ttl_cache.set(key, value)
+    ttl_cache.pop("a")
+    ttl_cache.pop("missing")
+    assert ttl_cache.get("a") is None
+    ttl_cache.clear()
+    assert len(ttl_cache) == 0
+
+
+def identity(sub):
+    return ({"sub": sub}, f"user {sub}")
+
+
+def test_identity_cache_invalidates_all_tokens_of_user():
+    identities = IdentityCache(maxsize=10, ttl=10)
+    identities.set("token1", identity(1))
+    identities.set("token2", identity(1))
+    identities.set("token3", identity(2))
+    identities.invalidate_user(1)
+    assert identities.get("token1") is None
+    assert identities.get("token2") is None
+    assert identities.get("token3") == identity(2)
+
+
+def test_identity_cache_forgets_evicted_tokens():
+    identities = IdentityCache(maxsize=1, ttl=10)
+    identities.set("token1", identity(1))
+    identities.set("token2", identity(2))
+    assert identities._by_user == {"2": {"token2"}}
@@ -0,0 +1,48 @@
+import gzip
+from datetime import date, datetime
+import pytest
+from app.core.export import EXPORT_COLUMNS, csv_chunks, period_bounds
+
+HEADER = ",".join(EXPORT_COLUMNS) + "\r\n"
+ROW = ("id1", "2024-01-01 00:00:00", "deposit", "10.00", "0.00", "10.00")
+
+
+async def partitions(*parts):
+    for part in parts:
+        yield part
+
+
+async def collect(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+@pytest.mark.asyncio
+async def test_csv_chunks_write_header_and_rows():
+    body = await collect(csv_chunks(partitions([ROW, ROW], [ROW])))
+    assert body.decode() == HEADER + (",".join(ROW) + "\r\n") * 3
+
+
+@pytest.mark.asyncio
+async def test_csv_chunks_yield_one_chunk_per_partition():
+    chunks = [chunk async for chunk in csv_chunks(partitions([ROW], [ROW], [ROW]))]
+    # header goes out once the first partition is fetched, last rows at the end
+    assert len(chunks) == 4
+
+
+@pytest.mark.asyncio
+async def test_csv_chunks_without_rows_is_header_only():
+    assert (await collect(csv_chunks(partitions()))).decode() == HEADER
+
+
+@pytest.mark.asyncio
+async def test_csv_chunks_gzip_is_one_valid_stream():
+    body = await collect(csv_chunks(partitions([ROW], [ROW]), gzip=True))
+    assert gzip.decompress(body).decode() == HEADER + (",".join(ROW) + "\r\n") * 2
+
+
+def test_period_bounds_cover_whole_days():
+    assert period_bounds(date(2024, 1, 1), date(2024, 1, 31)) == (
+        datetime(2024, 1, 1),
+        datetime(2024, 2, 1),
+    )
+    assert period_bounds(None, None) == (None, None)
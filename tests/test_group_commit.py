@@ -0,0 +1,103 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from decimal import Decimal
+import pytest
+from sqlalchemy.exc import OperationalError
+from app.core import group_commit
+from app.core.group_commit import CommitFailed, LedgerWriter, PendingOperation
+from app.models.payments import InsufficientFunds, WalletDAO
+
+
+class FakeSession:
+    def __init__(self, db):
+        self.db = db
+
+    async def commit(self):
+        self.db.commits += 1
+        if self.db.fail_commit:
+            raise OperationalError("COMMIT", {}, ConnectionResetError())
+
+
+class FakeDatabase:
+    """records apply order per session, fails configured wallets or commits"""
+
+    def __init__(self):
+        self.sessions = []
+        self.commits = 0
+        self.fail_commit = False
+        self.broken = set()
+
+    @asynccontextmanager
+    async def create_session(self):
+        self.sessions.append([])
+        yield FakeSession(self)
+
+    async def apply_operation(
+        self, wallet_id, operation_type, amount, session, user_id=None
+    ):
+        self.sessions[-1].append(wallet_id)
+        if wallet_id in self.broken:
+            raise OperationalError("UPDATE", {}, ValueError())
+        if operation_type == "withdraw":
+            raise InsufficientFunds(wallet_id)
+        return (wallet_id, amount)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDatabase()
+    monkeypatch.setattr(group_commit, "database_manager", db)
+    monkeypatch.setattr(WalletDAO, "apply_operation", db.apply_operation)
+    return db
+
+
+def operations(*specs):
+    loop = asyncio.get_running_loop()
+    return [
+        PendingOperation(wallet_id, kind, Decimal(amount), 1, loop.create_future())
+        for wallet_id, kind, amount in specs
+    ]
+
+
+def writer() -> LedgerWriter:
+    return LedgerWriter(batch_size=10, max_latency=0.01, queue_size=10)
+
+
+@pytest.mark.asyncio
+async def test_batch_locks_wallets_in_id_order(db):
+    a, b, c = sorted(uuid.uuid4() for _ in range(3))
+    batch = operations(
+        (c, "deposit", 1), (a, "deposit", 2), (c, "withdraw", 3), (b, "deposit", 4)
+    )
+    await writer()._flush(batch)
+
+    assert db.sessions == [[a, b, c, c]]
+    assert batch[0].future.result() == (c, Decimal(1))
+    assert batch[1].future.result() == (a, Decimal(2))
+    assert isinstance(batch[2].future.exception(), InsufficientFunds)
+    assert batch[3].future.result() == (b, Decimal(4))
+
+
+@pytest.mark.asyncio
+async def test_statement_error_retries_one_by_one(db):
+    good, bad = uuid.uuid4(), uuid.uuid4()
+    db.broken.add(bad)
+    batch = operations((good, "deposit", 1), (bad, "deposit", 2))
+    await writer()._flush(batch)
+
+    assert len(db.sessions) == 3
+    assert batch[0].future.result() == (good, Decimal(1))
+    assert isinstance(batch[1].future.exception(), OperationalError)
+
+
+@pytest.mark.asyncio
+async def test_commit_error_fails_batch_without_retry(db):
+    db.fail_commit = True
+    batch = operations((uuid.uuid4(), "deposit", 1), (uuid.uuid4(), "deposit", 2))
+    await writer()._flush(batch)
+
+    assert len(db.sessions) == 1
+    assert db.commits == 1
+    for op in batch:
+        assert isinstance(op.future.exception(), CommitFailed)
@@ -0,0 +1,36 @@
+import pytest
+from app.core.auth import create_access_token
+from app.core.idempotency import IdempotencyMiddleware, key_scope
+
+
+def test_scope_is_user_of_access_token():
+    token = create_access_token({"sub": "7"})
+    headers = {b"cookie": f"access_token={token}".encode()}
+    assert key_scope({"client": ("10.0.0.1", 5000)}, headers) == b"user:7"
+
+
+def test_anonymous_scope_is_client_address():
+    assert key_scope({"client": ("10.0.0.1", 5000)}, {}) == b"client:10.0.0.1"
+    assert key_scope({"client": ("10.0.0.2", 5000)}, {}) == b"client:10.0.0.2"
+    bad_token = {b"cookie": b"access_token=garbage"}
+    assert key_scope({"client": ("10.0.0.1", 1)}, bad_token) == b"client:10.0.0.1"
+
+
+@pytest.mark.asyncio
+async def test_unscoped_request_is_not_deduplicated():
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope.get("state", {}).get("idempotency"))
+
+    middleware = IdempotencyMiddleware(app, paths=[r"/api/v1/auth/register"])
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/v1/auth/register",
+        "headers": [(b"idempotency-key", b"k1")],
+        "client": None,
+    }
+    await middleware(scope, None, None)
+    await middleware(scope, None, None)
+    assert calls == [None, None]
@@ -0,0 +1,83 @@
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+from app.api.v1 import wallet_router
+from app.models.payments import (
+    MAX_BALANCE,
+    BalanceLimitExceeded,
+    InsufficientFunds,
+    WalletDAO,
+    WalletNotFound,
+)
+from app.models.user import User  # noqa: F401, mappers need User
+
+
+def compiled(operation_type: str, amount: Decimal) -> str:
+    delta = amount if operation_type == "deposit" else -amount
+    query = WalletDAO._operation_query(uuid.uuid4(), operation_type, amount, delta, 1)
+    return str(
+        query.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+
+
+def test_deposit_is_capped_at_max_balance():
+    sql = compiled("deposit", Decimal("10"))
+    assert f"<= {MAX_BALANCE}" in sql
+    assert ">= 0" not in sql
+
+
+def test_withdraw_checks_overdraft():
+    sql = compiled("withdraw", Decimal("10"))
+    assert ">= 0" in sql
+    assert str(MAX_BALANCE) not in sql
+
+
+class FakeSession:
+    def __init__(self, row):
+        self.row = row
+
+    async def execute(self, query):
+        return SimpleNamespace(one=lambda: self.row)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "operation_type, wallet_exists, error",
+    [
+        ("deposit", 1, BalanceLimitExceeded),
+        ("withdraw", 1, InsufficientFunds),
+        ("deposit", 0, WalletNotFound),
+        ("withdraw", 0, WalletNotFound),
+    ],
+)
+async def test_rejected_operation_is_told_apart(operation_type, wallet_exists, error):
+    session = FakeSession(SimpleNamespace(id=None, wallet_exists=wallet_exists))
+    with pytest.raises(error):
+        await WalletDAO.apply_operation(
+            uuid.uuid4(), operation_type, Decimal("10"), session
+        )
+
+
+@pytest.mark.asyncio
+async def test_balance_limit_is_400(monkeypatch):
+    async def over_limit(*args, **kwargs):
+        raise BalanceLimitExceeded(args[0])
+
+    monkeypatch.setattr(WalletDAO, "apply_operation", over_limit)
+    request = SimpleNamespace(state=SimpleNamespace())
+    with pytest.raises(HTTPException) as error:
+        await wallet_router.apply_operation(
+            uuid.uuid4(),
+            "deposit",
+            SimpleNamespace(amount=Decimal("10")),
+            SimpleNamespace(id=1),
+            request,
+            None,
+        )
+    assert error.value.status_code == 400
+    assert error.value.detail == "balance limit exceeded"
@@ -0,0 +1,117 @@
+import asyncio
+import time
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from app.commands.reconcile import Pacer, WalletCheck, shard_bounds
+
+
+def row(operation_type, amount, before, after):
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        operation_type=operation_type,
+        amount=Decimal(amount),
+        balance_before=Decimal(before),
+        balance_after=Decimal(after),
+    )
+
+
+def kinds(issues):
+    return [issue["kind"] for issue in issues]
+
+
+def test_shard_bounds_cover_uuid_space_without_gaps():
+    shards = 7
+    bounds = [shard_bounds(shard, shards) for shard in range(shards)]
+    assert bounds[0][0] is None
+    assert bounds[-1][1] is None
+    for (_, upper), (after, _) in zip(bounds, bounds[1:]):
+        # exclusive bounds, so next shard starts right at upper
+        assert after.int == upper.int - 1
+
+
+def test_shard_bounds_single_shard_is_unbounded():
+    assert shard_bounds(0, 1) == (None, None)
+
+
+def in_shard(id, shard, shards):
+    after, upper = shard_bounds(shard, shards)
+    return (after is None or id > after) and (upper is None or id < upper)
+
+
+def test_shard_bounds_place_every_id_in_one_shard():
+    shards = 5
+    for id in [uuid.UUID(int=0), uuid.UUID(int=2**128 - 1)] + [
+        uuid.uuid4() for _ in range(200)
+    ]:
+        assert sum(in_shard(id, shard, shards) for shard in range(shards)) == 1
+
+
+@pytest.mark.asyncio
+async def test_pacer_spaces_batches_across_workers():
+    pacer = Pacer(rate=1000)
+    started = time.monotonic()
+    await asyncio.gather(*(pacer.wait(50) for _ in range(4)))
+    # first batch goes at once, the other three wait 50 ms each
+    assert time.monotonic() - started >= 0.14
+
+
+@pytest.mark.asyncio
+async def test_pacer_without_rate_never_waits():
+    pacer = Pacer(rate=0)
+    started = time.monotonic()
+    for _ in range(100):
+        await pacer.wait(10_000)
+    assert time.monotonic() - started < 0.05
+
+
+def test_wallet_check_accepts_consistent_chain():
+    check = WalletCheck(1, uuid.uuid4())
+    check.feed(row("deposit", "100", "0", "100"))
+    check.feed(row("transfer_out", "30", "100", "70"))
+    check.feed(row("transfer_in", "5.50", "70", "75.50"))
+    assert check.finish(Decimal("75.50")) == []
+    assert check.rows == 3
+
+
+def test_wallet_check_reports_broken_chain_and_amount():
+    check = WalletCheck(1, uuid.uuid4())
+    check.feed(row("deposit", "100", "0", "100"))
+    broken = row("withdraw", "10", "90", "80")
+    check.feed(broken)
+    check.feed(row("deposit", "5", "80", "90"))
+    issues = check.finish(Decimal("90"))
+    assert kinds(issues) == ["chain", "amount", "total"]
+    assert issues[0]["transaction_id"] == broken.id
+    assert issues[0]["expected"] == Decimal("100")
+
+
+def test_wallet_check_reports_opening_and_final_balance():
+    check = WalletCheck(1, uuid.uuid4())
+    check.feed(row("deposit", "10", "5", "15"))
+    assert kinds(check.finish(Decimal("20"))) == ["opening_balance", "balance", "total"]
+
+
+def test_wallet_check_without_rows_expects_zero_balance():
+    check = WalletCheck(1, uuid.uuid4())
+    assert kinds(check.finish(Decimal("1"))) == ["balance", "total"]
+
+
+def test_wallet_check_with_retired_history_starts_at_first_row():
+    check = WalletCheck(1, uuid.uuid4(), complete=False)
+    check.feed(row("withdraw", "20", "500", "480"))
+    check.feed(row("deposit", "20", "480", "500"))
+    assert check.finish(Decimal("500")) == []
+
+
+def test_wallet_check_with_retired_history_still_checks_the_rest():
+    check = WalletCheck(1, uuid.uuid4(), complete=False)
+    check.feed(row("withdraw", "20", "500", "480"))
+    check.feed(row("deposit", "20", "470", "490"))
+    assert kinds(check.finish(Decimal("490"))) == ["chain", "total"]
+
+
+def test_wallet_check_with_fully_retired_history_has_nothing_to_check():
+    check = WalletCheck(1, uuid.uuid4(), complete=False)
+    assert check.finish(Decimal("42")) == []
@@ -0,0 +1,72 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+from app.core.revocation import BloomFilter, RevocationIndex, ScalableBloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, fp_rate=0.01)
+    ids = [uuid.uuid4() for _ in range(1000)]
+    for id in ids:
+        bloom.add(id)
+    assert all(id in bloom for id in ids)
+    assert bloom.count == 1000
+
+
+def test_bloom_filter_false_positive_rate_is_near_target():
+    bloom = BloomFilter(capacity=2000, fp_rate=0.01)
+    for _ in range(2000):
+        bloom.add(uuid.uuid4())
+    false_positives = sum(uuid.uuid4() in bloom for _ in range(20_000))
+    assert false_positives / 20_000 < 0.03
+
+
+def test_empty_bloom_filter_contains_nothing():
+    bloom = BloomFilter(capacity=10, fp_rate=0.01)
+    assert not any(uuid.uuid4() in bloom for _ in range(100))
+
+
+def test_scalable_bloom_filter_grows_with_entries():
+    bloom = ScalableBloomFilter(capacity=64, fp_rate=0.01)
+    small = bloom.nbytes
+    ids = [uuid.uuid4() for _ in range(1000)]
+    for id in ids:
+        bloom.add(id)
+    assert all(id in bloom for id in ids)
+    assert len(bloom.stages) == 5  # 64 + 128 + 256 + 512 + 1024 >= 1000
+    assert bloom.count == 1000
+    assert bloom.nbytes > small
+
+
+def test_scalable_bloom_filter_keeps_false_positive_rate():
+    bloom = ScalableBloomFilter(capacity=64, fp_rate=0.01)
+    for _ in range(5000):
+        bloom.add(uuid.uuid4())
+    false_positives = sum(uuid.uuid4() in bloom for _ in range(20_000))
+    assert false_positives / 20_000 < 0.02
+
+
+def index():
+    return RevocationIndex(
+        bucket_seconds=60, capacity=16, fp_rate=0.001, sync_interval=0
+    )
+
+
+def test_revocation_index_finds_added_ids():
+    revocations = index()
+    expires_at = datetime.now() + timedelta(minutes=5)
+    revoked = uuid.uuid4()
+    revocations.add(revoked, expires_at)
+    assert revocations.might_contain(revoked)
+    assert not revocations.might_contain(uuid.uuid4())
+
+
+def test_revocation_index_drops_expired_buckets():
+    revocations = index()
+    expired, alive = uuid.uuid4(), uuid.uuid4()
+    revocations.add(expired, datetime.fromtimestamp(time.time() - 120))
+    revocations.add(alive, datetime.fromtimestamp(time.time() + 120))
+    revocations._expire_buckets()
+    assert revocations.stats()["buckets"] == 1
+    assert not revocations.might_contain(expired)
+    assert revocations.might_contain(alive)
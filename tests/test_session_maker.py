@@ -0,0 +1,91 @@
+import asyncio
+import aiosqlite
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.base.session_maker import DBSessionManager
+
+
+class Server:
+    """sqlite database that answers whoami and can be taken down"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.down = False
+        self.engine = create_async_engine(
+            "sqlite+aiosqlite://",
+            async_creator=self.connect,
+            poolclass=AsyncAdaptedQueuePool,
+        )
+        self.maker = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def connect(self):
+        if self.down:
+            raise ConnectionRefusedError(f"{self.name} is down")
+        connection = await aiosqlite.connect(":memory:")
+        await connection.execute("create table whoami (name text)")
+        await connection.execute("insert into whoami values (?)", (self.name,))
+        await connection.commit()
+        return connection
+
+
+@pytest_asyncio.fixture
+async def servers():
+    primary, replica = Server("primary"), Server("replica")
+    yield primary, replica
+    await primary.engine.dispose()
+    await replica.engine.dispose()
+
+
+async def whoami(manager: DBSessionManager) -> str:
+    async with manager.create_read_session() as session:
+        return (await session.execute(text("select name from whoami"))).scalar_one()
+
+
+async def probes_done(manager: DBSessionManager):
+    await asyncio.gather(*manager._probes)
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_healthy_replica(servers):
+    primary, replica = servers
+    manager = DBSessionManager(primary.maker, [replica.maker])
+    assert await whoami(manager) == "replica"
+    assert manager.replicas[0].in_use == 0
+    assert replica.engine.pool.checkedout() == 0
+
+
+@pytest.mark.asyncio
+async def test_replica_connect_failure_retries_on_primary(servers):
+    primary, replica = servers
+    replica.down = True
+    manager = DBSessionManager(primary.maker, [replica.maker], eject_seconds=30)
+
+    assert await whoami(manager) == "primary"
+    assert not manager.replicas[0].healthy
+    assert manager.replicas[0].failures == 1
+    assert manager.primary_reads == 1
+    assert primary.engine.pool.checkedout() == 0
+
+
+@pytest.mark.asyncio
+async def test_ejected_replica_is_readmitted_after_probe(servers):
+    primary, replica = servers
+    replica.down = True
+    manager = DBSessionManager(primary.maker, [replica.maker], eject_seconds=0)
+    assert await whoami(manager) == "primary"
+
+    # probe fails while the replica is still down, reads stay on primary
+    assert await whoami(manager) == "primary"
+    await probes_done(manager)
+    assert not manager.replicas[0].healthy
+    assert manager.replicas[0].failures == 2
+
+    replica.down = False
+    # deadline passed, but no reads until the probe succeeds
+    assert await whoami(manager) == "primary"
+    await probes_done(manager)
+    assert manager.replicas[0].healthy
+    assert await whoami(manager) == "replica"
@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from app.core.cache import user_versions
+from app.core.shared_cache import InMemoryRedis, SharedCache, shared_cache
+from app.models.payments import Wallet  # noqa: F401, mappers need Wallet
+from app.models.user import User, UserDAO
+
+
+class IdFilter(BaseModel):
+    id: int
+
+
+class NameUpdate(BaseModel):
+    name: str
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = InMemoryRedis()
+    monkeypatch.setattr(shared_cache, "client", client)
+    monkeypatch.setattr(shared_cache, "_down_until", 0.0)
+    return client
+
+
+@pytest_asyncio.fixture
+async def session_maker():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(User.__table__.create)
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with maker() as session:
+        async with session.begin():
+            session.add(User(id=1, name="alice", email="a@example.com", password="x"))
+    yield maker
+    await engine.dispose()
+
+
+async def cached_name(redis):
+    found = await shared_cache.get_many(User, [1])
+    return found[1].name if 1 in found else None
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_update_leaves_caches_alone(redis, session_maker):
+    async with session_maker() as session:
+        await shared_cache.set_many([await session.get(User, 1)])
+    user_versions.pop(1)
+
+    async with session_maker() as session:
+        await session.begin()
+        await UserDAO.update(IdFilter(id=1), NameUpdate(name="bob"), session)
+        # nothing is published before commit
+        assert await cached_name(redis) == "alice"
+        assert user_versions.get(1) is None
+        await session.rollback()
+
+    assert await cached_name(redis) == "alice"
+    assert user_versions.get(1) is None
+    assert await shared_cache.get_version(User, 1) is None
+
+
+@pytest.mark.asyncio
+async def test_committed_update_invalidates_and_publishes_version(redis, session_maker):
+    async with session_maker() as session:
+        await shared_cache.set_many([await session.get(User, 1)])
+
+    async with session_maker() as session:
+        async with session.begin():
+            (user,) = await UserDAO.update(
+                IdFilter(id=1), NameUpdate(name="bob"), session
+            )
+
+    assert user.version == 2
+    assert await cached_name(redis) is None
+    assert user_versions.get(1) == 2
+    assert await shared_cache.get_version(User, 1) == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_get_detached_copies():
+    cache = SharedCache(InMemoryRedis())
+    loaded = User(id=7, name="carol", email="c@example.com", password="x", version=1)
+
+    async def loader():
+        await asyncio.sleep(0.02)
+        return loaded
+
+    first, second, third = await asyncio.gather(
+        *(cache.get_or_load(User, 7, loader) for _ in range(3))
+    )
+    assert first is loaded
+    for copy in (second, third):
+        assert copy is not loaded and copy is not first
+        assert (copy.id, copy.name, copy.version) == (7, "carol", 1)
+        assert copy.password is None
+    assert second is not third
+
+
+@pytest.mark.asyncio
+async def test_add_many_publishes_versions_after_commit(redis, session_maker):
+    user_versions.pop(2)
+    async with session_maker() as session:
+        async with session.begin():
+            ids = await UserDAO.add_many(
+                [{"id": 2, "name": "dave", "email": "d@example.com", "password": "x"}],
+                session,
+            )
+            assert user_versions.get(2) is None
+
+    assert ids == [2]
+    assert user_versions.get(2) == 1
+    assert await shared_cache.get_version(User, 2) == 1
@@ -0,0 +1,53 @@
+import base64
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi import HTTPException
+from app.api.v1.wallet_router import decode_cursor, encode_cursor, naive_utc
+
+
+def test_cursor_round_trips_seq():
+    for seq in (0, 1, 2**40, 2**63 - 1):
+        assert decode_cursor(encode_cursor(seq)) == seq
+
+
+def test_cursor_is_url_safe_without_padding():
+    cursor = encode_cursor(12345)
+    assert "=" not in cursor
+    assert set(cursor) <= set(
+        "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+    )
+
+
+def raw_cursor(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor!",
+        raw_cursor(b"not json"),
+        raw_cursor(b"[]"),
+        raw_cursor(b"[1, 2]"),
+        raw_cursor(b'["1"]'),
+        raw_cursor(b"[1.5]"),
+        raw_cursor(b"[true]"),
+        raw_cursor(b"{}"),
+    ],
+)
+def test_bad_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_naive_utc_converts_aware_values():
+    aware = datetime(2024, 5, 1, 3, 0, tzinfo=timezone(timedelta(hours=3)))
+    assert naive_utc(aware) == datetime(2024, 5, 1, 0, 0)
+    assert naive_utc(aware).tzinfo is None
+
+
+def test_naive_utc_keeps_naive_values_and_none():
+    naive = datetime(2024, 5, 1, 3, 0)
+    assert naive_utc(naive) is naive
+    assert naive_utc(None) is None
@@ -0,0 +1,44 @@
+import pytest
+from app.core.warmup import open_connections
+
+
+class FakeConnection:
+    def __init__(self, opened: list):
+        self.opened = opened
+        opened.append(self)
+
+    async def execute(self, query):
+        pass
+
+    async def close(self):
+        self.opened.remove(self)
+
+
+class FakeEngine:
+    def __init__(self, fail_at: int):
+        self.fail_at = fail_at
+        self.opened = []
+        self.pool = self
+
+    def size(self) -> int:
+        return 5
+
+    async def connect(self):
+        if len(self.opened) == self.fail_at:
+            raise ConnectionRefusedError("db down")
+        return FakeConnection(self.opened)
+
+
+@pytest.mark.asyncio
+async def test_failed_connect_releases_checked_out_connections():
+    engine = FakeEngine(fail_at=2)
+    with pytest.raises(ConnectionRefusedError):
+        await open_connections(engine, 5)
+    assert engine.opened == []
+
+
+@pytest.mark.asyncio
+async def test_connections_go_back_to_pool():
+    engine = FakeEngine(fail_at=-1)
+    await open_connections(engine, 3)
+    assert engine.opened == []